@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+End-to-end crawl benchmark - the real spiders and middleware against the local fixture site
+
+    python benchmarks/bench_crawl.py --cards 1000 --quote-pages 50
+    python benchmarks/bench_crawl.py --compare benchmarks/results/<older commit>.json
+
+Scenarios, each crawled in its own process:
+  cards     - test spider clicking Load More on /indexes/pokemon
+  quotes    - final_test spider paging /quotes/page/N/ (HTTP-first, no browser needed)
+  quotes_js - final_test spider paging /js/page/N/ (quotes built by script, rendered in Chrome)
+
+For each one: pages/min, items/s, time to the first item, and the peak RSS of
+the crawler process and of its chromedriver/Chrome children. Results are saved
+to benchmarks/results/<git commit>.json.
+"""
+import os
+import sys
+import json
+import time
+import pathlib
+import argparse
+import resource
+import tempfile
+import subprocess
+import psutil
+
+ROOT = pathlib.Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.fixture_site import FixtureSite
+
+# Scenario -> (spider, start path on the fixture site)
+SCENARIOS = {
+    'cards': ('test', '/indexes/pokemon'),
+    'quotes': ('final_test', '/quotes/page/1/'),
+    'quotes_js': ('final_test', '/js/page/1/'),
+}
+
+# Compared by --compare; True where higher is better
+METRICS = {
+    'pages_per_minute': True,
+    'items_per_second': True,
+    'time_to_first_item': False,
+    'peak_python_rss_mb': False,
+    'peak_chrome_rss_mb': False,
+    'seconds': False,
+}
+
+# Crawl settings for every scenario - no proxies, no politeness delay, no Supabase.
+# Browsers start on demand and are closed at the end, so every scenario pays for
+# its own launches and none leaves Chrome running into the next one.
+BENCH_SETTINGS = {
+    'PROXY_ROTATION_ENABLED': False,
+    'DOWNLOAD_DELAY': 0,
+    'RANDOMIZE_DOWNLOAD_DELAY': False,
+    'SELENIUM_PROFILE': 'lean',
+    'SELENIUM_PRESPAWN': 0,
+    'SELENIUM_KEEP_BROWSER_OPEN': False,
+    'ITEM_PIPELINES': {'testSpider.dedup_pipeline.DedupPipeline': 200},
+    'DEDUP_PRESEED': 'none',
+    'LOG_LEVEL': 'WARNING',
+    'LOG_STDOUT': False,
+}
+
+
+class CrawlProbe:
+    """Scrapy extension that times the crawl and samples memory, then writes BENCH_OUTPUT"""
+
+    def __init__(self, crawler, output, sample_interval):
+        self.crawler = crawler
+        self.output = output
+        self.sample_interval = sample_interval
+        self.process = psutil.Process()
+        self.started = None
+        self.first_item = None
+        self.pages = 0
+        self.items = 0
+        self.peak_python = 0
+        self.peak_chrome = 0
+        self.sampler = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        from scrapy import signals
+        probe = cls(crawler, crawler.settings.get('BENCH_OUTPUT'),
+                    crawler.settings.getfloat('BENCH_SAMPLE_INTERVAL', 0.5))
+        crawler.signals.connect(probe.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(probe.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(probe.response_received, signal=signals.response_received)
+        crawler.signals.connect(probe.item_scraped, signal=signals.item_scraped)
+        return probe
+
+    def spider_opened(self, spider):
+        from twisted.internet import task
+        self.started = time.perf_counter()
+        self.sampler = task.LoopingCall(self.sample)
+        self.sampler.start(self.sample_interval)
+
+    def response_received(self, response, request, spider):
+        self.pages += 1
+
+    def item_scraped(self, item, response, spider):
+        self.items += 1
+        if self.first_item is None:
+            self.first_item = time.perf_counter() - self.started
+
+    def sample(self):
+        try:
+            self.peak_python = max(self.peak_python, self.process.memory_info().rss)
+            chrome = 0
+            # Everything the crawler started - chromedriver, Chrome and its renderers
+            for child in self.process.children(recursive=True):
+                try:
+                    chrome += child.memory_info().rss
+                except psutil.Error:
+                    continue
+            self.peak_chrome = max(self.peak_chrome, chrome)
+        except psutil.Error:
+            pass
+
+    def spider_closed(self, spider, reason):
+        self.sample()
+        if self.sampler and self.sampler.running:
+            self.sampler.stop()
+        elapsed = time.perf_counter() - self.started
+        # ru_maxrss is in KiB on Linux - catches peaks between samples
+        peak_python = max(self.peak_python, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024)
+        result = {
+            'reason': reason,
+            'seconds': round(elapsed, 2),
+            'pages': self.pages,
+            'items': self.items,
+            'pages_per_minute': round(self.pages / elapsed * 60, 1) if elapsed else 0,
+            'items_per_second': round(self.items / elapsed, 2) if elapsed else 0,
+            'time_to_first_item': round(self.first_item, 2) if self.first_item is not None else None,
+            'peak_python_rss_mb': round(peak_python / 1024 / 1024, 1),
+            'peak_chrome_rss_mb': round(self.peak_chrome / 1024 / 1024, 1),
+        }
+        if self.output:
+            pathlib.Path(self.output).write_text(json.dumps(result))
+
+
+def run_crawl(spider, spider_args, settings, output):
+    """Child process: one crawl with the project settings plus the benchmark's"""
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+
+    project_settings = get_project_settings()
+    for name, value in settings.items():
+        project_settings.set(name, value, priority='cmdline')
+    extensions = dict(project_settings.getdict('EXTENSIONS'))
+    extensions['benchmarks.bench_crawl.CrawlProbe'] = 0
+    project_settings.set('EXTENSIONS', extensions, priority='cmdline')
+    project_settings.set('BENCH_OUTPUT', output, priority='cmdline')
+
+    process = CrawlerProcess(project_settings)
+    process.crawl(spider, **spider_args)
+    process.start()
+
+
+def run_scenario(name, base_url, args, overrides):
+    spider, path = SCENARIOS[name]
+    spider_args = {'start_url': base_url + path}
+    if spider == 'final_test':
+        spider_args['max_pages'] = args.quote_pages
+    settings = dict(BENCH_SETTINGS, **overrides)
+
+    with tempfile.TemporaryDirectory(prefix='bench-crawl-') as workdir:
+        output = os.path.join(workdir, 'result.json')
+        env = dict(os.environ, SCRAPY_SETTINGS_MODULE='testSpider.settings',
+                   PYTHONPATH=os.pathsep.join(filter(None, [str(ROOT), os.environ.get('PYTHONPATH')])))
+        # Spiders write their own output files to the working directory - keep those out of the repo
+        subprocess.run(
+            [sys.executable, __file__, '--child', json.dumps([spider, spider_args, settings, output])],
+            cwd=workdir, env=env, check=True, timeout=args.timeout,
+        )
+        if not os.path.exists(output):
+            raise RuntimeError(f"The {name} crawl finished without results - see its log above")
+        return json.loads(pathlib.Path(output).read_text())
+
+
+def parse_override(value):
+    """KEY=VALUE, with VALUE parsed as JSON when it is valid JSON"""
+    name, _, raw = value.partition('=')
+    try:
+        return name, json.loads(raw)
+    except ValueError:
+        return name, raw
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(results, baseline_file):
+    baseline = json.loads(pathlib.Path(baseline_file).read_text())
+    print(f"\nvs {baseline.get('commit')} ({baseline_file}):")
+    for name, result in results['scenarios'].items():
+        old = baseline.get('scenarios', {}).get(name)
+        if not old:
+            continue
+        for metric, higher_is_better in METRICS.items():
+            before, after = old.get(metric), result.get(metric)
+            if not before or after is None:
+                continue
+            change = (after - before) / before * 100
+            better = change > 0 if higher_is_better else change < 0
+            print(f"  {name:>9} {metric:<20} {before:>9} -> {after:<9} {change:+6.1f}% "
+                  f"{'better' if better else 'worse' if change else ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--cards', type=int, default=500, help='cards in the fixture index')
+    parser.add_argument('--batch', type=int, default=20, help='cards per Load More click')
+    parser.add_argument('--latency', type=float, default=0.3, help='fixture API latency in seconds')
+    parser.add_argument('--quote-pages', type=int, default=20, help='pages of quotes')
+    parser.add_argument('--page-latency', type=float, default=0.05, help='seconds per quotes page')
+    parser.add_argument('--set', action='append', default=[], metavar='KEY=VALUE',
+                        help='extra Scrapy setting for every crawl, e.g. --set SELENIUM_TABS_PER_BROWSER=4')
+    parser.add_argument('--timeout', type=float, default=1800, help='seconds before a crawl is killed')
+    parser.add_argument('--output', help='results file (default benchmarks/results/<git commit>.json)')
+    parser.add_argument('--compare', metavar='FILE', help='earlier results file to compare against')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_crawl(*json.loads(args.child))
+        return
+
+    overrides = dict(parse_override(value) for value in args.set)
+    site = FixtureSite(total_cards=args.cards, batch_size=args.batch, latency=args.latency,
+                       quote_pages=args.quote_pages, page_latency=args.page_latency)
+    base_url = site.start()
+    commit = git_commit()
+    results = {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'fixture': {'cards': args.cards, 'batch': args.batch, 'latency': args.latency,
+                    'quote_pages': args.quote_pages, 'page_latency': args.page_latency},
+        'settings': overrides,
+        'scenarios': {},
+    }
+
+    try:
+        for name in args.scenarios:
+            result = run_scenario(name, base_url, args, overrides)
+            results['scenarios'][name] = result
+            first = result['time_to_first_item']
+            print(f"{name:>9}: {result['pages_per_minute']:7.1f} pages/min  {result['items_per_second']:7.2f} items/s  "
+                  f"first item {first if first is not None else '-'}s  "
+                  f"peak RSS python {result['peak_python_rss_mb']}MB chrome {result['peak_chrome_rss_mb']}MB  "
+                  f"({result['items']} items, {result['seconds']}s)")
+    finally:
+        site.stop()
+
+    output = pathlib.Path(args.output or ROOT / 'benchmarks' / 'results' / f'{commit}.json')
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    print(f"Saved {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Driver startup benchmark - cold vs warm browser launches, p50/p95
+
+    python benchmarks/bench_driver_startup.py --launches 10
+
+Each launch is timed from building the options to the first page of the local
+fixture site being loaded:
+  cold - the original driver_return: new UserAgent, uc.Chrome downloads and
+         patches chromedriver, fresh temporary profile
+  warm - SELENIUM_WARM_START: cached UserAgent, chromedriver patched once,
+         profile copied from a template (built once, reported separately)
+"""
+import sys
+import json
+import time
+import shutil
+import pathlib
+import argparse
+import tempfile
+import statistics
+import undetected_chromedriver as uc
+from fake_useragent import UserAgent
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+
+from benchmarks.fixture_site import FixtureSite
+from testSpider.warm_start import ProfileTemplate, patched_driver_path, user_agents
+
+
+def options_for(ua):
+    options = uc.ChromeOptions()
+    options.add_argument("--window-size=1920,1080")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument(f'--user-agent={ua.random}')
+    return options
+
+
+def launch_cold(url):
+    driver = uc.Chrome(options=options_for(UserAgent(browsers=['chrome'])), headless=True, use_subprocess=False)
+    driver.get(url)
+    return driver, None
+
+
+def launch_warm(url, template):
+    profile_dir = template.copy()
+    driver = uc.Chrome(options=options_for(user_agents()), headless=True, use_subprocess=False,
+                       driver_executable_path=patched_driver_path(), user_data_dir=profile_dir)
+    driver.get(url)
+    return driver, profile_dir
+
+
+def build_template(user_data_dir):
+    driver = uc.Chrome(options=options_for(user_agents()), headless=True, use_subprocess=False,
+                       user_data_dir=user_data_dir, driver_executable_path=patched_driver_path())
+    try:
+        driver.get('about:blank')
+    finally:
+        driver.quit()
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, round(pct / 100 * (len(values) - 1)))]
+
+
+def summarise(times):
+    return {
+        'launches': len(times),
+        'p50': round(percentile(times, 50), 3),
+        'p95': round(percentile(times, 95), 3),
+        'mean': round(statistics.mean(times), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--launches', type=int, default=10, help='launches per mode')
+    args = parser.parse_args()
+
+    site = FixtureSite(total_cards=20, batch_size=20, latency=0)
+    url = f"{site.start()}/indexes/pokemon"
+    template_root = tempfile.mkdtemp(prefix='bench-template-')
+    template = ProfileTemplate(template_root)
+    results = {}
+
+    try:
+        start = time.perf_counter()
+        template.ensure(build_template)
+        results['template_build_seconds'] = round(time.perf_counter() - start, 3)
+
+        for name, launch in (('cold', launch_cold), ('warm', lambda u: launch_warm(u, template))):
+            times = []
+            for _ in range(args.launches):
+                start = time.perf_counter()
+                driver, profile_dir = launch(url)
+                times.append(time.perf_counter() - start)
+                driver.quit()
+                if profile_dir:
+                    shutil.rmtree(profile_dir, ignore_errors=True)
+            results[name] = summarise(times)
+            print(f"{name:>4}: p50 {results[name]['p50']:.2f}s  p95 {results[name]['p95']:.2f}s  "
+                  f"({args.launches} launches)")
+    finally:
+        site.stop()
+        shutil.rmtree(template_root, ignore_errors=True)
+
+    print(f"p50 speedup: {results['cold']['p50'] / results['warm']['p50']:.1f}x")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
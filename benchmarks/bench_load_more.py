@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Load More benchmark - clicks per minute with fixed sleeps vs event-driven waits
+
+    python benchmarks/bench_load_more.py --clicks 30 --latency 0.3
+
+Runs both strategies in one headless Chrome against the local fixture site:
+  sleep - the original loop: 0.5s, scroll, 0.5s, click, 2s, count cards
+  event - TestSpider.click_load_more + wait_for_more
+"""
+import sys
+import json
+import time
+import pathlib
+import argparse
+import undetected_chromedriver as uc
+from selenium.webdriver.common.by import By
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+
+from benchmarks.fixture_site import FixtureSite
+from testSpider.spiders.test import TestSpider, LOAD_MORE_XPATH
+from testSpider.waits import wait_for_more
+
+
+def count_cards(driver):
+    return len(driver.find_elements(By.CSS_SELECTOR, 'div.card-item-info'))
+
+
+def run_sleep(driver, spider, clicks):
+    for _ in range(clicks):
+        time.sleep(0.5)
+        button = driver.find_element(By.XPATH, LOAD_MORE_XPATH)
+        driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", button)
+        time.sleep(0.5)
+        button.click()
+        time.sleep(2)
+        count_cards(driver)
+
+
+def run_event(driver, spider, clicks):
+    for _ in range(clicks):
+        previous = count_cards(driver)
+        if not spider.click_load_more(driver):
+            break
+        wait_for_more(driver, 'div.card-item-info', previous, LOAD_MORE_XPATH)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clicks', type=int, default=30)
+    parser.add_argument('--batch', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.3, help='fixture API latency in seconds')
+    args = parser.parse_args()
+
+    # Enough cards that neither run exhausts the index
+    site = FixtureSite(total_cards=(args.clicks + 2) * args.batch, batch_size=args.batch, latency=args.latency)
+    base_url = site.start()
+    driver = uc.Chrome(options=uc.ChromeOptions(), headless=True, use_subprocess=False)
+    spider = TestSpider()
+    results = {}
+
+    try:
+        for name, strategy in (('sleep', run_sleep), ('event', run_event)):
+            driver.get(f"{base_url}/indexes/pokemon")
+            wait_for_more(driver, 'div.card-item-info', 0)
+            start = time.perf_counter()
+            strategy(driver, spider, args.clicks)
+            elapsed = time.perf_counter() - start
+            results[name] = {
+                'clicks': args.clicks,
+                'seconds': round(elapsed, 2),
+                'clicks_per_minute': round(args.clicks / elapsed * 60, 1),
+                'cards': count_cards(driver),
+            }
+            print(f"{name:>5}: {results[name]['clicks_per_minute']:7.1f} clicks/min "
+                  f"({elapsed:.1f}s, {results[name]['cards']} cards)")
+    finally:
+        driver.quit()
+        site.stop()
+
+    print(f"speedup: {results['event']['clicks_per_minute'] / results['sleep']['clicks_per_minute']:.1f}x")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Proxy validator benchmark - the old thread pool vs asyncio with early stop
+
+    python benchmarks/bench_proxy_validator.py --proxies 3000 --good 0.05 --target 50
+
+Starts a fake proxy fleet on loopback: one listener on 0.0.0.0 that every
+127.0.x.y address reaches, speaking SOCKS5, SOCKS4 or plain HTTP depending
+on the first byte. The address decides how each "proxy" behaves:
+  good - answers the test request after a random 0.05-1.5s
+  hang - accepts the connection and never answers (costs a full timeout)
+  dead - closes the connection straight away
+
+  legacy - the original ThreadPoolExecutor(50) over the first 150 proxies
+  async  - ProxyValidator.validate_proxy_list over the whole list with a target
+"""
+import sys
+import json
+import time
+import random
+import asyncio
+import pathlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, str(pathlib.Path(__file__).parent.parent))
+
+from testSpider.proxy_validator import ProxyValidator
+
+# A non-routable address - the fake proxies answer for it themselves
+TEST_URL = 'http://10.255.255.1/ip'
+PROTOCOLS = ('socks5', 'socks4', 'http')
+
+
+class ProxyFleet:
+    """Fake proxies at 127.0.x.y:port, served from one asyncio loop in a background thread"""
+
+    def __init__(self, count, good=0.05, hang=0.45, port=0, seed=1):
+        rng = random.Random(seed)
+        self.behaviour = {}
+        self.proxies = []
+        for i in range(count):
+            ip = f"127.0.{1 + i // 250}.{1 + i % 250}"
+            roll = rng.random()
+            if roll < good:
+                self.behaviour[ip] = rng.uniform(0.05, 1.5)
+            elif roll < good + hang:
+                self.behaviour[ip] = 'hang'
+            else:
+                self.behaviour[ip] = 'dead'
+            self.proxies.append({'ip': ip, 'port': None, 'protocol': PROTOCOLS[i % 3]})
+        self.port = port
+        self.loop = asyncio.new_event_loop()
+        self.ready = threading.Event()
+        self.thread = None
+        self.server = None
+        self.writers = set()
+
+    @property
+    def good_count(self):
+        return sum(1 for b in self.behaviour.values() if isinstance(b, float))
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        for proxy in self.proxies:
+            proxy['port'] = self.port
+        return self
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.server = self.loop.run_until_complete(
+            asyncio.start_server(self.handle, '0.0.0.0', self.port, backlog=4096)
+        )
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.ready.set()
+        self.loop.run_forever()
+        self.loop.close()
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self.shutdown(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+    async def shutdown(self):
+        # Stop accepting, then cancel the handlers still hanging and wait for them,
+        # so no task is left pending when the loop closes
+        self.server.close()
+        for writer in list(self.writers):
+            writer.close()
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def handle(self, reader, writer):
+        behaviour = self.behaviour.get(writer.get_extra_info('sockname')[0], 'dead')
+        self.writers.add(writer)
+        try:
+            if behaviour == 'dead':
+                return
+            if behaviour == 'hang':
+                await reader.read()
+                return
+
+            first = await reader.readexactly(1)
+            if first == b'\x05':
+                # SOCKS5: no-auth greeting, then CONNECT to whatever was asked
+                await reader.readexactly((await reader.readexactly(1))[0])
+                writer.write(b'\x05\x00')
+                header = await reader.readexactly(4)
+                atyp = header[3]
+                if atyp == 1:
+                    await reader.readexactly(4)
+                elif atyp == 3:
+                    await reader.readexactly((await reader.readexactly(1))[0])
+                else:
+                    await reader.readexactly(16)
+                await reader.readexactly(2)
+                writer.write(b'\x05\x00\x00\x01' + bytes(6))
+            elif first == b'\x04':
+                # SOCKS4/4a: command, port, address, NUL-terminated user id (and host for 4a)
+                header = await reader.readexactly(7)
+                await reader.readuntil(b'\x00')
+                if header[3:6] == b'\x00\x00\x00':
+                    await reader.readuntil(b'\x00')
+                writer.write(b'\x00\x5a' + bytes(6))
+            else:
+                # HTTP proxies get either CONNECT (aiohttp-socks) or an absolute-form request (requests)
+                head = first + await reader.readuntil(b'\r\n\r\n')
+                if head.startswith(b'CONNECT'):
+                    writer.write(b'HTTP/1.1 200 Connection established\r\n\r\n')
+                    await reader.readuntil(b'\r\n\r\n')
+            if first in (b'\x04', b'\x05'):
+                await reader.readuntil(b'\r\n\r\n')
+
+            await asyncio.sleep(behaviour)
+            body = b'{"origin": "127.0.0.1"}'
+            writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                         b'Content-Length: %d\r\nConnection: close\r\n\r\n%s' % (len(body), body))
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except asyncio.CancelledError:
+            # shutdown() cancelling a connection - end normally, as asyncio's stream
+            # callback (before 3.12) logs an error for every handler left cancelled
+            pass
+        finally:
+            self.writers.discard(writer)
+            writer.close()
+
+
+def run_legacy(validator, proxies, max_workers=50, max_test=150):
+    """The original validate_proxy_list: threads, blocking requests, first 150 only"""
+    working = []
+    first_found = None
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(validator.test_proxy, proxy) for proxy in proxies[:max_test]]
+        for future in futures:
+            if future.result():
+                working.append(future.result())
+                first_found = first_found or time.perf_counter() - start
+    return working, first_found, None
+
+
+def run_async(validator, proxies, concurrency, target):
+    start = time.perf_counter()
+    found = []
+
+    def on_result(result):
+        found.append(time.perf_counter() - start)
+
+    async def validate():
+        return await validator.validate_async(proxies, concurrency=concurrency, target=target, on_result=on_result)
+
+    working = asyncio.run(validate())
+    time_to_target = found[target - 1] if target and len(found) >= target else None
+    return working, found[0] if found else None, time_to_target
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--proxies', type=int, default=3000)
+    parser.add_argument('--good', type=float, default=0.05, help='fraction of proxies that work')
+    parser.add_argument('--hang', type=float, default=0.45, help='fraction that accept and never answer')
+    parser.add_argument('--target', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=1000)
+    parser.add_argument('--timeout', type=float, default=8)
+    args = parser.parse_args()
+
+    fleet = ProxyFleet(args.proxies, args.good, args.hang).start()
+    print(f"{args.proxies} fake proxies on port {fleet.port}, {fleet.good_count} of them good")
+    results = {}
+
+    try:
+        for name, strategy in (
+            ('legacy', lambda v, p: run_legacy(v, p)),
+            ('async', lambda v, p: run_async(v, p, args.concurrency, args.target)),
+        ):
+            validator = ProxyValidator(test_url=TEST_URL, timeout=args.timeout)
+            proxies = [dict(proxy) for proxy in fleet.proxies]
+            start = time.perf_counter()
+            working, first_found, time_to_target = strategy(validator, proxies)
+            elapsed = time.perf_counter() - start
+            results[name] = {
+                'seconds': round(elapsed, 2),
+                'working_found': len(working),
+                'first_found_seconds': round(first_found, 2) if first_found else None,
+                'time_to_target_seconds': round(time_to_target, 2) if time_to_target else None,
+            }
+            reached = f"after {time_to_target:.2f}s" if time_to_target else "not reached"
+            print(f"{name:>6}: {len(working):4d} working in {elapsed:6.2f}s "
+                  f"(first after {results[name]['first_found_seconds']}s, target {args.target} {reached})")
+    finally:
+        fleet.stop()
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+Local fixture site - a CardLadder-like Load More index and a quotes site served from memory
+
+    python benchmarks/fixture_site.py --port 8800 --total 2000 --batch 20 --latency 0.3
+
+The index page at /indexes/pokemon renders cards client-side from /api/cards
+(offset/limit JSON, delayed by --latency) and appends div.card-item-info tiles
+with the same markup the test spider scrapes each time Load More is clicked.
+
+/quotes/page/<n>/ is a paginated quotes.toscrape.com look-alike (--quote-pages
+pages, delayed by --page-latency). /js/page/<n>/ serves the same quotes built
+by a script, so HTTP-first crawls have to fall back to the browser.
+"""
+import re
+import json
+import time
+import struct
+import zlib
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+QUOTES_PATH = re.compile(r'^/(quotes|js)/page/(\d+)/?$')
+
+INDEX_PAGE = """<!DOCTYPE html>
+<html>
+<head><title>Pokemon Index | Fixture</title></head>
+<body>
+<div id="cards"></div>
+<button class="btn secondary" id="load-more">Load more</button>
+<script>
+var offset = 0, batch = %(batch)d;
+function tile(card) {
+    var el = document.createElement('div');
+    el.className = 'card-tile';
+    el.innerHTML = '<img src="/img/' + card.number + '.png">' +
+        '<div class="card-item-info">' +
+        '<div class="card-set">' + card.year + ' ' + card.set + '</div>' +
+        '<div class="card-name"><span>' + card.player + '</span><span>#' + card.number + '</span></div>' +
+        '<span class="grade-variation-chip"><span>' + card.variation + '</span></span>' +
+        '<span class="grade-variation-chip"><span>' + card.grade + '</span></span>' +
+        '</div>';
+    return el;
+}
+function loadMore() {
+    var button = document.getElementById('load-more');
+    button.disabled = true;
+    fetch('/api/cards?offset=' + offset + '&limit=' + batch)
+        .then(function (r) { return r.json(); })
+        .then(function (data) {
+            var cards = document.getElementById('cards');
+            data.hits.forEach(function (card) { cards.appendChild(tile(card)); });
+            offset += data.hits.length;
+            if (offset >= data.total) { button.remove(); } else { button.disabled = false; }
+        });
+}
+document.getElementById('load-more').addEventListener('click', loadMore);
+loadMore();
+</script>
+</body>
+</html>
+"""
+
+QUOTES_PAGE = """<!DOCTYPE html>
+<html>
+<head><title>Quotes to Scrape | Fixture</title></head>
+<body>
+<div class="container">
+%(quotes)s
+<nav><ul class="pager">%(next)s</ul></nav>
+</div>
+</body>
+</html>
+"""
+
+QUOTE = """<div class="quote">
+    <span class="text">%(text)s</span>
+    <span>by <small class="author">%(author)s</small></span>
+    <div class="tags">%(tags)s</div>
+</div>"""
+
+# The quotes arrive as JSON in the page and are only turned into markup by the browser
+JS_QUOTES_PAGE = """<!DOCTYPE html>
+<html>
+<head><title>Quotes to Scrape | Fixture</title></head>
+<body>
+<div class="container" id="quotes"></div>
+<script>
+var data = %(data)s;
+var html = data.quotes.map(function (q) {
+    return '<div class="quote"><span class="text">' + q.text + '</span>' +
+        '<span>by <small class="author">' + q.author + '</small></span>' +
+        '<div class="tags">' + q.tags.map(function (t) { return '<a class="tag" href="#">' + t + '</a>'; }).join('') +
+        '</div></div>';
+}).join('');
+if (data.next) { html += '<nav><ul class="pager"><li class="next"><a href="' + data.next + '">Next</a></li></ul></nav>'; }
+document.getElementById('quotes').innerHTML = html;
+</script>
+</body>
+</html>
+"""
+
+
+def tiny_png():
+    """A 1x1 grey PNG, so image requests cost a realistic round trip but few bytes"""
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+    header = struct.pack('>IIBBBBB', 1, 1, 8, 0, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header)
+            + chunk(b'IDAT', zlib.compress(b'\x00\x80')) + chunk(b'IEND', b''))
+
+
+class FixtureSite:
+    """Serves the fixture pages from a background thread"""
+
+    def __init__(self, port=0, total_cards=500, batch_size=20, latency=0.3,
+                 quote_pages=10, quotes_per_page=10, page_latency=0.05):
+        self.total_cards = total_cards
+        self.batch_size = batch_size
+        self.latency = latency
+        self.quote_pages = quote_pages
+        self.quotes_per_page = quotes_per_page
+        self.page_latency = page_latency
+        self.png = tiny_png()
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), self.handler_class())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self.base_url
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def card(self, n):
+        return {
+            'year': 1999 + n % 25,
+            'set': f"Pokemon Fixture Set {n // 100}",
+            'player': f"Fixturemon {n}",
+            'number': str(n),
+            'variation': 'Holo' if n % 2 else 'Reverse Holo',
+            'grade': f"PSA {10 - n % 3}",
+        }
+
+    def cards_page(self, query):
+        offset = int(query.get('offset', ['0'])[0])
+        limit = int(query.get('limit', [str(self.batch_size)])[0])
+        time.sleep(self.latency)
+        end = min(offset + limit, self.total_cards)
+        return {'hits': [self.card(n) for n in range(offset, end)], 'total': self.total_cards}
+
+    def quote(self, n):
+        return {
+            'text': f"\u201cFixture quote number {n}, long enough to look like the real thing.\u201d",
+            'author': f"Author {n % 37}",
+            'tags': [f"tag{n % 5}", f"topic{n % 11}"],
+        }
+
+    def quotes_page(self, prefix, page):
+        """HTML for quotes page `page` under /<prefix>/page/, or None past the last page"""
+        if not 1 <= page <= self.quote_pages:
+            return None
+        time.sleep(self.page_latency)
+        first = (page - 1) * self.quotes_per_page
+        quotes = [self.quote(n) for n in range(first, first + self.quotes_per_page)]
+        next_url = f"/{prefix}/page/{page + 1}/" if page < self.quote_pages else None
+        if prefix == 'js':
+            return JS_QUOTES_PAGE % {'data': json.dumps({'quotes': quotes, 'next': next_url})}
+        return QUOTES_PAGE % {
+            'quotes': '\n'.join(QUOTE % {
+                'text': q['text'],
+                'author': q['author'],
+                'tags': ''.join(f'<a class="tag" href="#">{tag}</a>' for tag in q['tags']),
+            } for q in quotes),
+            'next': f'<li class="next"><a href="{next_url}">Next</a></li>' if next_url else '',
+        }
+
+    def handler_class(self):
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                if parts.path == '/indexes/pokemon':
+                    self.send(200, 'text/html; charset=utf-8',
+                              (INDEX_PAGE % {'batch': site.batch_size}).encode())
+                elif parts.path == '/api/cards':
+                    self.send(200, 'application/json',
+                              json.dumps(site.cards_page(parse_qs(parts.query))).encode())
+                elif parts.path.startswith('/img/'):
+                    self.send(200, 'image/png', site.png)
+                elif QUOTES_PATH.match(parts.path):
+                    prefix, page = QUOTES_PATH.match(parts.path).groups()
+                    html = site.quotes_page(prefix, int(page))
+                    if html is None:
+                        self.send(404, 'text/plain', b'not found')
+                    else:
+                        self.send(200, 'text/html; charset=utf-8', html.encode())
+                else:
+                    self.send(404, 'text/plain', b'not found')
+
+            def send(self, status, content_type, body):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=8800)
+    parser.add_argument('--total', type=int, default=500, help='cards in the index')
+    parser.add_argument('--batch', type=int, default=20, help='cards per Load More click')
+    parser.add_argument('--latency', type=float, default=0.3, help='seconds per API call')
+    parser.add_argument('--quote-pages', type=int, default=10, help='pages of quotes')
+    parser.add_argument('--page-latency', type=float, default=0.05, help='seconds per quotes page')
+    args = parser.parse_args()
+
+    site = FixtureSite(args.port, args.total, args.batch, args.latency,
+                       quote_pages=args.quote_pages, page_latency=args.page_latency)
+    print(f"Serving {site.base_url}/indexes/pokemon, {site.base_url}/quotes/page/1/ "
+          f"and {site.base_url}/js/page/1/ (Ctrl+C to stop)")
+    try:
+        site.server.serve_forever()
+    except KeyboardInterrupt:
+        site.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+PostgREST stub - an in-memory stand-in for the Supabase `cards` table
+
+    python benchmarks/postgrest_stub.py --port 54321 --latency 0.05
+    SUPABASE_URL=http://127.0.0.1:54321 SUPABASE_KEY=stub.stub.stub scrapy crawl test
+
+Understands just enough of PostgREST for SupabasePipeline: upserts into
+/rest/v1/cards with on_conflict=name,tag (rejecting a batch that repeats a
+conflict key, like Postgres does) and paged selects of name,tag.
+"""
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs
+
+
+class PostgrestStub:
+    """Serves the stub from a background thread; rows live in self.rows"""
+
+    def __init__(self, port=0, latency=0.0, fail_rate=0.0):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.rows = {}
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), self.handler_class())
+        self.server.daemon_threads = True
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self.base_url
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def upsert(self, rows):
+        keys = [(row.get('name'), row.get('tag')) for row in rows]
+        if len(set(keys)) != len(keys):
+            return 500, {
+                'code': '21000',
+                'message': 'ON CONFLICT DO UPDATE command cannot affect row a second time',
+                'details': None,
+                'hint': 'Ensure that no rows proposed for insertion within the same command have duplicate constrained values.',
+            }
+        if any(not row.get('name') or row.get('tag') is None for row in rows):
+            return 400, {'code': '23502', 'message': 'null value violates not-null constraint',
+                         'details': None, 'hint': None}
+        with self.lock:
+            for key, row in zip(keys, rows):
+                self.rows[key] = {'name': row['name'], 'tag': row['tag']}
+        return 201, rows
+
+    def select(self, query, range_header):
+        with self.lock:
+            rows = list(self.rows.values())
+        start, end = 0, len(rows) - 1
+        if range_header:
+            start, end = (int(x) for x in range_header.split('-'))
+        if 'offset' in query:
+            start = int(query['offset'][0])
+        if 'limit' in query:
+            end = start + int(query['limit'][0]) - 1
+        return rows[start:end + 1], len(rows)
+
+    def handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_POST(self):
+                stub.requests += 1
+                time.sleep(stub.latency)
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if random.random() < stub.fail_rate:
+                    self.send_json(503, {'message': 'stub induced failure'})
+                    return
+                rows = json.loads(body)
+                status, payload = stub.upsert(rows if isinstance(rows, list) else [rows])
+                self.send_json(status, payload)
+
+            def do_GET(self):
+                stub.requests += 1
+                time.sleep(stub.latency)
+                parts = urlsplit(self.path)
+                rows, total = stub.select(parse_qs(parts.query), self.headers.get('Range'))
+                self.send_json(200, rows, {'Content-Range': f"0-{max(len(rows) - 1, 0)}/{total}"})
+
+            def send_json(self, status, payload, headers=None):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--port', type=int, default=54321)
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every request')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='fraction of upserts answered with 503')
+    args = parser.parse_args()
+
+    stub = PostgrestStub(args.port, args.latency, args.fail_rate)
+    print(f"PostgREST stub on {stub.base_url} (Ctrl+C to stop)")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"{len(stub.rows)} rows after {stub.requests} requests")
+        stub.stop()
+
+
+if __name__ == '__main__':
+    main()
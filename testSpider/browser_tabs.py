@@ -0,0 +1,185 @@
+"""
+Browser tabs - several pooled renders sharing one Chrome, each in its own tab and browser context
+"""
+import logging
+import threading
+from selenium.common.exceptions import JavascriptException
+from selenium.webdriver.remote.webelement import WebElement
+from selenium.webdriver.support.ui import WebDriverWait
+
+logger = logging.getLogger(__name__)
+
+# Chrome slows timers and rendering in tabs that aren't in front - every tab
+# here is rendering for someone, so switch that off
+TAB_ARGUMENTS = [
+    '--disable-background-timer-throttling',
+    '--disable-renderer-backgrounding',
+    '--disable-backgrounding-occluded-windows',
+]
+
+# Marks the current document so a navigation with pageLoadStrategy 'none'
+# can tell the new page has replaced it
+MARK_DOCUMENT_SCRIPT = "window.__replacedByNavigation = true;"
+NEW_DOCUMENT_READY_SCRIPT = "return !window.__replacedByNavigation && document.readyState === 'complete';"
+
+
+class TabbedBrowser:
+    """One Chrome shared by up to `max_tabs` pooled drivers
+
+    chromedriver only talks to one window at a time, so every command takes
+    the browser lock and switches to its tab first. Commands are short: with
+    pageLoadStrategy 'none' a get() returns once navigation starts, and the
+    wait for the page to load polls outside the lock, so tabs load in
+    parallel. Each tab after the first gets its own CDP browser context -
+    separate cookies, storage and cache, like an incognito window.
+    """
+
+    def __init__(self, max_tabs):
+        self.max_tabs = max_tabs
+        self.driver = None
+        self.lock = threading.RLock()
+        self.current = None
+        self.tabs = []
+        # Tabs open or being opened - maintained on the reactor thread by DriverPool
+        self.reserved = 0
+        # Set when the browser should be replaced: no new tabs, existing ones are closed as they come back
+        self.retiring = False
+
+    @property
+    def has_room(self):
+        return not self.retiring and self.reserved < self.max_tabs
+
+    def run(self, handle, fn, *args, **kwargs):
+        """Call fn with the browser switched to `handle`"""
+        args = [a.element if isinstance(a, TabElement) else a for a in args]
+        with self.lock:
+            if self.current != handle:
+                self.driver.switch_to.window(handle)
+                self.current = handle
+            return fn(*args, **kwargs)
+
+    def open_tab(self, factory, setup=None):
+        """Open a tab, launching the browser with `factory` first if it isn't running yet
+
+        `setup` is called with each tab after the first - per-page CDP settings
+        like blocked URLs don't carry over from the tab the factory set up.
+        """
+        with self.lock:
+            if self.driver is None:
+                self.driver = factory()
+                self.current = self.driver.current_window_handle
+                tab = TabDriver(self, self.current)
+            else:
+                tab = self.new_context_tab()
+                if setup:
+                    setup(tab)
+            self.tabs.append(tab)
+            return tab
+
+    def new_context_tab(self):
+        driver = self.driver
+        try:
+            context_id = driver.execute_cdp_cmd('Target.createBrowserContext', {})['browserContextId']
+            target_id = driver.execute_cdp_cmd('Target.createTarget', {
+                'url': 'about:blank',
+                'browserContextId': context_id,
+                'background': True,
+            })['targetId']
+        except Exception as e:
+            logger.warning(f"Could not create an isolated tab ({e}) - sharing the default context")
+            return self.plain_tab()
+
+        # chromedriver's window handles are DevTools target ids
+        handle = next((h for h in driver.window_handles if h.upper().endswith(target_id.upper())), None)
+        if handle is None:
+            logger.warning("chromedriver can't see tabs in new browser contexts - sharing the default context")
+            self.dispose_context(context_id, target_id)
+            return self.plain_tab()
+        return TabDriver(self, handle, context_id, target_id)
+
+    def plain_tab(self):
+        driver = self.driver
+        driver.switch_to.new_window('tab')
+        self.current = driver.current_window_handle
+        return TabDriver(self, self.current)
+
+    def dispose_context(self, context_id, target_id=None):
+        try:
+            if target_id:
+                self.driver.execute_cdp_cmd('Target.closeTarget', {'targetId': target_id})
+            self.driver.execute_cdp_cmd('Target.disposeBrowserContext', {'browserContextId': context_id})
+        except Exception as e:
+            logger.debug(f"Error disposing browser context {context_id}: {e}")
+
+    def close_tab(self, tab):
+        """Close one tab and its browser context - the browser keeps running"""
+        with self.lock:
+            if tab in self.tabs:
+                self.tabs.remove(tab)
+            try:
+                if tab.context_id:
+                    # CDP commands go to the current tab, which mustn't be the one being closed
+                    other = next((t.handle for t in self.tabs), None)
+                    if other and self.current == tab.handle:
+                        self.driver.switch_to.window(other)
+                        self.current = other
+                    self.dispose_context(tab.context_id, tab.target_id)
+                else:
+                    self.run(tab.handle, self.driver.close)
+                    self.current = None
+            except Exception as e:
+                logger.debug(f"Error closing tab {tab.handle}: {e}")
+
+
+class TabProxy:
+    """Forwards attribute access to a WebDriver object, switched to the right tab first"""
+
+    def __init__(self, browser, handle, target):
+        self._browser = browser
+        self._handle = handle
+        self._target = target
+
+    def __getattr__(self, name):
+        # Properties like title and page_source are driver commands, so even plain lookups go through run()
+        value = self._browser.run(self._handle, getattr, self._target, name)
+        if callable(value):
+            return lambda *args, **kwargs: self._wrap(self._browser.run(self._handle, value, *args, **kwargs))
+        return self._wrap(value)
+
+    def _wrap(self, value):
+        if isinstance(value, WebElement):
+            return TabElement(self._browser, self._handle, value)
+        if isinstance(value, list) and value and isinstance(value[0], WebElement):
+            return [TabElement(self._browser, self._handle, v) for v in value]
+        return value
+
+
+class TabDriver(TabProxy):
+    """What a pooled render sees as its driver when browsers are shared between tabs"""
+
+    def __init__(self, browser, handle, context_id=None, target_id=None):
+        super().__init__(browser, handle, browser.driver)
+        self.handle = handle
+        self.context_id = context_id
+        self.target_id = target_id
+
+    @property
+    def browser(self):
+        return self._browser
+
+    def load(self, url, timeout):
+        """Navigate and wait for the new page, holding the browser only while sending commands"""
+        self.execute_script(MARK_DOCUMENT_SCRIPT)
+        self.get(url)
+        # Scripts can fail while the old document is being torn down - just poll again
+        WebDriverWait(self, timeout, poll_frequency=0.1, ignored_exceptions=(JavascriptException,)).until(
+            lambda d: d.execute_script(NEW_DOCUMENT_READY_SCRIPT)
+        )
+
+
+class TabElement(TabProxy):
+    """A WebElement from a tab - its commands switch to that tab too"""
+
+    def __init__(self, browser, handle, element):
+        super().__init__(browser, handle, element)
+        self.element = element
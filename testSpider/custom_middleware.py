@@ -1,28 +1,76 @@
-import zipfile
+import time
 import pathlib
 import logging
 import csv
-import random
 import os
-import requests
+import shutil
 import undetected_chromedriver as uc
+from scrapy import signals
 from scrapy.http import HtmlResponse
-from fake_useragent import UserAgent
+from scrapy.exceptions import IgnoreRequest
 from scrapy_selenium import SeleniumRequest
 from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException
 from testSpider.proxy_validator import ProxyValidator
+from testSpider.proxy_pool import ProxyPool
+from testSpider.proxy_scheduler import ProxyScheduler
+from testSpider.proxy_sources import ProxySources
+from testSpider.proxy_store import ProxyHealthStore
+from testSpider.forward_proxy import ForwardProxy
+from testSpider.driver_pool import DriverPool
+from testSpider.browser_tabs import TAB_ARGUMENTS, TabDriver
+from testSpider.browser_profile import BrowserProfile
+from testSpider.page_snapshot import read_page
+from testSpider.render_cache import RenderCache
+from testSpider.render_request import RenderRequest
+from testSpider.timings import StageTimer, observe
+from testSpider.network_capture import PERFORMANCE_LOGGING, capture_json, drain_log
+from testSpider.render_policy import CHALLENGE_TITLES, RENDER_ALWAYS, RENDER_AUTO, get_render_policy, needs_browser
+from testSpider.render_failures import (
+    CHALLENGE, FAILURE_ACTIONS, OTHER, PROXY_ERROR, PROXY_FAILURES, WAIT, RenderFailure, classify_failure,
+)
+from testSpider.waits import wait_for_title_change
+from testSpider.warm_start import ProfileTemplate, patched_driver_path, user_agents
 
 
 class SeleniumMiddleware(object):
     
-    def __init__(self, max_requests_per_driver=1000000):
-        self.driver = None
-        self.request_count = 0
-        self.max_requests_per_driver = max_requests_per_driver
+    def __init__(self, max_requests_per_driver=1000000, pool_size=1,
+                 validation_concurrency=1000, validation_target=50, proxy_refresh_interval=3600,
+                 max_driver_rss_mb=0, rss_check_every=10, prespawn=0, tabs_per_browser=1):
         self.logger = logging.getLogger(__name__)
+        self.stats = None
+        self.keep_browser_open = True
+        self.render_policy = RENDER_ALWAYS
+        self.profile = BrowserProfile()
+        self.capture_network = False
+        self.page_load_timeout = 30
+        self.challenge_wait = 15
+        self.max_render_retries = 2
+        # Patch chromedriver once, copy a ready-made profile and reuse one UserAgent - see warm_start
+        self.warm_start = True
+        self.profile_template = ProfileTemplate()
+        # Rendered pages kept on disk for replay - see RenderCache
+        self.render_cache = None
+        self.render_cache_offline = False
+        
+        # Pool of browsers - each SeleniumRequest checks one out and the spider
+        # middleware below checks it back in once the callback is done with it
+        self.driver_pool = DriverPool(
+            self.init_driver,
+            size=pool_size,
+            max_requests_per_driver=max_requests_per_driver,
+            max_rss_mb=max_driver_rss_mb,
+            rss_check_every=rss_check_every,
+            prespawn=prespawn,
+            tabs_per_browser=tabs_per_browser,
+            setup_tab=self.init_tab,
+        )
         
         # Default settings (will be overridden by from_crawler)
         self.proxy_enabled = True
+        self.proxy_forwarding = True
+        self.proxy_rotate_every = 0
         self.proxy_api_urls = [
             'https://proxylist.geonode.com/api/proxy-list?country=JP&limit=500&page=1&sort_by=lastChecked&sort_type=desc',
             'https://proxylist.geonode.com/api/proxy-list?country=AU&limit=500&page=1&sort_by=lastChecked&sort_type=desc',
@@ -30,279 +78,384 @@ class SeleniumMiddleware(object):
             'https://api.proxyscrape.com/v2/?request=getproxies&protocol=socks5&timeout=10000&country=all',
         ]
         
-        # Load proxy lists
+        # Proxies come from the cache straight away and are refreshed in the
+        # background once the spider opens - see ProxyPool
         self.proxy_validator = ProxyValidator()
-        self.proxy_list = self.load_proxies()
-        self.current_proxy_index = 0
-        self.logger.info(f"Loaded {len(self.proxy_list)} proxies")
+        self.proxy_sources = ProxySources()
+        self.proxy_pool = ProxyPool(
+            self.proxy_validator,
+            self.fetch_proxies,
+            refresh_interval=proxy_refresh_interval,
+            validation_concurrency=validation_concurrency,
+            validation_target=validation_target,
+        )
 
     @classmethod
     def from_crawler(cls, crawler):
         """Create instance from crawler"""
-        middleware = cls()
+        tabs_per_browser = crawler.settings.getint('SELENIUM_TABS_PER_BROWSER', 1)
+        if tabs_per_browser > 1 and crawler.settings.getbool('SELENIUM_NETWORK_CAPTURE', False):
+            # The performance log is per browser, so tabs would see each other's responses
+            logging.getLogger(__name__).warning(
+                "SELENIUM_NETWORK_CAPTURE can't tell tabs apart - using one tab per browser")
+            tabs_per_browser = 1
+        middleware = cls(
+            max_requests_per_driver=crawler.settings.getint('SELENIUM_MAX_REQUESTS_PER_DRIVER', 1000000),
+            pool_size=crawler.settings.getint('SELENIUM_POOL_SIZE', 1),
+            validation_concurrency=crawler.settings.getint('PROXY_VALIDATION_CONCURRENCY', 1000),
+            validation_target=crawler.settings.getint('PROXY_VALIDATION_TARGET', 50),
+            proxy_refresh_interval=crawler.settings.getfloat('PROXY_REFRESH_INTERVAL', 3600),
+            max_driver_rss_mb=crawler.settings.getint('SELENIUM_MAX_DRIVER_RSS_MB', 0),
+            rss_check_every=crawler.settings.getint('SELENIUM_RSS_CHECK_EVERY', 10),
+            prespawn=crawler.settings.getint('SELENIUM_PRESPAWN', 0),
+            tabs_per_browser=tabs_per_browser,
+        )
+        middleware.stats = crawler.stats
+        middleware.driver_pool.stats = crawler.stats
+        if crawler.settings.getbool('RENDER_CACHE_ENABLED', False):
+            middleware.render_cache = RenderCache(
+                crawler.settings.get('RENDER_CACHE_DIR', 'render_cache'),
+                ttl=crawler.settings.getfloat('RENDER_CACHE_TTL', 0),
+                max_bytes=crawler.settings.getint('RENDER_CACHE_MAX_MB', 500) * 1024 * 1024,
+            )
+            middleware.render_cache_offline = crawler.settings.getbool('RENDER_CACHE_OFFLINE', False)
+            middleware.driver_pool.render_cache = middleware.render_cache
+        middleware.keep_browser_open = crawler.settings.getbool('SELENIUM_KEEP_BROWSER_OPEN', True)
+        middleware.render_policy = crawler.settings.get('SELENIUM_RENDER_POLICY', RENDER_ALWAYS)
+        middleware.profile = BrowserProfile.from_settings(crawler.settings)
+        middleware.capture_network = crawler.settings.getbool('SELENIUM_NETWORK_CAPTURE', False)
+        middleware.page_load_timeout = crawler.settings.getfloat('SELENIUM_PAGE_LOAD_TIMEOUT', 30)
+        middleware.challenge_wait = crawler.settings.getfloat('SELENIUM_CHALLENGE_WAIT', 15)
+        middleware.max_render_retries = crawler.settings.getint('SELENIUM_MAX_RENDER_RETRIES', 2)
+        middleware.warm_start = crawler.settings.getbool('SELENIUM_WARM_START', True)
+        template = crawler.settings.get('SELENIUM_PROFILE_TEMPLATE', 'chrome_profile_template')
+        middleware.profile_template = ProfileTemplate(template) if template else None
         middleware.proxy_enabled = crawler.settings.getbool('PROXY_ROTATION_ENABLED', True)
+        middleware.proxy_forwarding = crawler.settings.getbool('PROXY_FORWARDING', True)
+        middleware.proxy_rotate_every = crawler.settings.getint('PROXY_ROTATE_EVERY', 0)
         middleware.proxy_api_urls = crawler.settings.getlist('PROXY_API_URLS', [
             'https://proxylist.geonode.com/api/proxy-list?country=JP&limit=500&page=1&sort_by=lastChecked&sort_type=desc',
             'https://proxylist.geonode.com/api/proxy-list?country=AU&limit=500&page=1&sort_by=lastChecked&sort_type=desc',
             'https://api.proxyscrape.com/v2/?request=getproxies&protocol=socks4&timeout=10000&country=all',
             'https://api.proxyscrape.com/v2/?request=getproxies&protocol=socks5&timeout=10000&country=all',
         ])
+        store_file = crawler.settings.get('PROXY_STORE_FILE', 'proxy_health.sqlite3')
+        if store_file:
+            middleware.proxy_validator.store = ProxyHealthStore(store_file)
+        middleware.proxy_validator.recheck_after = crawler.settings.getfloat('PROXY_RECHECK_AFTER', 900)
+        middleware.proxy_pool.scheduler = ProxyScheduler(
+            base_penalty=crawler.settings.getfloat('PROXY_PENALTY_BASE', 30),
+            max_penalty=crawler.settings.getfloat('PROXY_PENALTY_MAX', 1800),
+            max_failures=crawler.settings.getint('PROXY_MAX_FAILURES', 5),
+        )
+        middleware.proxy_sources = ProxySources(
+            timeout=crawler.settings.getfloat('PROXY_SOURCE_TIMEOUT', 10),
+            ttl=crawler.settings.getfloat('PROXY_SOURCE_TTL') or None,
+        )
+        crawler.signals.connect(middleware.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(middleware.spider_closed, signal=signals.spider_closed)
         return middleware
     
-    def load_proxies_from_geonode(self, api_url):
-        """Load proxies from Geonode API (JSON format)"""
-        proxy_list = []
-        try:
-            self.logger.info(f"Fetching from Geonode API: {api_url}")
-            response = requests.get(api_url, timeout=10)
-            response.raise_for_status()
-            
-            data = response.json()
-            proxies = data.get('data', [])
-            
-            for proxy_data in proxies:
-                ip = proxy_data.get('ip', '')
-                port = proxy_data.get('port', '')
-                protocols = proxy_data.get('protocols', [])
-                anonymity = proxy_data.get('anonymityLevel', '')
-                country = proxy_data.get('country', '')
-                
-                # Only use elite proxies
-                if anonymity == 'elite' and ip and port:
-                    protocol = protocols[0] if protocols else 'socks5'
-                    proxy_list.append({
-                        'ip': ip,
-                        'port': str(port),
-                        'protocol': protocol,
-                        'anonymity': anonymity,
-                        'country': country
-                    })
-            
-            self.logger.info(f"Loaded {len(proxy_list)} elite proxies from Geonode")
-            
-        except Exception as e:
-            self.logger.error(f"Error fetching from Geonode API: {e}")
-        
-        return proxy_list
-    
-    def load_proxies_from_proxyscrape(self, api_url):
-        """Load proxies from ProxyScrape API (text format)"""
-        proxy_list = []
-        try:
-            self.logger.info(f"Fetching from ProxyScrape API: {api_url}")
-            response = requests.get(api_url, timeout=10)
-            response.raise_for_status()
-            
-            # Parse protocol from URL
-            if 'protocol=http' in api_url:
-                protocol = 'http'
-            elif 'protocol=socks4' in api_url:
-                protocol = 'socks4'
-            elif 'protocol=socks5' in api_url:
-                protocol = 'socks5'
-            else:
-                protocol = 'http'
-            
-            # Parse country from URL (if available)
-            country = 'Unknown'
-            if 'country=' in api_url:
-                country_param = api_url.split('country=')[1].split('&')[0]
-                country = country_param if country_param != 'all' else 'Mixed'
-            
-            # Parse text response (format: IP:PORT per line)
-            lines = response.text.strip().split('\n')
-            for line in lines:
-                line = line.strip()
-                if ':' in line:
-                    try:
-                        ip, port = line.split(':', 1)
-                        proxy_list.append({
-                            'ip': ip.strip(),
-                            'port': port.strip(),
-                            'protocol': protocol,
-                            'anonymity': 'unknown',
-                            'country': country
-                        })
-                    except:
-                        continue
-            
-            self.logger.info(f"Loaded {len(proxy_list)} proxies from ProxyScrape ({protocol})")
-            
-        except Exception as e:
-            self.logger.error(f"Error fetching from ProxyScrape API: {e}")
-        
-        return proxy_list
+    @property
+    def proxy_list(self):
+        return self.proxy_pool.proxies
     
     def load_proxies(self):
-        """Load proxies from multiple API sources"""
-        # Try to load from cache first
-        cached_proxies = self.proxy_validator.load_cache()
-        if cached_proxies:
-            self.logger.info(f"Using {len(cached_proxies)} cached working proxies")
-            return cached_proxies
-        
-        # Fetch from APIs
-        all_proxies = []
-        
-        for api_url in self.proxy_api_urls:
-            if 'geonode.com' in api_url:
-                proxies = self.load_proxies_from_geonode(api_url)
-            elif 'proxyscrape.com' in api_url:
-                proxies = self.load_proxies_from_proxyscrape(api_url)
-            else:
-                self.logger.warning(f"Unknown API format: {api_url}")
-                continue
-            
-            all_proxies.extend(proxies)
-        
-        # Remove duplicates
-        seen = set()
-        unique_proxies = []
-        for proxy in all_proxies:
-            key = f"{proxy['ip']}:{proxy['port']}"
-            if key not in seen:
-                seen.add(key)
-                unique_proxies.append(proxy)
-        
+        """Fill the proxy pool and wait for it - for scripts that need proxies before crawling"""
+        self.proxy_pool.start()
+        if not self.proxy_pool.proxies:
+            # start() is already refreshing on its thread - wait for that rather than run a second one
+            self.proxy_pool.wait_for_refresh()
+        self.logger.info(f"Loaded {len(self.proxy_list)} proxies")
+        return self.proxy_list
+    
+    def fetch_proxies(self):
+        """Fetch candidate proxies from every API source at once"""
+        unique_proxies = self.proxy_sources.fetch_all(self.proxy_api_urls)
         self.logger.info(f"Fetched {len(unique_proxies)} unique proxies from APIs")
-        
-        # Validate proxies (test more, faster)
-        self.logger.info("Validating proxies...")
-        working_proxies = self.proxy_validator.validate_proxy_list(unique_proxies, max_workers=50, max_test=150)
-        
-        if working_proxies:
-            self.logger.info(f"✓ Found {len(working_proxies)} working proxies")
-            self.proxy_validator.save_cache(working_proxies)
-            random.shuffle(working_proxies)
-            return working_proxies
-        else:
-            self.logger.warning("⚠️  No working proxies - running without proxy")
-            self.proxy_enabled = False
-            return []
+        return unique_proxies
     
     def get_next_proxy(self):
-        """Get next proxy from the list (rotation)"""
+        """Pick the proxy for a new browser - see ProxyScheduler"""
         if not self.proxy_enabled:
             return None
             
-        if not self.proxy_list:
-            self.logger.warning("No proxies available")
+        proxy = self.proxy_pool.next()
+        if not proxy:
+            self.logger.warning("No proxies available yet")
             return None
         
-        proxy = self.proxy_list[self.current_proxy_index]
-        self.current_proxy_index = (self.current_proxy_index + 1) % len(self.proxy_list)
-        
         self.logger.info(f"Using proxy: {proxy['ip']}:{proxy['port']} ({proxy['protocol']}) - {proxy['country']}")
         return proxy
 
+    def spider_opened(self, spider):
+        if self.render_cache_offline:
+            self.logger.info(f"📼 Replaying {len(self.render_cache)} cached pages - no browsers or proxies")
+            return
+        if self.proxy_enabled:
+            self.proxy_pool.start()
+            self.logger.info(f"Starting with {len(self.proxy_list)} cached proxies - refreshing in the background")
+        if self.driver_pool.prespawn:
+            self.logger.info(f"Pre-spawning {min(self.driver_pool.prespawn, self.driver_pool.size)} browser(s)")
+            self.driver_pool.fill()
+
     def spider_closed(self, spider):
-        # Don't close browser automatically - keep it open for inspection
-        if self.driver:
-            self.logger.info("⚠️  Browser window left open for inspection")
-            # self.driver.quit()  # Commented out to keep browser open
+        self.proxy_pool.stop()
+        if self.keep_browser_open:
+            # Don't close browsers - keep them open for inspection
+            if self.driver_pool.drivers:
+                self.logger.info(f"⚠️  {len(self.driver_pool.drivers)} browser window(s) left open for inspection")
+            self.driver_pool.stop_threads()
+            return
+        self.driver_pool.close()
 
     def process_request(self, request, spider):
+        if not isinstance(request, SeleniumRequest):
+            self.logger.debug("Request is not a SeleniumRequest")
+            return None
+
+        if self.render_cache is not None and request.meta.get('render_cache', True):
+            cached = self.render_cache.load(request)
+            if cached:
+                self.inc_stat('render_cache/hits')
+                url, body = cached
+                request.meta['render_cached'] = True
+                return HtmlResponse(url, body=body, encoding='utf-8', request=request)
+            self.inc_stat('render_cache/misses')
+            if self.render_cache_offline:
+                raise IgnoreRequest(f"Not in the render cache: {request.url}")
+
+        # Scripts can only run in a browser, and escalated requests already failed over HTTP
+        if (get_render_policy(request, spider, self.render_policy) == RENDER_AUTO
+                and not request.script and request.meta.get('render_attempt') != 'browser'):
+            self.logger.debug(f"Trying plain HTTP first: {request.url}")
+            request.meta['render_attempt'] = 'http'
+            self.inc_stat('selenium/http_first')
+            return None
+
         self.logger.debug(f"Processing request: {request.url}")
+        request.meta['render_attempt'] = 'browser'
+        self.inc_stat('selenium/browser_renders')
+        d = self.driver_pool.checkout()
+        d.addCallback(self.acquired, time.perf_counter())
+        d.addCallback(self.render_in_thread, request, spider)
+        return d
 
-        if not self.driver or self.request_count >= self.max_requests_per_driver:
-            self.logger.debug("Initializing new driver")
-            self.init_driver()
-            self.request_count = 0
+    def acquired(self, pooled, started):
+        # Waiting for a free browser, plus launching one if the pool had room
+        observe(self.stats, 'acquire', time.perf_counter() - started)
+        return pooled
 
-        if not isinstance(request, SeleniumRequest):
-            self.logger.debug("Request is not a SeleniumRequest")
+    def process_response(self, request, response, spider):
+        if request.meta.get('render_attempt') != 'http':
+            return response
+
+        reason = needs_browser(response, request.meta.get('render_required_css'))
+        if not reason:
+            self.inc_stat('selenium/http_first_ok')
+            # Replays come back as 200 pages - so no error pages, and no redirect stubs
+            # (RedirectMiddleware sees the response after this one)
+            if (self.render_cache is not None and request.meta.get('render_cache', True)
+                    and response.status == 200):
+                self.render_cache.store(request, response.url, response.body)
+            return response
+
+        self.logger.info(f"🔁 Escalating to browser ({reason}): {request.url}")
+        return self.escalate(request)
+
+    def process_exception(self, request, exception, spider):
+        if request.meta.get('render_attempt') != 'http':
             return None
 
-        try:
-            self.logger.debug(f"Getting URL: {request.url}")
-            self.driver.get(request.url)
-            self.logger.debug(f"Page title: {self.driver.title}")
+        self.logger.info(f"🔁 Escalating to browser ({exception!r}): {request.url}")
+        return self.escalate(request)
+
+    def escalate(self, request):
+        """Re-issue an HTTP-first SeleniumRequest so it is rendered in Chrome"""
+        self.inc_stat('selenium/escalated')
+        return self.copy_request(request, render_attempt='browser')
+
+    def copy_request(self, request, **meta):
+        """Copy a SeleniumRequest with extra meta, bypassing the dupe filter"""
+        if isinstance(request, RenderRequest):
+            # Its fields are all in `attributes`, which replace() copies
+            return request.replace(meta={**request.meta, **meta}, dont_filter=True)
+        # SeleniumRequest's own fields aren't in Request.attributes, so replace() would drop them
+        return request.replace(
+            wait_time=request.wait_time,
+            wait_until=request.wait_until,
+            screenshot=request.screenshot,
+            script=request.script,
+            meta={**request.meta, **meta},
+            dont_filter=True,
+        )
+
+    def inc_stat(self, key, count=1):
+        if self.stats:
+            self.stats.inc_value(key, count)
+
+    def switch_proxy(self, pooled):
+        """Point a browser's forwarding proxy at the next proxy - no relaunch needed"""
+        forward_proxy = getattr(pooled.browser_driver, 'forward_proxy', None)
+        if not forward_proxy:
+            return False
+        pooled.proxy = self.get_next_proxy()
+        # Dropping tunnels would fail whatever the browser's other tabs are loading,
+        # so with tabs the switch applies to new connections only
+        forward_proxy.set_upstream(pooled.proxy, drop_connections=pooled.browser is None)
+        self.inc_stat('proxy/switches')
+        return True
+
+    def render_in_thread(self, pooled, request, spider):
+        rotate_due = self.proxy_rotate_every and pooled.request_count and pooled.request_count % self.proxy_rotate_every == 0
+        if self.proxy_enabled and (rotate_due or request.meta.get('rotate_proxy')):
+            self.switch_proxy(pooled)
+        elif self.proxy_enabled and pooled.proxy is None and len(self.proxy_pool):
+            # Launched direct before the first proxies were validated - move it onto one now
+            self.switch_proxy(pooled)
+        d = pooled.call(self.render, pooled.driver, request)
+        d.addCallbacks(self.rendered, self.render_failed,
+                       callbackArgs=(pooled, request), errbackArgs=(pooled, request))
+        return d
 
-            if request.wait_until:
-                WebDriverWait(self.driver, request.wait_time).until(
+    def render(self, driver, request):
+        """Load the request in a driver and collect what the response needs - runs on a browser thread"""
+        capture_patterns = request.meta.get('capture_network')
+        if self.capture_network:
+            # Throw away events from the previous page
+            drain_log(driver)
+
+        self.logger.debug(f"Getting URL: {request.url}")
+        started = time.time()
+        timer = StageTimer()
+        if isinstance(driver, TabDriver):
+            # pageLoadStrategy 'none' - get() returns at once, the wait leaves the browser free for other tabs
+            driver.load(request.url, self.page_load_timeout)
+        else:
+            driver.get(request.url)
+        timer.mark('get')
+        self.logger.debug(f"Page title: {driver.title}")
+
+        # Navigation errors don't always raise - Chrome shows its own error page instead
+        if driver.current_url.startswith('chrome-error://'):
+            raise RenderFailure(PROXY_ERROR, f"Chrome error page loading {request.url}")
+        title = driver.title.lower()
+        marker = next((m for m in CHALLENGE_TITLES if m in title), None)
+        if marker and not wait_for_title_change(driver, marker, timeout=self.challenge_wait):
+            raise RenderFailure(CHALLENGE, f"Challenge page did not clear: {driver.title!r}")
+
+        if request.wait_until:
+            try:
+                WebDriverWait(driver, request.wait_time).until(
                     request.wait_until
                 )
+            except TimeoutException:
+                raise RenderFailure(WAIT, f"wait_until not met within {request.wait_time}s on {request.url}")
+        elapsed = time.time() - started
+        timer.mark('wait')
 
-            if request.script:
-                self.driver.execute_script(request.script)
-
-            body = str.encode(self.driver.page_source)
-            self.request_count += 1
-            request.meta.update({'driver': self.driver})
-            self.logger.debug(f"Processed request successfully: {request.url}")
-            return HtmlResponse(self.driver.current_url, body=body, encoding='utf-8', request=request)
-
-        except Exception as e:
-            self.logger.error(f"Error processing request {request.url}: {e}")
-            pass
-
-    def getPlugin(self, proxy_host, proxy_port, proxy_user, proxy_pass):
-        manifest_json = """
-        {
-            "version": "1.0.0",
-            "manifest_version": 2,
-            "name": "Chrome Proxy",
-            "permissions": [
-                "proxy",
-                "tabs",
-                "unlimitedStorage",
-                "storage",
-                "<all_urls>",
-                "webRequest",
-                "webRequestBlocking"
-            ],
-            "background": {
-                "scripts": ["background.js"]
-            },
-            "minimum_chrome_version":"22.0.0"
-        }
-        """
-        background_js = """
-        var config = {
-                mode: "fixed_servers",
-                rules: {
-                singleProxy: {
-                    scheme: "http",
-                    host: "%s",
-                    port: parseInt(%s)
-                },
-                bypassList: ["localhost"]
-                }
-            };
-        chrome.proxy.settings.set({value: config, scope: "regular"}, function() {});
-        function callbackFn(details) {
-            return {
-                authCredentials: {
-                    username: "%s",
-                    password: "%s"
-                }
-            };
+        if request.script:
+            driver.execute_script(request.script)
+            timer.mark('script')
+
+        # The DOM crosses the WebDriver wire once here - just the render_selector
+        # subtree if one is set, or nothing if the spider will take a snapshot itself
+        body = b''
+        if request.meta.get('render_body', True):
+            body = read_page(driver, request.meta.get('render_selector')).encode('utf-8')
+            timer.mark('page_source')
+        if self.render_cache is not None and body and request.meta.get('render_cache', True):
+            self.render_cache.store(request, driver.current_url, body)
+
+        return {
+            'elapsed': elapsed,
+            'timings': timer,
+            'url': driver.current_url,
+            'body': body,
+            'page_bytes': self.profile.page_bytes(driver),
+            'network_json': capture_json(driver, capture_patterns) if self.capture_network and capture_patterns else [],
         }
-        chrome.webRequest.onAuthRequired.addListener(
-                    callbackFn,
-                    {urls: ["<all_urls>"]},
-                    ['blocking']
-        );
-        """ % (proxy_host, proxy_port, proxy_user, proxy_pass)
-        pluginfile = 'scraper\\userdata\\proxy_auth_plugin.zip'
-        with zipfile.ZipFile(pluginfile, 'w') as zp:
-            zp.writestr("manifest.json", manifest_json)
-            zp.writestr("background.js", background_js)
-        return pluginfile
+
+    def rendered(self, result, pooled, request):
+        pooled.request_count += 1
+        self.proxy_pool.report(pooled.proxy, ok=True, latency=result['elapsed'])
+        request.meta['page_bytes'] = result['page_bytes']
+        request.meta['network_json'] = result['network_json']
+        request.meta['dom_bytes'] = len(result['body'])
+        result['timings'].observe(self.stats)
+        self.inc_stat('selenium/page_bytes', result['page_bytes'])
+        self.inc_stat('selenium/dom_bytes', len(result['body']))
+        if self.stats:
+            self.stats.max_value('selenium/dom_bytes_max', len(result['body']))
+        self.inc_stat('selenium/network_json', len(result['network_json']))
+        # The spider keeps using the driver, so it stays checked out until
+        # SeleniumSpiderMiddleware sees the callback finish
+        request.meta.update({'driver': pooled.driver, 'pooled_driver': pooled})
+        self.logger.debug(f"Processed request successfully: {request.url} (driver #{pooled.slot})")
+        return HtmlResponse(result['url'], body=result['body'], encoding='utf-8', request=request)
+
+    def render_failed(self, failure, pooled, request):
+        kind = classify_failure(failure.value)
+        self.inc_stat(f'selenium/failures/{kind}')
+        self.logger.error(f"Render failed ({kind}) for {request.url}: {failure.value}")
+
+        if pooled.proxy and kind in PROXY_FAILURES:
+            self.inc_stat('proxy/failures')
+            self.proxy_pool.report(pooled.proxy, ok=False)
+
+        action = FAILURE_ACTIONS.get(kind, {})
+        new_driver = action.get('new_driver', False)
+        # A browser on a bad, benched or evicted proxy moves to another one -
+        # by switching its forwarding proxy, or failing that by relaunching
+        if self.proxy_enabled and (action.get('new_proxy') or self.proxy_pool.is_benched(pooled.proxy)):
+            if not self.switch_proxy(pooled):
+                new_driver = True
+
+        if new_driver:
+            pooled.release(healthy=False)
+            return self.retry_render(request, kind)
+
+        d = pooled.call(self.driver_pool.is_healthy, pooled)
+        d.addCallback(lambda healthy: pooled.release(healthy=healthy))
+        d.addCallback(lambda _: self.retry_render(request, kind))
+        return d
+
+    def retry_render(self, request, kind):
+        """A fresh copy of the request to render again, or None to fall through to the downloader"""
+        retries = request.meta.get('render_retries', 0)
+        if kind == OTHER or retries >= self.max_render_retries:
+            # Fall through to the regular downloader, as before
+            return None
+        self.inc_stat('selenium/retries')
+        self.logger.info(f"🔁 Retrying render ({kind}, attempt {retries + 2}): {request.url}")
+        return self.copy_request(request, render_retries=retries + 1)
 
     def driver_return(self):
         options = uc.ChromeOptions()
-        ua = UserAgent(browsers=['chrome'])
+        ua = user_agents()
         options.add_argument("--window-size=1920,1080")
         options.add_argument("--disable-blink-features=AutomationControlled")
         options.add_argument("--no-sandbox")
         options.add_argument("--disable-dev-shm-usage")
         options.add_argument("--lang=en-US")
         options.add_argument(f'--user-agent={ua.random}')
+        if self.driver_pool.tabs_per_browser > 1:
+            for argument in TAB_ARGUMENTS:
+                options.add_argument(argument)
+            options.page_load_strategy = 'none'
         
         # Add proxy configuration
         proxy = self.get_next_proxy()
-        if proxy:
+        forward_proxy = None
+        if self.proxy_enabled and self.proxy_forwarding:
+            # Chrome only ever talks to a local forwarder; the upstream behind it
+            # can be switched per request without restarting the browser
+            forward_proxy = ForwardProxy()
+            forward_proxy.set_upstream(proxy, drop_connections=False)
+            options.add_argument(f'--proxy-server={forward_proxy.start()}')
+            self.logger.info(f"Configured forwarding proxy {forward_proxy.address} -> "
+                             f"{proxy['ip'] + ':' + str(proxy['port']) if proxy else 'direct'}")
+        elif proxy:
             protocol = proxy['protocol']
             ip = proxy['ip']
             port = proxy['port']
@@ -325,18 +478,92 @@ class SeleniumMiddleware(object):
         
         prefs = {
             "download_restrictions": 3,
+            **self.profile.apply(options),
         }
         options.add_experimental_option(
             "prefs", prefs
         )
+        if self.capture_network:
+            options.set_capability('goog:loggingPrefs', PERFORMANCE_LOGGING)
         
         scriptDirectory = pathlib.Path().absolute()
         # options.add_argument(f"--user-data-dir={scriptDirectory}\\testSpider\\userdata")
-        driver = uc.Chrome(options=options, headless=False, use_subprocess=False)
+        launch_options = {}
+        profile_dir = None
+        if self.warm_start:
+            launch_options['driver_executable_path'] = patched_driver_path()
+            if self.profile_template and self.profile_template.ensure(self.build_profile_template):
+                profile_dir = self.profile_template.copy()
+                launch_options['user_data_dir'] = profile_dir
+        try:
+            driver = uc.Chrome(options=options, headless=self.profile.headless, use_subprocess=False,
+                               **launch_options)
+        except Exception:
+            if forward_proxy:
+                forward_proxy.stop()
+            if profile_dir:
+                shutil.rmtree(profile_dir, ignore_errors=True)
+            raise
+        driver.proxy = proxy
+        driver.forward_proxy = forward_proxy
+        driver.profile_dir = profile_dir
         return driver
 
+    def build_profile_template(self, user_data_dir):
+        """Run Chrome once in `user_data_dir` so it writes its first-run state there"""
+        options = uc.ChromeOptions()
+        options.add_argument("--no-sandbox")
+        options.add_argument("--disable-dev-shm-usage")
+        driver = uc.Chrome(options=options, headless=True, use_subprocess=False, user_data_dir=user_data_dir,
+                           driver_executable_path=patched_driver_path())
+        try:
+            driver.get('about:blank')
+        finally:
+            driver.quit()
+
     def init_driver(self):
-        if self.driver:
-            self.driver.quit()
-        self.driver = self.driver_return()
-        self.driver.maximize_window()
\ No newline at end of file
+        driver = self.driver_return()
+        # Hung loads surface as TimeoutException (a 'timeout' failure) instead of blocking a browser thread
+        driver.set_page_load_timeout(self.page_load_timeout)
+        self.profile.setup_driver(driver)
+        return driver
+
+    def init_tab(self, tab):
+        self.profile.setup_driver(tab)
+
+
+class SeleniumSpiderMiddleware(object):
+    """Checks pooled drivers back in once the spider callback has finished with them"""
+
+    def process_spider_output(self, response, result, spider):
+        try:
+            for r in result:
+                yield r
+        finally:
+            self.release_driver(response)
+
+    async def process_spider_output_async(self, response, result, spider):
+        try:
+            async for r in result:
+                yield r
+        finally:
+            self.release_driver(response)
+
+    def process_spider_exception(self, response, exception, spider):
+        self.release_driver(response)
+        return None
+
+    def release_driver(self, response):
+        pooled = response.meta.pop('pooled_driver', None)
+        if not pooled:
+            return
+        driver = response.meta.pop('driver', None)
+        cache = pooled.pool.render_cache
+        final = response.meta.get('render_cache_final') and response.meta.get('render_cache', True)
+        if cache is not None and driver and final:
+            # Replace the cached render with the page as the callback left it (after clicks etc.)
+            d = pooled.call(cache.store_page, response.request, driver)
+            d.addErrback(lambda f: logging.getLogger(__name__).warning(f"Could not cache final page: {f.value}"))
+            d.addBoth(lambda _: pooled.release())
+            return
+        pooled.release()
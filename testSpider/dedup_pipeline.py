@@ -0,0 +1,199 @@
+"""
+Dedup pipeline - drop cards already seen in this run before they reach Supabase
+"""
+import os
+import math
+import hashlib
+import logging
+from pathlib import Path
+from twisted.internet import threads
+from scrapy import signals
+from scrapy.exceptions import DropItem
+from scrapy.logformatter import LogFormatter
+from supabase import create_client
+from dotenv import load_dotenv
+from testSpider.supabase_pipeline import cards_saved
+
+# Load environment variables
+load_dotenv()
+
+
+def card_key(name, tag):
+    """64-bit digest of a card's (name, tag) conflict key"""
+    raw = f"{name}\x1f{tag or ''}".encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(raw, digest_size=8).digest(), 'big')
+
+
+class ExactSet:
+    """Every key digest in a Python set - no false positives"""
+
+    def __init__(self):
+        self.keys = set()
+
+    def __contains__(self, key):
+        return key in self.keys
+
+    def add(self, key):
+        self.keys.add(key)
+
+    def __len__(self):
+        return len(self.keys)
+
+
+class BloomFilter:
+    """Fixed-size bit array - bounded memory, rare false positives (a new card dropped)"""
+
+    def __init__(self, capacity=1000000, error_rate=0.001):
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def positions(self, key):
+        # Double hashing: two halves of a wider digest give k independent-enough positions
+        digest = hashlib.blake2b(key.to_bytes(8, 'big'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def __contains__(self, key):
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self.positions(key))
+
+    def add(self, key):
+        for p in self.positions(key):
+            self.bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def __len__(self):
+        return self.count
+
+
+class DuplicateCard(DropItem):
+    """A card already seen this run - expected, so logged at DEBUG (see DedupLogFormatter)"""
+
+
+class DedupLogFormatter(LogFormatter):
+    """Scrapy logs every dropped item at WARNING - duplicates only at DEBUG, they're counted in dedup/dropped"""
+
+    def dropped(self, item, exception, response, spider):
+        entry = super().dropped(item, exception, response, spider)
+        if isinstance(exception, DuplicateCard):
+            entry['level'] = logging.DEBUG
+        return entry
+
+
+class DedupPipeline:
+
+    def __init__(self, mode='exact', capacity=1000000, error_rate=0.001, preseed='none',
+                 snapshot_file='seen_cards.bin', stats=None):
+        self.logger = logging.getLogger(__name__)
+        self.stats = stats
+        self.mode = mode
+        self.preseed = preseed
+        self.snapshot_file = Path(__file__).parent.parent / snapshot_file
+        self.dropped_count = 0
+        # Keys known to be in the cards table - the snapshot only records these, so a
+        # card whose write failed isn't skipped on the next run
+        self.stored = set()
+
+        if mode == 'exact':
+            self.seen = ExactSet()
+        elif mode == 'bloom':
+            self.seen = BloomFilter(capacity, error_rate)
+        else:
+            raise ValueError(f"Unknown DEDUP_MODE {mode!r} - expected 'exact' or 'bloom'")
+        if preseed == 'snapshot' and mode != 'exact':
+            # The snapshot is a list of keys, and a Bloom filter can't give its keys back to save
+            raise ValueError("DEDUP_PRESEED 'snapshot' needs DEDUP_MODE 'exact' - "
+                             "use 'supabase' to pre-seed a Bloom filter")
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        pipeline = cls(
+            mode=crawler.settings.get('DEDUP_MODE', 'exact'),
+            capacity=crawler.settings.getint('DEDUP_BLOOM_CAPACITY', 1000000),
+            error_rate=crawler.settings.getfloat('DEDUP_BLOOM_ERROR_RATE', 0.001),
+            preseed=crawler.settings.get('DEDUP_PRESEED', 'none'),
+            snapshot_file=crawler.settings.get('DEDUP_SNAPSHOT_FILE', 'seen_cards.bin'),
+            stats=crawler.stats,
+        )
+        if pipeline.preseed == 'snapshot':
+            crawler.signals.connect(pipeline.cards_saved, signal=cards_saved)
+            # After every pipeline's close_spider, so the last Supabase batches are in
+            crawler.signals.connect(pipeline.spider_closed, signal=signals.spider_closed)
+        return pipeline
+
+    def open_spider(self, spider):
+        """Optionally load keys already stored, so re-crawls only write new cards"""
+        if self.preseed == 'snapshot':
+            self.load_snapshot()
+        elif self.preseed == 'supabase':
+            # Paging through the table is slow - keep it off the reactor thread
+            return threads.deferToThread(self.load_from_supabase)
+        elif self.preseed != 'none':
+            raise ValueError(f"Unknown DEDUP_PRESEED {self.preseed!r} - expected 'none', 'snapshot' or 'supabase'")
+
+    def process_item(self, item, spider):
+        # Same normalisation SupabasePipeline applies before upserting
+        name = (item.get('name') or '').strip()
+        tag = (item.get('tag') or '').strip()
+        if not name:
+            return item
+
+        key = card_key(name, tag)
+        if key in self.seen:
+            self.dropped_count += 1
+            if self.stats:
+                self.stats.inc_value('dedup/dropped')
+            raise DuplicateCard(f"Duplicate card: {name} [{tag}]")
+
+        self.seen.add(key)
+        return item
+
+    def close_spider(self, spider):
+        self.logger.info(f"🧹 Dedup ({self.mode}): {len(self.seen)} unique cards, dropped {self.dropped_count} duplicates")
+
+    def cards_saved(self, rows):
+        """SupabasePipeline confirmed these rows are in the table"""
+        for row in rows:
+            self.stored.add(card_key(row['name'], row.get('tag')))
+
+    def spider_closed(self, spider):
+        self.save_snapshot()
+
+    def load_snapshot(self):
+        """Read key digests written by a previous run"""
+        if not self.snapshot_file.exists():
+            self.logger.info("No dedup snapshot yet - starting empty")
+            return
+        data = self.snapshot_file.read_bytes()
+        for offset in range(0, len(data) - 7, 8):
+            key = int.from_bytes(data[offset:offset + 8], 'big')
+            self.seen.add(key)
+            self.stored.add(key)
+        self.logger.info(f"Loaded {len(data) // 8} card keys from {self.snapshot_file.name}")
+
+    def save_snapshot(self):
+        """Write every stored key digest (8 bytes each) for the next run to pre-seed from"""
+        tmp_file = self.snapshot_file.with_suffix('.tmp')
+        with open(tmp_file, 'wb') as f:
+            for key in self.stored:
+                f.write(key.to_bytes(8, 'big'))
+        os.replace(tmp_file, self.snapshot_file)
+        unconfirmed = len(self.seen) - len(self.stored)
+        self.logger.info(f"Saved {len(self.stored)} card keys to {self.snapshot_file.name}"
+                         + (f" ({unconfirmed} not confirmed by Supabase left out)" if unconfirmed > 0 else ""))
+
+    def load_from_supabase(self, page_size=1000):
+        """Read every (name, tag) already in the cards table"""
+        supabase = create_client(os.getenv('SUPABASE_URL'), os.getenv('SUPABASE_KEY'))
+        start = 0
+        while True:
+            response = supabase.table('cards').select('name,tag').order('id').range(start, start + page_size - 1).execute()
+            rows = response.data or []
+            for row in rows:
+                self.seen.add(card_key(row['name'], row.get('tag') or ''))
+            if len(rows) < page_size:
+                break
+            start += page_size
+        self.logger.info(f"Pre-seeded dedup with {start + len(rows)} cards from Supabase")
@@ -0,0 +1,324 @@
+"""
+Driver pool - checkout/checkin of a fixed number of browser instances
+"""
+import time
+import shutil
+import logging
+import psutil
+from twisted.internet import defer, threads
+from twisted.python.threadpool import ThreadPool
+from scrapy.utils.defer import maybe_deferred_to_future
+from testSpider.browser_tabs import TabbedBrowser
+from testSpider.timings import observe
+
+logger = logging.getLogger(__name__)
+
+
+class PooledDriver:
+    """A browser owned by the pool, with its own request counter"""
+
+    def __init__(self, pool, driver, slot):
+        self.pool = pool
+        self.driver = driver
+        self.slot = slot
+        self.request_count = 0
+        self.created_at = time.time()
+        self.checked_out = False
+        self.rss_checked_at = 0
+        # TabbedBrowser when this driver is one tab of a shared browser
+        self.browser = None
+
+    @property
+    def browser_driver(self):
+        """The WebDriver for the whole browser - the same as driver unless it's a tab"""
+        return self.browser.driver if self.browser else self.driver
+
+    @property
+    def proxy(self):
+        """Proxy the browser is using, if any - shared by all of its tabs"""
+        return getattr(self.browser_driver, 'proxy', None)
+
+    @proxy.setter
+    def proxy(self, proxy):
+        self.browser_driver.proxy = proxy
+
+    def release(self, healthy=True):
+        """Give the driver back to its pool (safe to call more than once)"""
+        if self.checked_out:
+            self.pool.checkin(self, healthy=healthy)
+
+    def call(self, fn, *args, **kwargs):
+        """Run a blocking call against this driver on the pool's worker threads"""
+        return self.pool.run(fn, *args, **kwargs)
+
+
+def browser_call(response, fn, *args, **kwargs):
+    """Run a blocking driver call for a rendered response off the reactor thread
+
+    Spiders await the result from an ``async def`` callback::
+
+        title = await browser_call(response, lambda: driver.title)
+    """
+    pooled = response.meta.get('pooled_driver')
+    started = time.perf_counter()
+    if pooled:
+        d = pooled.call(fn, *args, **kwargs)
+    else:
+        d = threads.deferToThread(fn, *args, **kwargs)
+    d.addBoth(browser_call_done, response, pooled, started)
+    return maybe_deferred_to_future(d)
+
+
+def browser_call_done(result, response, pooled, started):
+    """Count a browser_call's time against the 'browser' stage, not the callback's 'parse'"""
+    seconds = time.perf_counter() - started
+    response.meta['browser_seconds'] = response.meta.get('browser_seconds', 0.0) + seconds
+    if pooled:
+        observe(pooled.pool.stats, 'browser', seconds)
+    return result
+
+
+def browser_rss(driver):
+    """Resident memory in bytes of chromedriver, Chrome and every Chrome child process"""
+    pids = {getattr(driver, 'browser_pid', None)}
+    service = getattr(driver, 'service', None)
+    if service and getattr(service, 'process', None):
+        pids.add(service.process.pid)
+
+    processes = {}
+    for pid in filter(None, pids):
+        try:
+            process = psutil.Process(pid)
+            processes[process.pid] = process
+            for child in process.children(recursive=True):
+                processes[child.pid] = child
+        except psutil.Error:
+            continue
+
+    total = 0
+    for process in processes.values():
+        try:
+            total += process.memory_info().rss
+        except psutil.Error:
+            continue
+    return total
+
+
+class DriverPool:
+
+    def __init__(self, factory, size=1, max_requests_per_driver=1000000, max_rss_mb=0, rss_check_every=10,
+                 prespawn=0, tabs_per_browser=1, setup_tab=None):
+        self.factory = factory
+        # `size` browsers with `tabs_per_browser` tabs each - every tab is a pooled driver
+        self.tabs_per_browser = max(1, tabs_per_browser)
+        self.size = max(1, size) * self.tabs_per_browser
+        self.setup_tab = setup_tab
+        self.browsers = []
+        self.max_requests_per_driver = max_requests_per_driver
+        # Browsers kept launched ahead of demand, so checkouts don't wait on Chrome starting
+        self.prespawn = prespawn
+        # Chrome grows over long crawls - recycle a browser whose processes
+        # together use more than max_rss_mb (0 = never check)
+        self.max_rss_mb = max_rss_mb
+        self.rss_check_every = max(1, rss_check_every)
+        self.drivers = []
+        self.idle = []
+        self.waiters = []
+        self.next_slot = 0
+        self.recycled_count = 0
+        # Crawl stats and the render cache, for code that only has a response or a PooledDriver
+        self.stats = None
+        self.render_cache = None
+        
+        # Every driver command blocks, so launches, renders and spider-side
+        # browser work all run on a threadpool instead of the reactor thread.
+        # It's started on first use, so a pool that never runs anything (scripts
+        # that only want proxies) leaves no threads keeping the process alive
+        self.threadpool = None
+        self.shutdown_hooked = False
+
+    def run(self, fn, *args, **kwargs):
+        """Run a blocking function on the browser threads, returning a Deferred"""
+        # Imported here - spider modules import this file before Scrapy installs its reactor
+        from twisted.internet import reactor
+        return threads.deferToThreadPool(reactor, self.threads(), fn, *args, **kwargs)
+
+    def threads(self):
+        """The browser threadpool, started if it isn't running"""
+        if self.threadpool is None:
+            from twisted.internet import reactor
+            self.threadpool = ThreadPool(minthreads=1, maxthreads=self.size, name='selenium')
+            self.threadpool.start()
+            if not self.shutdown_hooked:
+                # In case the crawl ends without close() or stop_threads()
+                reactor.addSystemEventTrigger('during', 'shutdown', self.stop_threads)
+                self.shutdown_hooked = True
+        return self.threadpool
+
+    def stop_threads(self):
+        """Stop the browser threads - the next run() starts new ones"""
+        threadpool, self.threadpool = self.threadpool, None
+        if threadpool is not None:
+            threadpool.stop()
+
+    def checkout(self):
+        """Return a Deferred firing with a PooledDriver once one is free"""
+        if self.idle:
+            pooled = self.idle.pop()
+            return self.run(self.is_healthy, pooled).addCallback(self._verified, pooled)
+
+        if len(self.drivers) < self.size:
+            return self.launch().addCallback(self._lease)
+
+        d = defer.Deferred()
+        self.waiters.append(d)
+        return d
+
+    def checkin(self, pooled, healthy=True):
+        """Return a driver to the pool, recycling it if it is worn out or broken"""
+        pooled.checked_out = False
+        if not healthy or pooled.request_count >= self.max_requests_per_driver:
+            self.discard(pooled)
+            if self.waiters and len(self.drivers) < self.size:
+                waiter = self.waiters.pop(0)
+                self.launch().addCallback(self._lease).chainDeferred(waiter)
+            else:
+                self.fill()
+            return
+
+        if self.waiters:
+            # Same checks as an idle checkout, so busy pools still catch dead or bloated browsers
+            waiter = self.waiters.pop(0)
+            self.run(self.is_healthy, pooled).addCallback(self._verified, pooled).chainDeferred(waiter)
+        else:
+            self.idle.append(pooled)
+
+    def launch(self):
+        """Start a new browser and register it with the pool"""
+        slot = self.next_slot
+        self.next_slot += 1
+        pooled = PooledDriver(self, None, slot)
+        # Reserve the slot before launching so concurrent checkouts respect the size
+        self.drivers.append(pooled)
+        started = time.perf_counter()
+
+        def launched(driver):
+            pooled.driver = driver
+            observe(self.stats, 'launch', time.perf_counter() - started)
+            return pooled
+
+        def failed(failure):
+            self.drivers.remove(pooled)
+            if pooled.browser and self._release_tab(pooled) and pooled.browser.driver:
+                self.run(self.quit_driver, pooled)
+            return failure
+
+        if self.tabs_per_browser == 1:
+            logger.info(f"🚀 Launching driver #{slot} ({len(self.drivers)}/{self.size})")
+            return self.run(self.factory).addCallbacks(launched, failed)
+
+        browser = next((b for b in self.browsers if b.has_room), None)
+        if browser is None:
+            browser = TabbedBrowser(self.tabs_per_browser)
+            self.browsers.append(browser)
+        browser.reserved += 1
+        pooled.browser = browser
+        logger.info(f"🚀 Opening tab #{slot} ({len(self.drivers)}/{self.size}, "
+                    f"{len(self.browsers)} browser(s))")
+        return self.run(browser.open_tab, self.factory, self.setup_tab).addCallbacks(launched, failed)
+
+    def fill(self):
+        """Launch idle browsers until `prespawn` of them exist"""
+        while len(self.drivers) < min(self.prespawn, self.size):
+            self.launch().addCallbacks(self.checkin, self._prespawn_failed)
+
+    def discard(self, pooled):
+        """Quit a driver and free its slot"""
+        if pooled in self.drivers:
+            self.drivers.remove(pooled)
+        if pooled in self.idle:
+            self.idle.remove(pooled)
+        self.recycled_count += 1
+        if self.stats:
+            self.stats.inc_value('selenium/recycled')
+        logger.info(f"♻️  Recycling driver #{pooled.slot} after {pooled.request_count} requests")
+        if pooled.browser and not self._release_tab(pooled):
+            # Other tabs are still using the browser
+            self.run(pooled.browser.close_tab, pooled.driver)
+            return
+        self.run(self.quit_driver, pooled)
+
+    def _release_tab(self, pooled):
+        """Give up a tab's place in its browser - True if that was the browser's last tab"""
+        browser = pooled.browser
+        browser.reserved -= 1
+        if browser.reserved:
+            return False
+        self.browsers.remove(browser)
+        return True
+
+    def is_healthy(self, pooled):
+        """Cheap liveness probe - a dead browser raises on any command - plus a periodic memory check"""
+        if pooled.browser and pooled.browser.retiring:
+            # Its browser is being replaced - close tabs as they come back
+            return False
+        try:
+            pooled.driver.current_window_handle
+        except Exception as e:
+            logger.warning(f"Driver #{pooled.slot} is unhealthy: {e}")
+            return False
+
+        if self.max_rss_mb and pooled.request_count - pooled.rss_checked_at >= self.rss_check_every:
+            pooled.rss_checked_at = pooled.request_count
+            rss_mb = browser_rss(pooled.browser_driver) / 1024 / 1024
+            if rss_mb > self.max_rss_mb:
+                logger.info(f"Driver #{pooled.slot} uses {rss_mb:.0f}MB (> {self.max_rss_mb}MB) - recycling")
+                if pooled.browser:
+                    pooled.browser.retiring = True
+                return False
+        return True
+
+    def quit_driver(self, pooled):
+        """Quit the browser behind a driver - every tab in it goes too"""
+        driver = pooled.browser_driver
+        try:
+            if driver:
+                driver.quit()
+        except Exception as e:
+            logger.debug(f"Error quitting driver #{pooled.slot}: {e}")
+        forward_proxy = getattr(driver, 'forward_proxy', None)
+        if forward_proxy:
+            forward_proxy.stop()
+        # Copied from the profile template, so uc doesn't clean it up itself
+        profile_dir = getattr(driver, 'profile_dir', None)
+        if profile_dir:
+            shutil.rmtree(profile_dir, ignore_errors=True)
+
+    def close(self):
+        """Quit every driver and fail pending checkouts"""
+        for waiter in self.waiters:
+            waiter.errback(RuntimeError("Driver pool closed"))
+        self.waiters = []
+        # One quit per browser, however many tabs it has
+        browsers = {}
+        for pooled in self.drivers:
+            browsers.setdefault(id(pooled.browser or pooled), pooled)
+        for pooled in browsers.values():
+            self.quit_driver(pooled)
+        self.drivers = []
+        self.idle = []
+        self.browsers = []
+        self.stop_threads()
+
+    def _verified(self, healthy, pooled):
+        if healthy and pooled.request_count < self.max_requests_per_driver:
+            return self._lease(pooled)
+        self.discard(pooled)
+        return self.checkout()
+
+    def _prespawn_failed(self, failure):
+        logger.warning(f"Pre-spawned driver failed to launch: {failure.value}")
+
+    def _lease(self, pooled):
+        pooled.checked_out = True
+        return pooled
@@ -0,0 +1,148 @@
+"""
+Forwarding proxy - a localhost proxy per browser whose upstream can be switched at any time
+"""
+import asyncio
+import logging
+import threading
+from python_socks.async_.asyncio import Proxy
+
+logger = logging.getLogger(__name__)
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def proxy_loop():
+    """The event loop every ForwardProxy runs on, started on first use in its own thread"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name='forward-proxy', daemon=True).start()
+        return _loop
+
+
+def upstream_url(proxy):
+    """python-socks URL for a proxy dict, with credentials when it has them"""
+    protocol = (proxy.get('protocol') or 'socks5').lower()
+    scheme = 'socks5' if 'socks5' in protocol else 'socks4' if 'socks4' in protocol else 'http' if 'http' in protocol else 'socks5'
+    auth = f"{proxy['username']}:{proxy.get('password', '')}@" if proxy.get('username') else ''
+    return f"{scheme}://{auth}{proxy['ip']}:{proxy['port']}"
+
+
+class ForwardProxy:
+    """HTTP proxy on 127.0.0.1 that relays every connection through the current upstream
+
+    Chrome is launched once with --proxy-server pointing here; set_upstream()
+    then changes where its traffic goes without a restart. Upstreams can be
+    HTTP, SOCKS4 or SOCKS5, with or without a username and password. With no
+    upstream, connections go direct.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, connect_timeout=15):
+        self.host = host
+        self.port = port
+        self.connect_timeout = connect_timeout
+        self.upstream = None
+        self.server = None
+        self.connections = set()
+        self.loop = proxy_loop()
+
+    @property
+    def address(self):
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        """Bind the listener (blocking until it is up) and return its address"""
+        self.server = asyncio.run_coroutine_threadsafe(
+            asyncio.start_server(self.handle, self.host, self.port), self.loop
+        ).result()
+        self.port = self.server.sockets[0].getsockname()[1]
+        return self.address
+
+    def stop(self):
+        if self.server:
+            self.loop.call_soon_threadsafe(self.server.close)
+            self.loop.call_soon_threadsafe(self.drop_connections)
+            self.server = None
+
+    def set_upstream(self, proxy, drop_connections=True):
+        """Send new connections through `proxy` (a proxy dict, or None for direct)
+
+        Chrome keeps tunnels open, so existing ones are closed by default to make
+        the switch take effect on the next request rather than the next new host.
+        """
+        self.upstream = proxy
+        if drop_connections:
+            self.loop.call_soon_threadsafe(self.drop_connections)
+
+    def drop_connections(self):
+        for writer in list(self.connections):
+            writer.close()
+
+    async def open_upstream(self, host, port):
+        upstream = self.upstream
+        if not upstream:
+            return await asyncio.wait_for(asyncio.open_connection(host, port), self.connect_timeout)
+        sock = await Proxy.from_url(upstream_url(upstream)).connect(host, port, timeout=self.connect_timeout)
+        return await asyncio.open_connection(sock=sock)
+
+    async def handle(self, reader, writer):
+        self.connections.add(writer)
+        remote_writer = None
+        method = None
+        try:
+            head = await reader.readuntil(b'\r\n\r\n')
+            request_line, _, headers = head.partition(b'\r\n')
+            method, target, version = request_line.decode('latin-1').split(' ', 2)
+
+            if method == 'CONNECT':
+                host, _, port = target.rpartition(':')
+                remote_reader, remote_writer = await self.open_upstream(host.strip('[]'), int(port))
+                writer.write(b'HTTP/1.1 200 Connection established\r\n\r\n')
+            else:
+                # Absolute-form request - tunnel to the origin and send it on in origin-form
+                scheme, _, rest = target.partition('://')
+                authority, slash, path = rest.partition('/')
+                host, _, port = authority.partition(':')
+                port = int(port or (443 if scheme == 'https' else 80))
+                remote_reader, remote_writer = await self.open_upstream(host, port)
+                kept = [line for line in headers.split(b'\r\n')
+                        if line and not line.lower().startswith((b'proxy-', b'connection:'))]
+                # One request per client connection keeps upstream switches clean
+                kept.append(b'Connection: close')
+                remote_writer.write(f"{method} {slash}{path} {version}\r\n".encode('latin-1')
+                                    + b'\r\n'.join(kept) + b'\r\n\r\n')
+
+            self.connections.add(remote_writer)
+            await asyncio.gather(self.pipe(reader, remote_writer), self.pipe(remote_reader, writer))
+        except Exception as e:
+            logger.debug(f"Forwarding failed: {e!r}")
+            # A failed CONNECT gets a 502, which Chrome reports as ERR_TUNNEL_CONNECTION_FAILED.
+            # A plain-HTTP request is just closed unanswered - Chrome would show a 502 as an
+            # ordinary (blank) page, but an empty reply is ERR_EMPTY_RESPONSE, a proxy error.
+            if method == 'CONNECT' and remote_writer is None and not writer.is_closing():
+                writer.write(b'HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\n\r\n')
+        finally:
+            for w in (writer, remote_writer):
+                if w:
+                    self.connections.discard(w)
+                    w.close()
+
+    @staticmethod
+    async def pipe(reader, writer):
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                writer.write(data)
+                await writer.drain()
+        except Exception:
+            pass
+        finally:
+            if not writer.is_closing():
+                try:
+                    writer.write_eof()
+                except Exception:
+                    writer.close()
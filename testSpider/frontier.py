@@ -0,0 +1,371 @@
+"""
+Shared frontier - a SQLite request queue several crawler processes lease work from
+"""
+import os
+import time
+import heapq
+import pickle
+import socket
+import sqlite3
+import logging
+import itertools
+from pathlib import Path
+from scrapy.core.scheduler import BaseScheduler
+from scrapy.utils.request import request_from_dict
+from scrapy_selenium import SeleniumRequest
+from testSpider.render_request import RenderRequest
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+LEASED = 'leased'
+DONE = 'done'
+FAILED = 'failed'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS requests (
+    fingerprint TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    data BLOB NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL,
+    worker TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    added_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS requests_by_order ON requests (state, priority DESC, added_at);
+CREATE INDEX IF NOT EXISTS requests_by_worker ON requests (worker, state);
+"""
+
+# SeleniumRequest fields that request_to_dict doesn't know about
+SELENIUM_FIELDS = ('wait_time', 'screenshot', 'script')
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def serialize_request(request, spider):
+    """Pickle a request the way Scrapy's disk queues do, keeping SeleniumRequest's own fields
+
+    Raises ValueError for requests another process couldn't rebuild - callbacks
+    that aren't spider methods, lambdas in meta, a wait_until condition (use
+    a RenderRequest with wait_for instead).
+    """
+    legacy = isinstance(request, SeleniumRequest) and not isinstance(request, RenderRequest)
+    if legacy and request.wait_until is not None:
+        raise ValueError("wait_until conditions can't be shared between processes")
+    d = request.to_dict(spider=spider)
+    if legacy:
+        d['selenium'] = {field: getattr(request, field) for field in SELENIUM_FIELDS}
+    try:
+        return pickle.dumps(d, protocol=4)
+    except Exception as e:
+        raise ValueError(f"Request can't be pickled: {e}") from e
+
+
+def deserialize_request(data, spider):
+    d = pickle.loads(data)
+    selenium = d.pop('selenium', None)
+    request = request_from_dict(d, spider=spider)
+    for field, value in (selenium or {}).items():
+        setattr(request, field, value)
+    return request
+
+
+class Frontier:
+    """Requests keyed by fingerprint, leased to one worker at a time
+
+    A fingerprint is only ever queued once, whichever process finds it first,
+    so shards never fetch the same page twice. A lease that isn't renewed or
+    acked before it expires - its worker died - goes back to whoever leases
+    next; after max_attempts leases a request is marked failed instead.
+    """
+
+    def __init__(self, db_file='frontier.sqlite3', lease_seconds=300, max_attempts=3):
+        self.db_file = Path(__file__).parent.parent / db_file
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # Other processes hold the write lock briefly - wait for it rather than failing
+        self.conn = sqlite3.connect(str(self.db_file), timeout=30, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+
+    def push(self, fingerprint, url, data, priority=0):
+        """Queue a request - False if any worker has already queued this fingerprint"""
+        cursor = self.conn.execute(
+            """INSERT OR IGNORE INTO requests (fingerprint, url, data, priority, state, added_at)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            (fingerprint, url, data, priority, QUEUED, time.time()),
+        )
+        return cursor.rowcount == 1
+
+    def lease(self, worker, limit=1):
+        """Take up to `limit` queued or abandoned requests as (fingerprint, data, expired)"""
+        now = time.time()
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            # Out of attempts - whether it's waiting in the queue or its last lease expired
+            self.conn.execute(
+                """UPDATE requests SET state = ?, worker = NULL, lease_until = NULL
+                   WHERE (state = ? OR (state = ? AND lease_until < ?)) AND attempts >= ?""",
+                (FAILED, QUEUED, LEASED, now, self.max_attempts),
+            )
+            rows = self.conn.execute(
+                """SELECT fingerprint, data, state FROM requests
+                   WHERE state = ? OR (state = ? AND lease_until < ?)
+                   ORDER BY priority DESC, added_at LIMIT ?""",
+                (QUEUED, LEASED, now, limit),
+            ).fetchall()
+            for fingerprint, _, _ in rows:
+                self.conn.execute(
+                    'UPDATE requests SET state = ?, worker = ?, lease_until = ?, attempts = attempts + 1 '
+                    'WHERE fingerprint = ?',
+                    (LEASED, worker, now + self.lease_seconds, fingerprint),
+                )
+            self.conn.execute('COMMIT')
+        except Exception:
+            self.conn.execute('ROLLBACK')
+            raise
+        return [(fingerprint, data, state == LEASED) for fingerprint, data, state in rows]
+
+    def renew(self, worker):
+        """Extend every lease the worker holds - its heartbeat"""
+        self.conn.execute('UPDATE requests SET lease_until = ? WHERE worker = ? AND state = ?',
+                          (time.time() + self.lease_seconds, worker, LEASED))
+
+    def ack(self, fingerprint, worker):
+        self.conn.execute('UPDATE requests SET state = ?, lease_until = NULL WHERE fingerprint = ? AND worker = ?',
+                          (DONE, fingerprint, worker))
+
+    def fail(self, fingerprint, worker):
+        """A leased request failed - queue it for another attempt, or mark it failed once out of attempts"""
+        self.conn.execute(
+            """UPDATE requests SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END,
+                   worker = NULL, lease_until = NULL
+               WHERE fingerprint = ? AND worker = ? AND state = ?""",
+            (self.max_attempts, FAILED, QUEUED, fingerprint, worker, LEASED),
+        )
+
+    def release(self, worker):
+        """Hand a worker's unfinished leases back to the queue (on a clean shutdown)
+
+        Requests already leased max_attempts times are marked failed instead.
+        """
+        cursor = self.conn.execute(
+            """UPDATE requests SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END,
+                   worker = NULL, lease_until = NULL
+               WHERE worker = ? AND state = ?""",
+            (self.max_attempts, FAILED, QUEUED, worker, LEASED),
+        )
+        return cursor.rowcount
+
+    def counts(self):
+        return dict(self.conn.execute('SELECT state, COUNT(*) FROM requests GROUP BY state').fetchall())
+
+    def has_work(self, worker):
+        """True while anything is queued or leased by another worker, whose requests may yield more
+
+        The worker's own leases don't count - Scrapy tracks those while they're in flight.
+        """
+        row = self.conn.execute(
+            'SELECT 1 FROM requests WHERE state = ? OR (state = ? AND worker != ?) LIMIT 1',
+            (QUEUED, LEASED, worker),
+        ).fetchone()
+        return row is not None
+
+    def close(self):
+        self.conn.close()
+
+
+class FrontierScheduler(BaseScheduler):
+    """Scrapy scheduler backed by a Frontier shared with other crawler processes
+
+    Run the same crawl in as many processes as you like with the same
+    FRONTIER_FILE; each leases FRONTIER_LEASE_BATCH requests at a time and
+    FrontierAckMiddleware marks them done once their callback has finished.
+    Requests that can't be shared (see serialize_request) and dont_filter
+    retries of requests this worker holds stay in a local queue.
+    """
+
+    def __init__(self, crawler, frontier, worker, lease_batch=4, poll_interval=1.0):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.frontier = frontier
+        self.worker = worker
+        self.lease_batch = lease_batch
+        self.poll_interval = poll_interval
+        self.spider = None
+        self.local = []
+        self.counter = itertools.count()
+        self.leased = set()
+        self.heartbeat = None
+        self.poller = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        frontier = Frontier(
+            settings.get('FRONTIER_FILE', 'frontier.sqlite3'),
+            lease_seconds=settings.getfloat('FRONTIER_LEASE_SECONDS', 300),
+            max_attempts=settings.getint('FRONTIER_MAX_ATTEMPTS', 3),
+        )
+        worker = settings.get('FRONTIER_WORKER_ID') or default_worker_id()
+        return cls(crawler, frontier, worker,
+                   lease_batch=settings.getint('FRONTIER_LEASE_BATCH', 4),
+                   poll_interval=settings.getfloat('FRONTIER_POLL_INTERVAL', 1.0))
+
+    def open(self, spider):
+        from twisted.internet import task
+        self.spider = spider
+        self.heartbeat = task.LoopingCall(self.frontier.renew, self.worker)
+        self.heartbeat.start(max(1, self.frontier.lease_seconds / 3), now=False)
+        # An idle engine only asks for requests every 5s - other workers may have queued some since
+        self.poller = task.LoopingCall(self.poll)
+        self.poller.start(self.poll_interval, now=False)
+        logger.info(f"🗂️  Frontier {self.frontier.db_file} as worker {self.worker}: {self.frontier.counts()}")
+
+    def close(self, reason):
+        for loop in (self.heartbeat, self.poller):
+            if loop and loop.running:
+                loop.stop()
+        released = self.frontier.release(self.worker)
+        if released:
+            logger.info(f"Returned {released} unfinished requests to the frontier")
+        self.frontier.close()
+
+    def __len__(self):
+        return len(self.local)
+
+    def poll(self):
+        slot = getattr(self.crawler.engine, 'slot', None)
+        if slot and not self.local:
+            slot.nextcall.schedule()
+
+    def has_pending_requests(self):
+        return bool(self.local) or self.frontier.has_work(self.worker)
+
+    def enqueue_request(self, request):
+        fingerprint = self.crawler.request_fingerprinter.fingerprint(request).hex()
+        if request.dont_filter and fingerprint in self.leased:
+            # A retry or escalation of our own leased request - it keeps that lease
+            return self.push_local(request, fingerprint)
+        try:
+            data = serialize_request(request, self.spider)
+        except ValueError as e:
+            logger.debug(f"Keeping {request.url} local: {e}")
+            return self.push_local(request, fingerprint)
+
+        if not self.frontier.push(fingerprint, request.url, data, request.priority):
+            self.stats.inc_value('frontier/duplicates', spider=self.spider)
+            return False
+        self.stats.inc_value('frontier/enqueued', spider=self.spider)
+        return True
+
+    def push_local(self, request, fingerprint):
+        request.meta.setdefault('frontier_fingerprint', fingerprint)
+        heapq.heappush(self.local, (-request.priority, next(self.counter), request))
+        self.stats.inc_value('frontier/local', spider=self.spider)
+        return True
+
+    def next_request(self):
+        if self.local:
+            return heapq.heappop(self.local)[2]
+
+        for fingerprint, data, expired in self.frontier.lease(self.worker, self.lease_batch):
+            if expired:
+                self.stats.inc_value('frontier/reclaimed', spider=self.spider)
+            try:
+                request = deserialize_request(data, self.spider)
+            except Exception as e:
+                logger.error(f"❌ Could not rebuild request {fingerprint}: {e}")
+                self.frontier.ack(fingerprint, self.worker)
+                continue
+            request.meta['frontier_fingerprint'] = fingerprint
+            self.leased.add(fingerprint)
+            self.stats.inc_value('frontier/leased', spider=self.spider)
+            heapq.heappush(self.local, (-request.priority, next(self.counter), request))
+
+        if self.local:
+            return heapq.heappop(self.local)[2]
+        return None
+
+    def ack(self, fingerprint):
+        if fingerprint in self.leased:
+            self.leased.discard(fingerprint)
+            self.frontier.ack(fingerprint, self.worker)
+            self.stats.inc_value('frontier/acked', spider=self.spider)
+
+    def fail(self, fingerprint):
+        if fingerprint in self.leased:
+            self.leased.discard(fingerprint)
+            self.frontier.fail(fingerprint, self.worker)
+            self.stats.inc_value('frontier/failed', spider=self.spider)
+
+
+class FrontierAckMiddleware:
+    """Marks a leased request done in the frontier once its callback has finished"""
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def process_spider_output(self, response, result, spider):
+        try:
+            for r in result:
+                yield r
+        finally:
+            self.ack(response)
+
+    async def process_spider_output_async(self, response, result, spider):
+        try:
+            async for r in result:
+                yield r
+        finally:
+            self.ack(response)
+
+    def process_spider_exception(self, response, exception, spider):
+        self.ack(response)
+        return None
+
+    def ack(self, response):
+        scheduler = frontier_scheduler(self.crawler)
+        fingerprint = response.meta.get('frontier_fingerprint')
+        if fingerprint and scheduler is not None:
+            scheduler.ack(fingerprint)
+
+
+class FrontierFailureMiddleware:
+    """Downloader middleware handing a leased request back when its download fails for good
+
+    Failed downloads and IgnoreRequest go straight to the request's errback,
+    never through spider middleware, so FrontierAckMiddleware doesn't see
+    them. Ordered before RetryMiddleware, so it only sees exceptions that no
+    retry took care of. The request is queued again until it has used up
+    FRONTIER_MAX_ATTEMPTS leases, then marked failed.
+    """
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def process_exception(self, request, exception, spider):
+        scheduler = frontier_scheduler(self.crawler)
+        fingerprint = request.meta.get('frontier_fingerprint')
+        if fingerprint and scheduler is not None:
+            scheduler.fail(fingerprint)
+        return None
+
+
+def frontier_scheduler(crawler):
+    """The crawl's FrontierScheduler, or None when it uses another scheduler"""
+    scheduler = getattr(getattr(crawler.engine, 'slot', None), 'scheduler', None)
+    return scheduler if isinstance(scheduler, FrontierScheduler) else None
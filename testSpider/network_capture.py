@@ -0,0 +1,180 @@
+"""
+Network capture - read XHR/fetch JSON responses out of Chrome's performance log
+"""
+import re
+import json
+import logging
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+import scrapy
+
+logger = logging.getLogger(__name__)
+
+# Capability that makes chromedriver record DevTools Network events
+PERFORMANCE_LOGGING = {'performance': 'ALL'}
+
+# Parameters that usually carry the page position / page size of a paginated API
+PAGE_KEYS = ('page', 'offset', 'from', 'skip', 'start', 'cursor')
+SIZE_KEYS = ('limit', 'size', 'per_page', 'perPage', 'pageSize', 'hitsPerPage', 'count')
+
+# Request headers Chrome reports that must not be replayed verbatim
+SKIP_HEADERS = ('content-length', 'host', 'connection', 'accept-encoding')
+
+
+def drain_log(driver):
+    """Discard buffered performance log entries (keeps chromedriver's buffer small)"""
+    try:
+        driver.get_log('performance')
+    except Exception as e:
+        logger.debug(f"Could not drain performance log: {e}")
+
+
+def capture_json(driver, patterns):
+    """Return JSON responses whose URL matches any pattern since the last drain
+
+    Each capture is a dict with the request (url, method, headers, post_data),
+    the response status and the decoded JSON payload under 'data'.
+    """
+    patterns = [re.compile(p) for p in patterns]
+    requests, responses, finished = {}, {}, []
+
+    for entry in driver.get_log('performance'):
+        try:
+            message = json.loads(entry['message'])['message']
+        except (KeyError, ValueError):
+            continue
+        method = message.get('method')
+        params = message.get('params', {})
+        request_id = params.get('requestId')
+
+        if method == 'Network.requestWillBeSent':
+            requests[request_id] = params.get('request', {})
+        elif method == 'Network.responseReceived':
+            response = params.get('response', {})
+            if any(p.search(response.get('url', '')) for p in patterns) and 'json' in response.get('mimeType', ''):
+                responses[request_id] = response
+        elif method == 'Network.loadingFinished' and request_id in responses:
+            finished.append(request_id)
+
+    captures = []
+    for request_id in finished:
+        response = responses[request_id]
+        try:
+            body = driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id})
+            data = json.loads(body.get('body', ''))
+        except Exception as e:
+            # Chrome evicts bodies of old requests - nothing to do but skip them
+            logger.debug(f"Could not read body of {response.get('url')}: {e}")
+            continue
+        request = requests.get(request_id, {})
+        captures.append({
+            'url': response.get('url'),
+            'status': response.get('status'),
+            'method': request.get('method', 'GET'),
+            'headers': request.get('headers', {}),
+            'post_data': request.get('postData'),
+            'data': data,
+        })
+
+    logger.debug(f"Captured {len(captures)} JSON responses")
+    return captures
+
+
+def find_records(payload):
+    """Return the largest list of objects inside a JSON payload"""
+    best = []
+    stack = [payload]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            if node and all(isinstance(x, dict) for x in node) and len(node) > len(best):
+                best = node
+            stack.extend(node)
+    return best
+
+
+class PaginatedApi:
+    """A captured API request that can be replayed over plain HTTP for any page"""
+
+    def __init__(self, capture, location, key, start, step):
+        self.capture = capture
+        self.location = location  # 'query' or 'body'
+        self.key = key
+        self.start = start
+        self.step = step
+
+    @classmethod
+    def infer(cls, captures):
+        """Work out the page parameter from captured requests to the same endpoint
+
+        With two or more requests the parameter is the numeric value that changes
+        between them; with one, a well-known page/offset key is used.
+        """
+        by_endpoint = {}
+        for capture in captures:
+            endpoint = (capture['method'], urlsplit(capture['url'])._replace(query='').geturl())
+            by_endpoint.setdefault(endpoint, []).append(capture)
+
+        for group in sorted(by_endpoint.values(), key=len, reverse=True):
+            params = [cls.numeric_params(c) for c in group]
+            if len(group) >= 2:
+                first, second = params[0], params[1]
+                changed = [key for key in first if key in second and second[key] != first[key]]
+                # Prefer well-known names over e.g. cache-busting timestamps
+                changed.sort(key=lambda key: key[1] not in PAGE_KEYS)
+                if changed:
+                    key = changed[0]
+                    location, name = key
+                    step = second[key] - first[key]
+                    return cls(group[-1], location, name, params[-1][key], step)
+            for key, value in params[-1].items():
+                location, name = key
+                if name in PAGE_KEYS:
+                    size = next((v for (loc, n), v in params[-1].items() if n in SIZE_KEYS), None)
+                    step = size if name != 'page' and size else 1
+                    return cls(group[-1], location, name, value, step)
+        return None
+
+    @staticmethod
+    def numeric_params(capture):
+        params = {}
+        for name, value in parse_qsl(urlsplit(capture['url']).query):
+            if value.lstrip('-').isdigit():
+                params[('query', name)] = int(value)
+        try:
+            body = json.loads(capture['post_data']) if capture['post_data'] else {}
+        except ValueError:
+            body = {}
+        if isinstance(body, dict):
+            for name, value in body.items():
+                if isinstance(value, int) and not isinstance(value, bool):
+                    params[('body', name)] = value
+        return params
+
+    def value_for(self, pages_ahead):
+        return self.start + self.step * pages_ahead
+
+    def request(self, pages_ahead, cookies=None, **kwargs):
+        """Build a scrapy.Request for the page `pages_ahead` steps after the captured one"""
+        value = self.value_for(pages_ahead)
+        url = self.capture['url']
+        body = self.capture['post_data']
+
+        if self.location == 'query':
+            parts = urlsplit(url)
+            query = [(k, str(value) if k == self.key else v) for k, v in parse_qsl(parts.query)]
+            url = urlunsplit(parts._replace(query=urlencode(query)))
+        else:
+            data = json.loads(body)
+            data[self.key] = value
+            body = json.dumps(data)
+
+        headers = {k: v for k, v in self.capture['headers'].items()
+                   if not k.startswith(':') and k.lower() not in SKIP_HEADERS}
+        if cookies:
+            # COOKIES_ENABLED is off, so the browser session's cookies go in the header
+            headers['Cookie'] = '; '.join(f"{c['name']}={c['value']}" for c in cookies)
+
+        return scrapy.Request(url, method=self.capture['method'], body=body, headers=headers,
+                              dont_filter=True, **kwargs)
@@ -0,0 +1,39 @@
+"""
+Page snapshots - read the rendered DOM, or just part of it, once per response
+"""
+from testSpider.driver_pool import browser_call
+
+# outerHTML of every element matching a CSS selector, wrapped in a document so
+# response.css() and response.xpath() work on it as on a full page
+SUBTREE_SCRIPT = """
+var parts = Array.prototype.map.call(document.querySelectorAll(arguments[0]), function (el) {
+    return el.outerHTML;
+});
+var title = document.createElement('title');
+title.textContent = document.title;
+return '<html><head>' + title.outerHTML + '</head><body>' + parts.join('') + '</body></html>';
+"""
+
+
+def read_page(driver, selector=None):
+    """HTML of the current page - only the elements matching `selector` if given"""
+    if selector:
+        return driver.execute_script(SUBTREE_SCRIPT, selector)
+    return driver.page_source
+
+
+async def snapshot(response, selector=None):
+    """A copy of a rendered response with the browser's current DOM as its body
+
+    For callbacks that change the page (clicks, scrolling) and want to parse
+    the result, or requests rendered with ``meta['render_body'] = False``::
+
+        response = await snapshot(response, 'div.results')
+    """
+    driver = response.meta['driver']
+    body = (await browser_call(response, read_page, driver, selector)).encode('utf-8')
+    pooled = response.meta.get('pooled_driver')
+    if pooled and pooled.pool.stats:
+        pooled.pool.stats.inc_value('selenium/dom_bytes', len(body))
+        pooled.pool.stats.inc_value('selenium/snapshots')
+    return response.replace(body=body, encoding='utf-8')
@@ -0,0 +1,118 @@
+"""
+Proxy pool - serves proxies from the last known list while a background thread refreshes it
+"""
+import time
+import logging
+import threading
+from testSpider.proxy_scheduler import ProxyScheduler
+
+logger = logging.getLogger(__name__)
+
+
+class ProxyPool:
+    """The current working proxies, handed out by a ProxyScheduler
+
+    Starts from the validator's cache (even an expired one) so the crawl can
+    begin straight away, then re-fetches and re-validates every
+    refresh_interval seconds on a daemon thread - sooner if evictions leave
+    fewer than min_proxies. A refresh replaces the candidate set in one go and
+    keeps the scores of proxies that survive it.
+    """
+
+    def __init__(self, validator, fetch_candidates, refresh_interval=3600,
+                 validation_concurrency=1000, validation_target=50, scheduler=None, min_proxies=5):
+        self.validator = validator
+        self.fetch_candidates = fetch_candidates
+        self.refresh_interval = refresh_interval
+        self.validation_concurrency = validation_concurrency
+        self.validation_target = validation_target
+        self.scheduler = scheduler or ProxyScheduler()
+        self.min_proxies = min_proxies
+        self.refreshed_at = 0
+        self.refresh_count = 0
+        self.stopped = threading.Event()
+        self.wakeup = threading.Event()
+        # Set once the background thread has finished a refresh, whether or not it found proxies
+        self.refresh_done = threading.Event()
+        self.thread = None
+
+    def __len__(self):
+        return len(self.scheduler)
+
+    @property
+    def proxies(self):
+        return self.scheduler.proxies
+
+    def start(self):
+        """Load the cached list and start refreshing in the background"""
+        cached = self.validator.load_cache(allow_stale=True)
+        if not cached and self.validator.store is not None:
+            # No JSON cache yet - fall back to the fastest proxies the health store knows
+            cached = self.validator.store.top(max(self.validation_target, 50))
+        if cached:
+            self.swap(cached)
+            self.refreshed_at = self.validator.cache_timestamp
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name='proxy-refresh', daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.wakeup.set()
+
+    def run(self):
+        while not self.stopped.is_set():
+            # A fresh cache on a warm restart means nothing to do until it ages out
+            delay = self.refreshed_at + self.refresh_interval - time.time()
+            if delay > 0:
+                self.wakeup.wait(delay)
+                self.wakeup.clear()
+                if self.stopped.is_set():
+                    return
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Proxy refresh failed: {e}")
+                # Don't hammer the sources - try again after a while
+                self.refreshed_at = time.time() - self.refresh_interval + min(300, self.refresh_interval)
+            self.refresh_done.set()
+
+    def wait_for_refresh(self, timeout=None):
+        """Block until the background thread has finished its first refresh - True if it has"""
+        return self.refresh_done.wait(timeout)
+
+    def refresh(self):
+        """Fetch candidates, validate them and swap in the working ones (blocking)"""
+        candidates = self.fetch_candidates()
+        working = self.validator.validate_proxy_list(
+            candidates,
+            max_workers=self.validation_concurrency,
+            target=self.validation_target,
+        )
+        self.refreshed_at = time.time()
+        self.refresh_count += 1
+        if not working:
+            logger.warning(f"⚠️  Refresh found no working proxies - keeping the current {len(self)}")
+            return self.proxies
+        self.validator.save_cache(working)
+        self.swap(working)
+        logger.info(f"🔄 Proxy pool refreshed: {len(working)} working proxies")
+        return working
+
+    def swap(self, proxies):
+        self.scheduler.update(proxies)
+
+    def next(self):
+        """The proxy for the next browser, or None while the pool is empty"""
+        return self.scheduler.choose()
+
+    def report(self, proxy, ok, latency=None):
+        """Feed a crawl-time success or failure back into the proxy's scores"""
+        self.scheduler.report(proxy, ok, latency)
+        if not ok and len(self) < self.min_proxies and self.thread and time.time() - self.refreshed_at > 60:
+            logger.info(f"Only {len(self)} proxies left - refreshing early")
+            self.refreshed_at = 0
+            self.wakeup.set()
+
+    def is_benched(self, proxy):
+        return self.scheduler.is_benched(proxy)
@@ -0,0 +1,123 @@
+"""
+Proxy scheduler - pick proxies by measured latency and success, benching the ones that fail
+"""
+import time
+import random
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+def proxy_key(proxy):
+    return f"{proxy['ip']}:{proxy['port']}"
+
+
+class ProxyHealth:
+    """Running scores for one proxy"""
+
+    def __init__(self, proxy, latency):
+        self.proxy = proxy
+        self.latency = latency
+        self.success = 1.0
+        self.failures = 0
+        self.penalty_until = 0
+        self.uses = 0
+
+    @property
+    def score(self):
+        # Pages per second we can expect through this proxy
+        return self.success / max(self.latency, 0.01)
+
+
+class ProxyScheduler:
+    """Power-of-two-choices selection over EWMA latency and success rate
+
+    Two proxies are drawn at random from those not in the penalty box and the
+    better scoring one is used, so fast proxies get most of the traffic without
+    every launch piling onto the single best one. Each consecutive failure
+    doubles a proxy's time in the penalty box; max_failures in a row evicts it.
+    """
+
+    def __init__(self, alpha=0.3, base_penalty=30, max_penalty=1800, max_failures=5, default_latency=5.0):
+        self.alpha = alpha
+        self.base_penalty = base_penalty
+        self.max_penalty = max_penalty
+        self.max_failures = max_failures
+        self.default_latency = default_latency
+        self.health = {}
+        self.evicted_count = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.health)
+
+    @property
+    def proxies(self):
+        return [h.proxy for h in list(self.health.values())]
+
+    def update(self, proxies):
+        """Replace the candidate set, keeping scores for proxies that are still in it"""
+        health = {}
+        for proxy in proxies:
+            key = proxy_key(proxy)
+            existing = self.health.get(key)
+            if existing:
+                existing.proxy = proxy
+                health[key] = existing
+            else:
+                health[key] = ProxyHealth(proxy, proxy.get('response_time') or self.default_latency)
+        with self.lock:
+            self.health = health
+
+    def choose(self):
+        """Best of two random available proxies, or None when there are none at all"""
+        with self.lock:
+            if not self.health:
+                return None
+            now = time.time()
+            available = [h for h in self.health.values() if h.penalty_until <= now]
+            if not available:
+                # Everything is benched - use whichever comes back first rather than nothing
+                chosen = min(self.health.values(), key=lambda h: h.penalty_until)
+            elif len(available) == 1:
+                chosen = available[0]
+            else:
+                chosen = max(random.sample(available, 2), key=lambda h: h.score)
+            chosen.uses += 1
+            return chosen.proxy
+
+    def report(self, proxy, ok, latency=None):
+        """Fold one crawl-time outcome into the proxy's scores"""
+        if not proxy:
+            return
+        key = proxy_key(proxy)
+        with self.lock:
+            h = self.health.get(key)
+            if not h:
+                return
+            if ok:
+                h.success += self.alpha * (1 - h.success)
+                if latency is not None:
+                    h.latency += self.alpha * (latency - h.latency)
+                h.failures = 0
+                h.penalty_until = 0
+                return
+
+            h.success -= self.alpha * h.success
+            h.failures += 1
+            if h.failures >= self.max_failures:
+                del self.health[key]
+                self.evicted_count += 1
+                logger.warning(f"🚫 Evicted proxy {key} after {h.failures} failures in a row")
+                return
+            penalty = min(self.max_penalty, self.base_penalty * 2 ** (h.failures - 1))
+            h.penalty_until = time.time() + penalty
+            logger.info(f"Proxy {key} benched for {penalty}s (failure {h.failures}, success {h.success:.2f})")
+
+    def is_benched(self, proxy):
+        """True if the proxy is in the penalty box or has been evicted"""
+        if not proxy:
+            return False
+        h = self.health.get(proxy_key(proxy))
+        return h is None or h.penalty_until > time.time()
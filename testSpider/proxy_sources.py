@@ -0,0 +1,191 @@
+"""
+Proxy sources - fetch every proxy list API at once, with a per-source disk cache
+"""
+import json
+import time
+import hashlib
+import logging
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+logger = logging.getLogger(__name__)
+
+# (domain, parser, ttl) - the first entry whose domain is in the URL parses it
+PARSERS = []
+
+
+def register_parser(domain, ttl=600):
+    """Register a function(text, url) -> [proxy dict] for URLs on `domain`
+
+    ttl is how long that source's payload is reused before it is revalidated.
+    """
+    def decorator(parse):
+        PARSERS.append((domain, parse, ttl))
+        return parse
+    return decorator
+
+
+def parser_for(url):
+    for domain, parse, ttl in PARSERS:
+        if domain in url:
+            return parse, ttl
+    return None, None
+
+
+def query_param(url, name, default=None):
+    if f'{name}=' not in url:
+        return default
+    return url.split(f'{name}=')[1].split('&')[0]
+
+
+@register_parser('geonode.com', ttl=600)
+def parse_geonode(text, url):
+    """Geonode API (JSON format) - elite proxies only"""
+    proxy_list = []
+    for proxy_data in json.loads(text).get('data', []):
+        ip = proxy_data.get('ip', '')
+        port = proxy_data.get('port', '')
+        protocols = proxy_data.get('protocols', [])
+        anonymity = proxy_data.get('anonymityLevel', '')
+
+        if anonymity == 'elite' and ip and port:
+            proxy_list.append({
+                'ip': ip,
+                'port': str(port),
+                'protocol': protocols[0] if protocols else 'socks5',
+                'anonymity': anonymity,
+                'country': proxy_data.get('country', ''),
+            })
+    return proxy_list
+
+
+@register_parser('proxyscrape.com', ttl=300)
+def parse_proxyscrape(text, url):
+    """ProxyScrape API (text format: IP:PORT per line) - protocol and country come from the URL"""
+    protocol = query_param(url, 'protocol', 'http')
+    if protocol not in ('http', 'socks4', 'socks5'):
+        protocol = 'http'
+    country = query_param(url, 'country', 'Unknown')
+    if country == 'all':
+        country = 'Mixed'
+
+    proxy_list = []
+    for line in text.strip().split('\n'):
+        line = line.strip()
+        if ':' in line:
+            ip, port = line.split(':', 1)
+            proxy_list.append({
+                'ip': ip.strip(),
+                'port': port.strip(),
+                'protocol': protocol,
+                'anonymity': 'unknown',
+                'country': country,
+            })
+    return proxy_list
+
+
+class ProxySources:
+    """Fetches proxy list URLs concurrently, caching each payload on disk
+
+    A cached payload younger than its source's TTL is used without a request;
+    an older one is revalidated with If-None-Match / If-Modified-Since. When a
+    source fails or returns something unparseable, its last good payload is
+    used instead.
+    """
+
+    def __init__(self, cache_dir='proxy_sources', timeout=10, max_workers=8, ttl=None):
+        self.cache_dir = Path(__file__).parent.parent / cache_dir
+        self.timeout = timeout
+        self.max_workers = max_workers
+        # Overrides every parser's own TTL when set
+        self.ttl = ttl
+
+    def fetch_all(self, urls):
+        """Fetch every source at once; returns proxies deduplicated by ip:port"""
+        urls = list(urls)
+        if not urls:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(urls))) as executor:
+            results = list(executor.map(self.fetch_source, urls))
+
+        seen = set()
+        unique_proxies = []
+        for proxies in results:
+            for proxy in proxies:
+                key = f"{proxy['ip']}:{proxy['port']}"
+                if key not in seen:
+                    seen.add(key)
+                    unique_proxies.append(proxy)
+        return unique_proxies
+
+    def fetch_source(self, url):
+        parse, ttl = parser_for(url)
+        if not parse:
+            logger.warning(f"Unknown API format: {url}")
+            return []
+        ttl = self.ttl if self.ttl is not None else ttl
+
+        entry = self.read_cache(url)
+        if entry and time.time() - entry['fetched_at'] < ttl:
+            proxies = parse(entry['payload'], url)
+            logger.info(f"Loaded {len(proxies)} proxies from cached {url}")
+            return proxies
+
+        headers = {}
+        if entry and entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+
+        try:
+            logger.info(f"Fetching proxies: {url}")
+            response = requests.get(url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and entry:
+                entry['fetched_at'] = time.time()
+                self.write_cache(url, entry)
+                proxies = parse(entry['payload'], url)
+                logger.info(f"Not modified - reusing {len(proxies)} proxies from {url}")
+                return proxies
+
+            response.raise_for_status()
+            proxies = parse(response.text, url)
+            self.write_cache(url, {
+                'url': url,
+                'fetched_at': time.time(),
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+                'payload': response.text,
+            })
+            logger.info(f"Loaded {len(proxies)} proxies from {url}")
+            return proxies
+
+        except Exception as e:
+            if not entry:
+                logger.error(f"Error fetching {url}: {e}")
+                return []
+            age = time.time() - entry['fetched_at']
+            logger.warning(f"Error fetching {url}: {e} - using last good payload ({age/60:.1f}min old)")
+            return parse(entry['payload'], url)
+
+    def cache_path(self, url):
+        return self.cache_dir / f"{hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]}.json"
+
+    def read_cache(self, url):
+        path = self.cache_path(url)
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.error(f"Error reading source cache {path.name}: {e}")
+            return None
+
+    def write_cache(self, url, entry):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self.cache_path(url)
+        tmp_file = path.with_suffix('.tmp')
+        with open(tmp_file, 'w') as f:
+            json.dump(entry, f)
+        tmp_file.replace(path)
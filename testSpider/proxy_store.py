@@ -0,0 +1,162 @@
+"""
+Proxy health store - per-proxy check history in SQLite, kept across runs
+"""
+import time
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS proxies (
+    key TEXT PRIMARY KEY,
+    ip TEXT NOT NULL,
+    port TEXT NOT NULL,
+    protocol TEXT,
+    country TEXT,
+    anonymity TEXT,
+    checks INTEGER NOT NULL DEFAULT 0,
+    successes INTEGER NOT NULL DEFAULT 0,
+    last_checked REAL,
+    last_ok REAL,
+    last_latency REAL,
+    median_latency REAL
+);
+CREATE TABLE IF NOT EXISTS checks (
+    key TEXT NOT NULL,
+    checked_at REAL NOT NULL,
+    ok INTEGER NOT NULL,
+    latency REAL
+);
+CREATE INDEX IF NOT EXISTS checks_by_key ON checks (key, checked_at);
+CREATE INDEX IF NOT EXISTS proxies_by_rank ON proxies (protocol, country, median_latency);
+CREATE INDEX IF NOT EXISTS proxies_by_last_ok ON proxies (last_ok);
+"""
+
+# Successful checks the median latency is taken over
+MEDIAN_WINDOW = 21
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2
+
+
+class ProxyHealthStore:
+    """Check results keyed by ip:port, queried through indexes instead of loaded whole
+
+    One connection shared by the validator and refresh threads, serialised by a lock.
+    """
+
+    def __init__(self, db_file='proxy_health.sqlite3', history_days=7):
+        self.db_file = Path(__file__).parent.parent / db_file
+        self.history_days = history_days
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(str(self.db_file), check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        with self.conn:
+            self.conn.execute('PRAGMA journal_mode=WAL')
+            self.conn.execute('PRAGMA synchronous=NORMAL')
+            self.conn.executescript(SCHEMA)
+
+    def __len__(self):
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM proxies').fetchone()[0]
+
+    def record(self, results):
+        """Store a batch of (proxy, ok, latency) check results in one transaction"""
+        now = time.time()
+        with self.lock, self.conn:
+            for proxy, ok, latency in results:
+                key = f"{proxy['ip']}:{proxy['port']}"
+                self.conn.execute(
+                    """INSERT INTO proxies (key, ip, port, protocol, country, anonymity)
+                       VALUES (?, ?, ?, ?, ?, ?)
+                       ON CONFLICT (key) DO UPDATE SET
+                           protocol = excluded.protocol, country = excluded.country, anonymity = excluded.anonymity""",
+                    (key, proxy['ip'], str(proxy['port']), proxy.get('protocol'),
+                     proxy.get('country'), proxy.get('anonymity')),
+                )
+                self.conn.execute('INSERT INTO checks (key, checked_at, ok, latency) VALUES (?, ?, ?, ?)',
+                                  (key, now, int(ok), latency if ok else None))
+                if ok:
+                    recent = [row[0] for row in self.conn.execute(
+                        'SELECT latency FROM checks WHERE key = ? AND ok = 1 ORDER BY checked_at DESC LIMIT ?',
+                        (key, MEDIAN_WINDOW),
+                    )]
+                    self.conn.execute(
+                        """UPDATE proxies SET checks = checks + 1, successes = successes + 1,
+                               last_checked = ?, last_ok = ?, last_latency = ?, median_latency = ?
+                           WHERE key = ?""",
+                        (now, now, latency, median(recent), key),
+                    )
+                else:
+                    self.conn.execute('UPDATE proxies SET checks = checks + 1, last_checked = ? WHERE key = ?',
+                                      (now, key))
+            self.conn.execute('DELETE FROM checks WHERE checked_at < ?', (now - self.history_days * 86400,))
+
+    def top(self, limit=50, protocol=None, countries=None, verified_within=None):
+        """Fastest proxies by median latency, e.g. top(50, 'socks5', ['AU', 'JP'])"""
+        query = 'SELECT * FROM proxies WHERE median_latency IS NOT NULL'
+        params = []
+        if protocol:
+            query += ' AND protocol = ?'
+            params.append(protocol)
+        if countries:
+            query += f" AND country IN ({', '.join('?' * len(countries))})"
+            params.extend(countries)
+        if verified_within:
+            query += ' AND last_ok >= ?'
+            params.append(time.time() - verified_within)
+        query += ' ORDER BY median_latency LIMIT ?'
+        params.append(limit)
+        with self.lock:
+            return [self.to_proxy(row) for row in self.conn.execute(query, params)]
+
+    def recently_verified(self, keys, within):
+        """The subset of ip:port keys that passed a check in the last `within` seconds"""
+        cutoff = time.time() - within
+        verified = {}
+        keys = list(keys)
+        with self.lock:
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 900):
+                chunk = keys[start:start + 900]
+                rows = self.conn.execute(
+                    f"SELECT * FROM proxies WHERE last_ok >= ? AND key IN ({', '.join('?' * len(chunk))})",
+                    [cutoff, *chunk],
+                )
+                for row in rows:
+                    verified[row['key']] = self.to_proxy(row)
+        return verified
+
+    def history(self, key, limit=50):
+        """Most recent checks for one proxy as (checked_at, ok, latency)"""
+        with self.lock:
+            return [tuple(row) for row in self.conn.execute(
+                'SELECT checked_at, ok, latency FROM checks WHERE key = ? ORDER BY checked_at DESC LIMIT ?',
+                (key, limit),
+            )]
+
+    @staticmethod
+    def to_proxy(row):
+        return {
+            'ip': row['ip'],
+            'port': row['port'],
+            'protocol': row['protocol'],
+            'anonymity': row['anonymity'],
+            'country': row['country'],
+            'working': True,
+            'response_time': round(row['median_latency'], 2) if row['median_latency'] is not None else None,
+            'last_tested': row['last_ok'],
+            'success_ratio': round(row['successes'] / row['checks'], 2) if row['checks'] else None,
+        }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
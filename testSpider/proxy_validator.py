@@ -4,40 +4,81 @@ Proxy validator - tests and caches working proxies
 import requests
 import json
 import time
+import asyncio
+import threading
+from contextlib import aclosing
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor
 import logging
+import aiohttp
+from aiohttp_socks import ProxyConnector
 
 logger = logging.getLogger(__name__)
 
 
+def run_coroutine(coro):
+    """Run a coroutine to completion on a private event loop in its own thread
+    
+    Scrapy's asyncio reactor owns the calling thread's loop, so asyncio.run()
+    can't be used there.
+    """
+    outcome = {}
+    
+    def runner():
+        try:
+            outcome['result'] = asyncio.run(coro)
+        except BaseException as e:
+            outcome['error'] = e
+    
+    thread = threading.Thread(target=runner, name='proxy-validator')
+    thread.start()
+    thread.join()
+    if 'error' in outcome:
+        raise outcome['error']
+    return outcome['result']
+
+
 class ProxyValidator:
     
-    def __init__(self, cache_file='working_proxies.json', cache_ttl=3600):
+    def __init__(self, cache_file='working_proxies.json', cache_ttl=3600,
+                 test_url='http://httpbin.org/ip', timeout=8, store=None, recheck_after=900):
         self.cache_file = Path(__file__).parent.parent / cache_file
         self.cache_ttl = cache_ttl  # Cache valid for 1 hour
+        self.test_url = test_url
+        self.timeout = timeout
+        self.cache_timestamp = 0
+        # Optional ProxyHealthStore - proxies it saw pass within recheck_after
+        # seconds are reused without testing them again
+        self.store = store
+        self.recheck_after = recheck_after
     
-    def test_proxy(self, proxy, timeout=8):
-        """Test if a single proxy works"""
+    @staticmethod
+    def proxy_url(proxy):
         ip = proxy['ip']
         port = proxy['port']
         protocol = proxy['protocol']
+        # Authenticated upstreams carry credentials (see ForwardProxy)
+        if proxy.get('username'):
+            ip = f"{proxy['username']}:{proxy.get('password', '')}@{ip}"
         
         if 'socks5' in protocol.lower():
-            proxy_url = f"socks5://{ip}:{port}"
+            return f"socks5://{ip}:{port}"
         elif 'socks4' in protocol.lower():
-            proxy_url = f"socks4://{ip}:{port}"
+            return f"socks4://{ip}:{port}"
         elif 'http' in protocol.lower():
-            proxy_url = f"http://{ip}:{port}"
+            return f"http://{ip}:{port}"
         else:
-            proxy_url = f"socks5://{ip}:{port}"
+            return f"socks5://{ip}:{port}"
+    
+    def test_proxy(self, proxy, timeout=None):
+        """Test if a single proxy works"""
+        proxy_url = self.proxy_url(proxy)
         
         try:
             start_time = time.time()
             response = requests.get(
-                'http://httpbin.org/ip',
+                self.test_url,
                 proxies={'http': proxy_url, 'https': proxy_url},
-                timeout=timeout
+                timeout=timeout or self.timeout
             )
             elapsed = time.time() - start_time
             
@@ -51,27 +92,90 @@ class ProxyValidator:
         
         return None
     
-    def validate_proxy_list(self, proxy_list, max_workers=20, max_test=100):
-        """Validate a list of proxies concurrently"""
-        logger.info(f"Validating {min(max_test, len(proxy_list))} proxies...")
+    async def test_proxy_async(self, proxy, semaphore, checked=None):
+        """Test a single proxy without blocking - SOCKS4/5 and HTTP via aiohttp-socks
         
+        Finished checks are appended to `checked` as (proxy, ok, latency).
+        """
+        async with semaphore:
+            result = None
+            try:
+                connector = ProxyConnector.from_url(self.proxy_url(proxy))
+                timeout = aiohttp.ClientTimeout(total=self.timeout)
+                start_time = time.time()
+                async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+                    async with session.get(self.test_url) as response:
+                        await response.read()
+                        if response.status == 200:
+                            proxy['working'] = True
+                            proxy['response_time'] = round(time.time() - start_time, 2)
+                            proxy['last_tested'] = time.time()
+                            result = proxy
+            except Exception:
+                pass
+            if checked is not None:
+                checked.append((proxy, result is not None, proxy['response_time'] if result else None))
+        return result
+    
+    async def iter_validated(self, proxy_list, concurrency=1000, checked=None):
+        """Yield working proxies as soon as each check finishes"""
+        semaphore = asyncio.Semaphore(concurrency)
+        tasks = [asyncio.ensure_future(self.test_proxy_async(proxy, semaphore, checked)) for proxy in proxy_list]
+        try:
+            for i, next_done in enumerate(asyncio.as_completed(tasks), 1):
+                result = await next_done
+                if i % 100 == 0:
+                    logger.info(f"Tested {i}/{len(tasks)}")
+                if result:
+                    yield result
+        finally:
+            # Stopping early (or failing) must not leave checks running
+            for t in tasks:
+                t.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def validate_async(self, proxy_list, concurrency=1000, target=None, on_result=None, checked=None):
+        """Validate proxies concurrently, stopping once `target` working ones are found"""
         working_proxies = []
-        test_list = proxy_list[:max_test]
+        async with aclosing(self.iter_validated(proxy_list, concurrency, checked)) as results:
+            async for result in results:
+                working_proxies.append(result)
+                logger.info(f"✅ Found working proxy: {result['ip']}:{result['port']} ({result['response_time']}s)")
+                if on_result:
+                    on_result(result)
+                if target and len(working_proxies) >= target:
+                    logger.info(f"Reached target of {target} working proxies - stopping early")
+                    break
+        return working_proxies
+    
+    def validate_proxy_list(self, proxy_list, max_workers=1000, max_test=None, target=None):
+        """Validate a list of proxies concurrently (blocking wrapper around validate_async)"""
+        test_list = proxy_list[:max_test] if max_test else proxy_list
         
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = [executor.submit(self.test_proxy, proxy) for proxy in test_list]
-            
-            for i, future in enumerate(futures, 1):
-                result = future.result()
-                if result:
-                    working_proxies.append(result)
-                    logger.info(f"✅ Found working proxy: {result['ip']}:{result['port']} ({result['response_time']}s)")
-                
-                if i % 10 == 0:
-                    logger.info(f"Tested {i}/{len(test_list)} - Found {len(working_proxies)} working")
+        reused = []
+        if self.store is not None and self.recheck_after:
+            verified = self.store.recently_verified(
+                (f"{proxy['ip']}:{proxy['port']}" for proxy in test_list), self.recheck_after
+            )
+            if verified:
+                reused = list(verified.values())
+                test_list = [proxy for proxy in test_list if f"{proxy['ip']}:{proxy['port']}" not in verified]
+                logger.info(f"Reusing {len(reused)} proxies verified in the last {self.recheck_after/60:.0f}min")
+            if target and len(reused) >= target:
+                return reused
         
-        logger.info(f"Validation complete: {len(working_proxies)}/{len(test_list)} working ({len(working_proxies)/len(test_list)*100:.1f}%)")
-        return working_proxies
+        logger.info(f"Validating {len(test_list)} proxies ({max_workers} at a time)...")
+        checked = []
+        working_proxies = run_coroutine(self.validate_async(
+            test_list, concurrency=max_workers, target=target - len(reused) if target else None, checked=checked,
+        ))
+        if self.store is not None and checked:
+            self.store.record(checked)
+        
+        if test_list:
+            logger.info(f"Validation complete: {len(working_proxies)}/{len(test_list)} working "
+                        f"({len(working_proxies)/len(test_list)*100:.1f}%)")
+        return reused + working_proxies
     
     def save_cache(self, proxies):
         """Save working proxies to cache"""
@@ -80,13 +184,17 @@ class ProxyValidator:
             'proxies': proxies
         }
         
-        with open(self.cache_file, 'w') as f:
+        # Written from the refresh thread while the crawl may be reading it - swap in whole
+        tmp_file = self.cache_file.with_suffix('.tmp')
+        with open(tmp_file, 'w') as f:
             json.dump(cache_data, f, indent=2)
+        tmp_file.replace(self.cache_file)
+        self.cache_timestamp = cache_data['timestamp']
         
         logger.info(f"Saved {len(proxies)} working proxies to cache")
     
-    def load_cache(self):
-        """Load working proxies from cache if valid"""
+    def load_cache(self, allow_stale=False):
+        """Load working proxies from cache if valid (or at all, with allow_stale)"""
         if not self.cache_file.exists():
             return None
         
@@ -97,9 +205,11 @@ class ProxyValidator:
             timestamp = cache_data.get('timestamp', 0)
             age = time.time() - timestamp
             
-            if age < self.cache_ttl:
+            if age < self.cache_ttl or allow_stale:
                 proxies = cache_data.get('proxies', [])
-                logger.info(f"Loaded {len(proxies)} proxies from cache (age: {age/60:.1f}min)")
+                self.cache_timestamp = timestamp
+                stale = ' - stale' if age >= self.cache_ttl else ''
+                logger.info(f"Loaded {len(proxies)} proxies from cache (age: {age/60:.1f}min{stale})")
                 return proxies
             else:
                 logger.info(f"Cache expired (age: {age/60:.1f}min > {self.cache_ttl/60:.1f}min)")
@@ -116,7 +226,7 @@ class ProxyValidator:
                 return cached
         
         # Validate proxies
-        working = self.validate_proxy_list(proxy_list, max_workers=20, max_test=100)
+        working = self.validate_proxy_list(proxy_list)
         
         if working:
             self.save_cache(working)
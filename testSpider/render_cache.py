@@ -0,0 +1,150 @@
+"""
+Render cache - rendered pages on disk, gzipped, so a re-run can replay them without Chrome
+"""
+import os
+import gzip
+import json
+import time
+import hashlib
+import logging
+import threading
+from pathlib import Path
+from testSpider.page_snapshot import read_page
+
+logger = logging.getLogger(__name__)
+
+# Request meta that changes what a render produces
+KEY_META = ('render_selector', 'render_body')
+
+
+def condition_key(condition):
+    """What a wait_until condition waits for, as plain data
+
+    Selenium's expected conditions are closures, so the locator (or text, or
+    nested conditions for any_of/all_of) lives in the closure cells. Lambdas
+    share a name, so a function's module and line are part of the key as well.
+    Callable objects are described by their attributes.
+    """
+    if isinstance(condition, (str, int, float, bool, type(None))):
+        return condition
+    if isinstance(condition, (list, tuple)):
+        return [condition_key(value) for value in condition]
+    if isinstance(condition, dict):
+        return {str(name): condition_key(value) for name, value in condition.items()}
+    code = getattr(condition, '__code__', None)
+    if code is not None:
+        cells = [cell.cell_contents for cell in condition.__closure__ or ()]
+        constants = [value for value in code.co_consts if isinstance(value, (str, int, float, tuple))]
+        return [condition.__module__, condition.__qualname__, code.co_firstlineno, condition_key(constants),
+                condition_key(cells), condition_key(list(condition.__defaults__ or ()))]
+    if callable(condition) and hasattr(condition, '__dict__'):
+        return [type(condition).__module__, type(condition).__qualname__, condition_key(vars(condition))]
+    # Anything else (a WebElement, say) by its repr - never equal across sessions, so no false hits
+    return repr(condition)
+
+
+def render_key(request):
+    """Cache key for a SeleniumRequest - its URL plus everything that affects the rendered DOM"""
+    wait_until = getattr(request, 'wait_until', None)
+    parts = {
+        'url': request.url,
+        'method': request.method,
+        'body': request.body.decode('latin-1'),
+        'wait_time': getattr(request, 'wait_time', None),
+        'wait_until': condition_key(wait_until) if wait_until else None,
+        'wait_for': getattr(request, 'wait_for', None),
+        'script': getattr(request, 'script', None),
+        'meta': {name: request.meta.get(name) for name in KEY_META},
+    }
+    return hashlib.sha1(json.dumps(parts, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class RenderCache:
+    """Gzipped pages under cache_dir/<key[:2]>/<key>.html.gz
+
+    Each file is a JSON header line (final URL, when it was stored) followed by
+    the page. Entries older than ttl seconds (0 = never) are misses; once the
+    directory grows past max_bytes the least recently stored pages go first.
+    """
+
+    def __init__(self, cache_dir='render_cache', ttl=0, max_bytes=500 * 1024 * 1024):
+        self.cache_dir = Path(__file__).parent.parent / cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        # key -> (size, mtime), so eviction doesn't rescan the directory
+        self.index = {}
+        for path in self.cache_dir.glob('*/*.html.gz'):
+            stat = path.stat()
+            self.index[path.name.split('.')[0]] = (stat.st_size, stat.st_mtime)
+        self.total_bytes = sum(size for size, _ in self.index.values())
+
+    def __len__(self):
+        return len(self.index)
+
+    def path_for(self, key):
+        return self.cache_dir / key[:2] / f'{key}.html.gz'
+
+    def load(self, request):
+        """(url, body) of the cached render, or None"""
+        key = render_key(request)
+        path = self.path_for(key)
+        try:
+            with gzip.open(path, 'rb') as f:
+                header = json.loads(f.readline())
+                body = f.read()
+        except (OSError, ValueError, EOFError):
+            return None
+        if self.ttl and time.time() - header['stored_at'] > self.ttl:
+            self.remove(key)
+            return None
+        return header['url'], body
+
+    def store(self, request, url, body):
+        key = render_key(request)
+        path = self.path_for(key)
+        path.parent.mkdir(exist_ok=True)
+        header = json.dumps({'url': url, 'stored_at': time.time()}).encode() + b'\n'
+        # Readers in this or another process never see a half-written file
+        temp = path.with_name(f'{path.name}.{os.getpid()}.{threading.get_ident()}.tmp')
+        with gzip.open(temp, 'wb', compresslevel=6) as f:
+            f.write(header)
+            f.write(body)
+        os.replace(temp, path)
+
+        size = path.stat().st_size
+        with self.lock:
+            old_size, _ = self.index.get(key, (0, 0))
+            self.index[key] = (size, time.time())
+            self.total_bytes += size - old_size
+        if self.max_bytes and self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def store_page(self, request, driver):
+        """Store what the browser shows now - for callbacks that change the page before it's cached"""
+        body = read_page(driver, request.meta.get('render_selector')).encode('utf-8')
+        self.store(request, driver.current_url, body)
+        return len(body)
+
+    def remove(self, key):
+        try:
+            self.path_for(key).unlink()
+        except OSError:
+            pass
+        with self.lock:
+            size, _ = self.index.pop(key, (0, 0))
+            self.total_bytes -= size
+
+    def evict(self):
+        """Drop the oldest pages until the cache is back under 90% of max_bytes"""
+        with self.lock:
+            oldest = sorted(self.index, key=lambda k: self.index[k][1])
+        target = self.max_bytes * 0.9
+        evicted = 0
+        for key in oldest:
+            if self.total_bytes <= target:
+                break
+            self.remove(key)
+            evicted += 1
+        logger.info(f"🧹 Render cache over {self.max_bytes // (1024 * 1024)}MB - evicted {evicted} pages")
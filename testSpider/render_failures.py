@@ -0,0 +1,86 @@
+"""
+Render failures - work out why a browser render failed and what a retry needs
+"""
+from urllib3.exceptions import HTTPError as DriverConnectionError
+from selenium.common.exceptions import TimeoutException
+
+PROXY_ERROR = 'proxy'
+TIMEOUT = 'timeout'
+WAIT = 'wait'
+CRASHED = 'crashed'
+CHALLENGE = 'challenge'
+OOM = 'oom'
+OTHER = 'other'
+
+# Chrome net errors that mean the proxy (or the route through it) is bad
+PROXY_ERROR_MARKERS = (
+    'err_proxy',
+    'err_tunnel_connection_failed',
+    'err_socks_connection_failed',
+    'err_connection_reset',
+    'err_connection_closed',
+    'err_connection_refused',
+    'err_empty_response',
+    'err_timed_out',
+    'err_connection_timed_out',
+    'err_address_unreachable',
+)
+
+OOM_MARKERS = (
+    'out of memory',
+    'sbox_fatal_memory_exceeded',
+)
+
+# The tab or the whole browser is gone
+CRASH_MARKERS = (
+    'tab crashed',
+    'page crash',
+    'chrome not reachable',
+    'invalid session id',
+    'no such window',
+    'target window already closed',
+    'session deleted',
+    'disconnected',
+)
+
+# What each kind of failure needs before the request is retried
+FAILURE_ACTIONS = {
+    PROXY_ERROR: {'new_proxy': True, 'new_driver': False},
+    TIMEOUT: {'new_proxy': True, 'new_driver': False},
+    WAIT: {'new_proxy': False, 'new_driver': False},
+    CHALLENGE: {'new_proxy': True, 'new_driver': True},
+    CRASHED: {'new_proxy': False, 'new_driver': True},
+    OOM: {'new_proxy': False, 'new_driver': True},
+}
+
+# Failures that count against the proxy's health score - not WAIT: the page loaded,
+# the request's own condition just never came true
+PROXY_FAILURES = (PROXY_ERROR, TIMEOUT, CHALLENGE)
+
+
+class RenderFailure(Exception):
+    """Raised from a render when the page loaded but is unusable"""
+
+    def __init__(self, kind, message):
+        super().__init__(message)
+        self.kind = kind
+
+
+def classify_failure(exc):
+    """Map an exception from a render to one of the failure kinds above"""
+    if isinstance(exc, RenderFailure):
+        return exc.kind
+
+    message = str(exc).lower()
+    if any(marker in message for marker in OOM_MARKERS):
+        return OOM
+    if any(marker in message for marker in PROXY_ERROR_MARKERS):
+        return PROXY_ERROR
+    if isinstance(exc, TimeoutException) or 'timed out receiving message from renderer' in message:
+        return TIMEOUT
+    # chromedriver itself died - every command fails to connect
+    if isinstance(exc, (ConnectionError, DriverConnectionError)):
+        return CRASHED
+    if any(marker in message for marker in CRASH_MARKERS):
+        return CRASHED
+    return OTHER
@@ -0,0 +1,71 @@
+"""
+Render policy - decide whether a SeleniumRequest really needs a browser
+"""
+from scrapy.http import HtmlResponse, TextResponse
+
+# Always render in Chrome (the original behaviour)
+RENDER_ALWAYS = 'always'
+# Fetch with Scrapy's downloader first, escalate to Chrome only when needed
+RENDER_AUTO = 'auto'
+
+RENDER_POLICIES = (RENDER_ALWAYS, RENDER_AUTO)
+
+CHALLENGE_TITLES = (
+    'just a moment',
+    'attention required',
+    'checking your browser',
+)
+
+JS_REQUIRED_MARKERS = (
+    'enable javascript',
+    'javascript is required',
+    'requires javascript',
+    'turn on javascript',
+)
+
+# Pages with less visible text than this and at least one script are treated as
+# client-side rendered shells
+MIN_VISIBLE_TEXT = 200
+
+
+def get_render_policy(request, spider, default=RENDER_ALWAYS):
+    """Resolve the policy: request meta, then spider attribute, then settings default"""
+    policy = request.meta.get('render_policy') or getattr(spider, 'render_policy', None) or default
+    if policy not in RENDER_POLICIES:
+        raise ValueError(f"Unknown render policy {policy!r} - expected one of {RENDER_POLICIES}")
+    return policy
+
+
+def needs_browser(response, required_css=None):
+    """Return why a plain HTTP response can't be used, or None if it is good enough"""
+    if response.status in (403, 503):
+        if response.headers.get('cf-mitigated') or b'cloudflare' in response.headers.get('Server', b'').lower():
+            return f"cloudflare challenge (HTTP {response.status})"
+
+    if not isinstance(response, TextResponse):
+        return None
+
+    # JSON, plain text and other non-HTML bodies don't need rendering - and
+    # their selectors may not support CSS at all (a JSON body raises)
+    content_type = response.headers.get('Content-Type', b'').decode('latin-1').lower()
+    if 'html' not in content_type and not isinstance(response, HtmlResponse):
+        return None
+
+    title = (response.css('title::text').get() or '').strip().lower()
+    if any(marker in title for marker in CHALLENGE_TITLES):
+        return f"challenge page ({title!r})"
+
+    if required_css and not response.css(required_css):
+        return f"no elements match {required_css!r}"
+
+    if 'html' not in content_type:
+        return None
+
+    visible_text = response.xpath('normalize-space(string(//body))').get() or ''
+    if len(visible_text) < MIN_VISIBLE_TEXT and response.css('script'):
+        noscript = ' '.join(response.css('noscript ::text').getall()).lower()
+        if any(marker in noscript for marker in JS_REQUIRED_MARKERS):
+            return "page asks for JavaScript"
+        return "client-side rendered shell"
+
+    return None
@@ -0,0 +1,58 @@
+"""
+Render requests - SeleniumRequests made only of data, so JOBDIR and the frontier can store them
+"""
+from scrapy import Request
+from scrapy_selenium import SeleniumRequest
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+
+WAIT_STATES = {
+    'present': EC.presence_of_element_located,
+    'visible': EC.visibility_of_element_located,
+    'clickable': EC.element_to_be_clickable,
+    'gone': EC.invisibility_of_element_located,
+}
+
+
+def wait_condition(wait_for):
+    """The expected condition for a declarative wait like {'css': 'div.card', 'state': 'visible'}"""
+    state = wait_for.get('state', 'present')
+    if state not in WAIT_STATES:
+        raise ValueError(f"Unknown wait state {state!r} - expected one of {', '.join(WAIT_STATES)}")
+    if 'css' in wait_for:
+        locator = (By.CSS_SELECTOR, wait_for['css'])
+    elif 'xpath' in wait_for:
+        locator = (By.XPATH, wait_for['xpath'])
+    else:
+        raise ValueError(f"Wait needs a 'css' or 'xpath' selector: {wait_for!r}")
+    return WAIT_STATES[state](locator)
+
+
+class RenderRequest(SeleniumRequest):
+    """A SeleniumRequest whose wait is described by data instead of a callable
+
+        RenderRequest(url, wait_time=10, wait_for={'css': 'div.card-item-info'})
+
+    Every field is in `attributes`, so to_dict()/replace() keep them and the
+    request survives JOBDIR disk queues and the shared frontier. wait_until is
+    built from wait_for when the middleware asks for it.
+    """
+
+    attributes = Request.attributes + ('wait_time', 'wait_for', 'screenshot', 'script')
+
+    def __init__(self, url, wait_time=None, wait_for=None, screenshot=False, script=None, **kwargs):
+        if wait_for is not None:
+            # Fail at creation, not in a browser thread halfway through the crawl
+            wait_condition(wait_for)
+        self.wait_for = wait_for
+        super().__init__(url=url, wait_time=wait_time, screenshot=screenshot, script=script, **kwargs)
+
+    @property
+    def wait_until(self):
+        return wait_condition(self.wait_for) if self.wait_for else None
+
+    @wait_until.setter
+    def wait_until(self, value):
+        # SeleniumRequest.__init__ assigns None here - anything else would not serialize
+        if value is not None:
+            raise TypeError("RenderRequest takes wait_for, not a wait_until callable")
@@ -31,6 +31,8 @@ DOWNLOADER_MIDDLEWARES = {
     'testSpider.custom_middleware.SeleniumMiddleware': 600,
     'scrapy_user_agents.middlewares.RandomUserAgentMiddleware': 400,
     'scrapy.downloadermiddlewares.httpproxy.HttpProxyMiddleware': 110,
+    # Sees download failures last, after retries - only does anything under FrontierScheduler
+    'testSpider.frontier.FrontierFailureMiddleware': 50,
 }
 
 # Retry many times since proxies often fail
@@ -64,6 +66,11 @@ DEFAULT_REQUEST_HEADERS = {
 #SPIDER_MIDDLEWARES = {
 #    "scraper.middlewares.ScraperSpiderMiddleware": 543,
 #}
+SPIDER_MIDDLEWARES = {
+    'testSpider.custom_middleware.SeleniumSpiderMiddleware': 543,
+    'testSpider.frontier.FrontierAckMiddleware': 544,
+    'testSpider.timings.StageTimingMiddleware': 545,
+}
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
@@ -76,10 +83,14 @@ DEFAULT_REQUEST_HEADERS = {
 #EXTENSIONS = {
 #    "scrapy.extensions.telnet.TelnetConsole": None,
 #}
+EXTENSIONS = {
+    'testSpider.stats_exporter.PrometheusExporter': 500,
+}
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 ITEM_PIPELINES = {
+    "testSpider.dedup_pipeline.DedupPipeline": 200,
     "testSpider.supabase_pipeline.SupabasePipeline": 300,
 }
 
@@ -123,8 +134,23 @@ LOG_ENABLED = True
 # Output to stdout
 LOG_STDOUT = True
 
+# Duplicate cards dropped by DedupPipeline log at DEBUG instead of WARNING
+LOG_FORMATTER = 'testSpider.dedup_pipeline.DedupLogFormatter'
+
 # Proxy settings
 PROXY_ROTATION_ENABLED = True  # Set to False to disable proxy rotation
+PROXY_VALIDATION_CONCURRENCY = 1000  # Proxies checked at once (asyncio, no threads)
+PROXY_VALIDATION_TARGET = 50  # Stop validating once this many work (0 = check all)
+PROXY_REFRESH_INTERVAL = 3600  # Seconds between background re-fetch + re-validate
+PROXY_SOURCE_TIMEOUT = 10  # Per-source request timeout (sources are fetched in parallel)
+PROXY_SOURCE_TTL = 0  # Reuse cached source payloads this long (0 = each parser's own TTL)
+PROXY_PENALTY_BASE = 30  # Seconds benched after a crawl failure, doubling per failure in a row
+PROXY_PENALTY_MAX = 1800  # Longest a proxy is benched
+PROXY_MAX_FAILURES = 5  # Failures in a row before a proxy is evicted until the next refresh
+PROXY_STORE_FILE = 'proxy_health.sqlite3'  # Per-proxy check history across runs ('' to disable)
+PROXY_RECHECK_AFTER = 900  # Reuse proxies that passed a check this recently without re-testing
+PROXY_FORWARDING = True  # Browsers use a local forwarding proxy so upstreams switch without a relaunch
+PROXY_ROTATE_EVERY = 0  # Switch a browser's upstream every N requests (0 = only when it fails)
 
 # Proxy API endpoints (fetch latest proxies in real-time)
 PROXY_API_URLS = [
@@ -137,3 +163,89 @@ PROXY_API_URLS = [
     'https://api.proxyscrape.com/v2/?request=getproxies&protocol=socks5&timeout=10000&country=all',
     'https://api.proxyscrape.com/v2/?request=getproxies&protocol=http&timeout=10000&country=all',
 ]
+
+# Selenium browser pool
+SELENIUM_POOL_SIZE = 4  # Number of Chrome instances rendering SeleniumRequests in parallel
+SELENIUM_TABS_PER_BROWSER = 1  # Tabs rendering in parallel in each Chrome (pool = browsers x tabs)
+SELENIUM_MAX_REQUESTS_PER_DRIVER = 1000000  # Recycle a browser after this many requests
+SELENIUM_KEEP_BROWSER_OPEN = True  # Leave browsers open after the crawl for inspection
+SELENIUM_PAGE_LOAD_TIMEOUT = 30  # Seconds before a hung page load fails as a timeout
+SELENIUM_CHALLENGE_WAIT = 15  # Seconds to let a Cloudflare check clear before retrying elsewhere
+SELENIUM_MAX_RENDER_RETRIES = 2  # Retries for proxy/timeout/crash/challenge/OOM failures
+SELENIUM_MAX_DRIVER_RSS_MB = 1500  # Recycle a browser whose processes use more than this (0 = off)
+SELENIUM_RSS_CHECK_EVERY = 10  # Requests between memory checks per browser
+SELENIUM_WARM_START = True  # Patch chromedriver once per process and reuse one UserAgent
+SELENIUM_PROFILE_TEMPLATE = 'chrome_profile_template'  # Profile copied for each new browser ('' = fresh temp profile)
+SELENIUM_PRESPAWN = 0  # Browsers launched when the spider opens, ahead of the first request (opt in per crawl)
+
+# Render policy for SeleniumRequests (spiders can override with a render_policy
+# attribute, requests with meta['render_policy'])
+#   'always' - render every request in Chrome
+#   'auto'   - fetch with the plain downloader first, render only when the
+#              response is a JS shell / Cloudflare challenge / lacks
+#              meta['render_required_css']
+SELENIUM_RENDER_POLICY = 'always'
+
+# Browser profile
+#   'default' - headed Chrome, maximized, loads everything
+#   'lean'    - headless, no GPU/extensions/background networking, and blocks
+#               the resource types and URL patterns below via CDP
+SELENIUM_PROFILE = 'default'
+SELENIUM_BLOCKED_RESOURCE_TYPES = ['image', 'font', 'media']  # also: 'stylesheet'
+SELENIUM_BLOCKED_URL_PATTERNS = [
+    '*google-analytics.com*',
+    '*googletagmanager.com*',
+    '*doubleclick.net*',
+    '*connect.facebook.net*',
+    '*hotjar.com*',
+]
+
+# Record XHR/fetch traffic through Chrome's performance log so requests with
+# meta['capture_network'] get matching JSON in response.meta['network_json']
+# (the test spider turns this on itself with -a mode=api)
+SELENIUM_NETWORK_CAPTURE = False
+
+# Keep rendered SeleniumRequest pages on disk (gzipped) and serve re-runs from them.
+# RENDER_CACHE_OFFLINE replays only - misses are dropped, no browser or proxy is started
+RENDER_CACHE_ENABLED = False
+RENDER_CACHE_DIR = 'render_cache'
+RENDER_CACHE_TTL = 0  # Seconds a page stays valid (0 = forever)
+RENDER_CACHE_MAX_MB = 500  # Oldest pages are evicted past this
+RENDER_CACHE_OFFLINE = False
+
+# Supabase writes - rows per bulk upsert, and how often a partial batch is flushed
+SUPABASE_BATCH_SIZE = 200
+SUPABASE_FLUSH_INTERVAL = 5.0  # seconds
+# Batches are written by background threads; items only wait once this many
+# batches are queued or in flight
+SUPABASE_MAX_IN_FLIGHT = 2
+SUPABASE_MAX_PENDING_BATCHES = 8
+# Transport errors and 5xx retry the whole batch, waiting 1s, 2s, 4s... in between;
+# constraint errors split it to find the bad rows
+SUPABASE_WRITE_RETRIES = 3
+SUPABASE_RETRY_BACKOFF = 1.0
+
+# Drop repeated (name, tag) cards before they cost a Supabase upsert
+DEDUP_MODE = 'exact'  # 'exact' (hash set) or 'bloom' (bounded memory, rare false positives)
+DEDUP_BLOOM_CAPACITY = 1000000
+DEDUP_BLOOM_ERROR_RATE = 0.001
+# 'none', 'snapshot' (load DEDUP_SNAPSHOT_FILE, save the keys Supabase confirmed - exact mode only)
+# or 'supabase' (read the cards table at start)
+DEDUP_PRESEED = 'none'
+DEDUP_SNAPSHOT_FILE = 'seen_cards.bin'
+
+# Sharded crawls - run with -s SCHEDULER=testSpider.frontier.FrontierScheduler in
+# any number of processes sharing FRONTIER_FILE
+FRONTIER_FILE = 'frontier.sqlite3'
+FRONTIER_LEASE_SECONDS = 300  # A worker that stops renewing its leases for this long is presumed dead
+FRONTIER_LEASE_BATCH = 4  # Requests leased per trip to the database
+FRONTIER_MAX_ATTEMPTS = 3  # Leases before a request is marked failed
+FRONTIER_WORKER_ID = None  # Defaults to hostname-pid
+
+# Stage timings (browser acquire/launch, get, wait, script, page_source, parse,
+# pipeline_write) are always recorded as timing/<stage>/... stats. With
+# PROMETHEUS_ENABLED every stat is also served in Prometheus format at
+# http://PROMETHEUS_HOST:PROMETHEUS_PORT/metrics while the crawl runs
+PROMETHEUS_ENABLED = False
+PROMETHEUS_HOST = '127.0.0.1'
+PROMETHEUS_PORT = 9410
@@ -5,17 +5,22 @@ from scrapy_selenium import SeleniumRequest
 
 class FinalTestSpider(scrapy.Spider):
     name = "final_test"
+    # Static site - only fall back to Chrome if the quotes aren't in the raw HTML
+    render_policy = 'auto'
+    # Quotes aren't cards - keep them out of the dedup/Supabase pipelines
+    custom_settings = {'ITEM_PIPELINES': {}}
     
-    def __init__(self, *args, **kwargs):
+    def __init__(self, start_url=None, max_pages=2, *args, **kwargs):
         super(FinalTestSpider, self).__init__(*args, **kwargs)
         # Using a simple test website that works well with Selenium
-        self.start_urls = ["http://quotes.toscrape.com/"]
+        self.start_urls = [start_url or "http://quotes.toscrape.com/"]
         self.collected_items = []
-        self.max_pages = 2  # Limit for testing
+        self.max_pages = int(max_pages)  # Limit for testing
 
     def start_requests(self):
         for url in self.start_urls:
-            yield SeleniumRequest(url=url, wait_time=3, callback=self.parse)
+            yield SeleniumRequest(url=url, wait_time=3, callback=self.parse,
+                                  meta={'render_required_css': 'div.quote'})
 
     def parse(self, response):
         # Extract quotes
@@ -34,6 +39,7 @@ class FinalTestSpider(scrapy.Spider):
             }
             
             self.collected_items.append(item)
+            yield item
         
         print(f"✓ Processed: {response.url}")
         print(f"  Found {len(quotes)} quotes on this page")
@@ -43,7 +49,8 @@ class FinalTestSpider(scrapy.Spider):
             next_page = response.css('li.next a::attr(href)').get()
             if next_page:
                 next_url = response.urljoin(next_page)
-                yield SeleniumRequest(url=next_url, wait_time=3, callback=self.parse)
+                yield SeleniumRequest(url=next_url, wait_time=3, callback=self.parse,
+                                      meta={'render_required_css': 'div.quote'})
 
     def close(self, reason):
         output_file = 'final_test_output.json'
@@ -6,6 +6,8 @@ from scrapy_selenium import SeleniumRequest
 class ProxyTestSpider(scrapy.Spider):
     """Test spider to verify proxy is working"""
     name = "proxy_test"
+    # Always use Chrome - the point is to see the IP the browser's proxy exposes
+    render_policy = 'always'
     
     def __init__(self, *args, **kwargs):
         super(ProxyTestSpider, self).__init__(*args, **kwargs)
@@ -1,105 +1,405 @@
 import os
 import json
-import time
 import scrapy
 from bs4 import BeautifulSoup
-from scrapy_selenium import SeleniumRequest
+from testSpider.checkpoint import PaginationCheckpoint
+from testSpider.driver_pool import browser_call
+from testSpider.network_capture import PaginatedApi, capture_json, find_records
+from testSpider.render_request import RenderRequest
+from testSpider.waits import track_requests, wait_for_more, wait_for_title_change
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
+
+
+# JSON endpoints the index page loads card batches from
+DEFAULT_API_PATTERN = r'cardladder\.com/.*(api|search|query|cards)'
+
+# Candidate keys for each part of a card in the API's JSON records
+RECORD_KEYS = {
+    'year': ('year',),
+    'set': ('set', 'setName', 'set_name'),
+    'name': ('player', 'name', 'cardName', 'card_name', 'title'),
+    'number': ('number', 'cardNumber', 'card_number'),
+    'chips': ('variation', 'rarity', 'gradingCompany', 'grader', 'condition', 'grade'),
+}
+
+
+# Returns the cards not extracted yet, with the same text the CSS selectors in
+# extract_cards read, and tags them so the next call skips them. With prune set,
+# each extracted card's own tile is hidden and its images unloaded. Nothing is
+# removed: the list belongs to the page's framework (React on CardLadder), and
+# taking nodes out from under it breaks its next update.
+EXTRACT_NEW_CARDS_SCRIPT = """
+var prune = arguments[0];
+function containsCard(el) {
+    return el.matches('div.card-item-info') || el.querySelector('div.card-item-info') !== null;
+}
+// The list the tiles share: the closest element holding the first and last card on the page
+function cardList() {
+    var all = document.querySelectorAll('div.card-item-info');
+    if (all.length < 2) { return null; }
+    var list = all[0].parentElement;
+    while (list && !list.contains(all[all.length - 1])) { list = list.parentElement; }
+    return list;
+}
+var list = cardList();
+// The outermost element below the list holding this card and no other. With a single
+// card on the page the list can't be told apart from the app around it, so just the card.
+function ownTile(card) {
+    if (!list || !list.contains(card)) { return card; }
+    var tile = card;
+    while (tile.parentElement !== list) {
+        var siblings = tile.parentElement.children;
+        for (var i = 0; i < siblings.length; i++) {
+            if (siblings[i] !== tile && containsCard(siblings[i])) { return tile; }
+        }
+        tile = tile.parentElement;
+    }
+    return tile;
+}
+function ownText(el) {
+    if (!el) { return null; }
+    var text = '';
+    for (var i = 0; i < el.childNodes.length; i++) {
+        if (el.childNodes[i].nodeType === Node.TEXT_NODE) { text += el.childNodes[i].nodeValue; }
+    }
+    return text;
+}
+var cards = document.querySelectorAll('div.card-item-info:not([data-scraped])');
+var out = [];
+for (var i = 0; i < cards.length; i++) {
+    var card = cards[i];
+    var cardName = card.querySelector('div.card-name');
+    var chips = card.querySelectorAll('span.grade-variation-chip span:first-child');
+    out.push({
+        set: ownText(card.querySelector('div.card-set')),
+        name: cardName ? ownText(cardName.querySelector('span:first-child')) : null,
+        number: cardName ? ownText(cardName.querySelector('span:last-child')) : null,
+        chips: Array.prototype.map.call(chips, ownText)
+    });
+    card.setAttribute('data-scraped', '1');
+    if (prune) {
+        var tile = ownTile(card);
+        tile.style.display = 'none';
+        var images = tile.querySelectorAll('img[src]');
+        for (var j = 0; j < images.length; j++) { images[j].removeAttribute('src'); }
+    }
+}
+return out;
+"""
+
+
+# Possible selectors for the Load More button, most specific first
+LOAD_MORE_SELECTORS = [
+    "//button[contains(@class, 'btn') and contains(@class, 'secondary') and contains(text(), 'Load more')]",
+    "//button[contains(text(), 'Load more')]",
+    "//button[contains(text(), 'Load More')]",
+    "//button[@class='btn secondary']"
+]
+LOAD_MORE_XPATH = ' | '.join(LOAD_MORE_SELECTORS)
+
+# Cards that extract_new_cards hasn't returned yet
+NEW_CARD_SELECTOR = 'div.card-item-info:not([data-scraped])'
+COUNT_CARDS_SCRIPT = "return document.querySelectorAll('div.card-item-info').length;"
+
+# Times a Load More session is re-requested after the browser fails mid-way
+MAX_RESUMES = 3
 
 
 class TestSpider(scrapy.Spider):
     name = "test"
     
-    def __init__(self, *args, **kwargs):
+    def __init__(self, mode='dom', api_pattern=DEFAULT_API_PATTERN, prune_dom=False, wait_timeout=15,
+                 start_url=None, *args, **kwargs):
         super(TestSpider, self).__init__(*args, **kwargs)
-        # CardLadder Pokemon index page
-        self.start_urls = ["https://www.cardladder.com/indexes/pokemon"]
+        # CardLadder Pokemon index page, or -a start_url=... (e.g. the benchmark fixture site)
+        self.start_urls = [start_url or "https://www.cardladder.com/indexes/pokemon"]
         self.cards_scraped = 0
         self.load_more_clicks = 0
+        # 'dom' - click Load More and scrape the cards from the page
+        # 'api' - capture the JSON API the page uses and replay it over plain HTTP
+        self.mode = mode
+        self.api_pattern = api_pattern
+        self.api_pages = 0
+        # Hide card tiles and unload their images once extracted so browser memory stays flat
+        self.prune_dom = str(prune_dom).lower() in ('1', 'true', 'yes')
+        # Ceiling for each wait after a Load More click, in seconds
+        self.wait_timeout = float(wait_timeout)
+        # Load More progress per URL - kept in JOBDIR when it's set, so restarts resume
+        self.checkpoints = {}
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super(TestSpider, cls).from_crawler(crawler, *args, **kwargs)
+        if spider.mode == 'api':
+            # Browsers must be launched with performance logging to see the XHRs
+            crawler.settings.set('SELENIUM_NETWORK_CAPTURE', True, priority='spider')
+        return spider
 
     def start_requests(self):
         for url in self.start_urls:
-            yield SeleniumRequest(
-                url=url,
-                wait_time=5,
-                callback=self.parse,
-                dont_filter=True
-            )
-
-    def parse(self, response):
+            yield self.index_request(url)
+
+    def index_request(self, url, resumes=0):
+        # Cards are read straight from the live page, so skip copying the DOM into the response
+        meta = {'render_body': False, 'resumes': resumes}
+        if self.mode == 'api':
+            meta['capture_network'] = [self.api_pattern]
+        elif not self.prune_dom:
+            # With RENDER_CACHE_ENABLED, cache the page once every card is loaded so re-runs replay it
+            meta['render_cache_final'] = True
+        # Plain data, so the request can sit in a JOBDIR queue or the shared frontier
+        return RenderRequest(
+            url=url,
+            wait_time=5,
+            callback=self.parse,
+            dont_filter=True,
+            meta=meta
+        )
+
+    async def parse(self, response):
         """Parse card data and handle Load More button"""
         driver = response.meta.get('driver')
         
+        if response.meta.get('render_cached'):
+            self.logger.info("📼 Replaying the cached page")
+            for item in self.extract_cards(response):
+                yield item
+            return
+        
         if not driver:
             self.logger.error("No driver found in response meta")
             return
         
-        # Check for Cloudflare
-        if "just a moment" in driver.title.lower():
-            self.logger.info("⏳ Waiting for Cloudflare bypass...")
-            time.sleep(8)
+        if self.mode == 'api':
+            async for item in self.parse_via_api(response, driver):
+                yield item
+        else:
+            async for item in self.parse_via_dom(response, driver):
+                yield item
+    
+    async def parse_via_api(self, response, driver):
+        """Find the card API from the browser session, then page through it over HTTP"""
+        captures = list(response.meta.get('network_json', []))
         
-        self.logger.info(f"✓ Page loaded: {driver.title}")
-        self.logger.info(f"✓ URL: {driver.current_url}")
+        # Page the UI a couple of times so the API is seen with two page positions
+        for _ in range(2):
+            previous = await browser_call(response, driver.execute_script, COUNT_CARDS_SCRIPT)
+            if not await browser_call(response, self.click_load_more, driver):
+                break
+            self.load_more_clicks += 1
+            await browser_call(response, wait_for_more, driver, 'div.card-item-info', previous, LOAD_MORE_XPATH,
+                               timeout=self.wait_timeout)
+            captures += await browser_call(response, capture_json, driver, [self.api_pattern])
+        
+        api = PaginatedApi.infer(captures)
+        if not api:
+            self.logger.warning(f"⚠️  No paginated API matching {self.api_pattern!r} seen - falling back to DOM scraping")
+            async for item in self.parse_via_dom(response, driver):
+                yield item
+            return
+        
+        self.logger.info(f"🔌 Found card API: {api.capture['method']} {api.capture['url']} "
+                         f"({api.location} '{api.key}' += {api.step})")
+        for capture in captures:
+            for item in self.cards_from_payload(capture['data']):
+                yield item
+        
+        # Replay with the browser's cookies so Cloudflare clearance carries over
+        cookies = await browser_call(response, driver.get_cookies)
+        yield api.request(1, cookies=cookies, callback=self.parse_api_page,
+                          cb_kwargs={'api': api, 'pages_ahead': 1, 'cookies': cookies})
+    
+    def parse_api_page(self, response, api, pages_ahead, cookies):
+        """Extract cards from a replayed API page and request the next one"""
+        try:
+            payload = json.loads(response.text)
+        except ValueError:
+            self.logger.error(f"❌ API page {pages_ahead} is not JSON: {response.url}")
+            return
         
-        # Step 1: Click all Load More buttons first
-        self.logger.info("🔄 Loading all cards (clicking Load More repeatedly)...")
+        items = list(self.cards_from_payload(payload))
+        if not items:
+            self.logger.info(f"✓ API exhausted after {self.api_pages} replayed pages")
+            return
+        
+        self.api_pages += 1
+        for item in items:
+            yield item
         
-        # Track card count to detect when no more cards are being added
-        prev_card_count = 0
-        no_change_count = 0
+        if self.api_pages % 10 == 0:
+            self.logger.info(f"⏳ Replayed {self.api_pages} API pages | Cards: {self.cards_scraped}")
         
-        while True:
-            # Count current cards
-            current_cards = driver.find_elements(By.CSS_SELECTOR, 'div.card-item-info')
-            current_count = len(current_cards)
+        yield api.request(pages_ahead + 1, cookies=cookies, callback=self.parse_api_page,
+                          cb_kwargs={'api': api, 'pages_ahead': pages_ahead + 1, 'cookies': cookies})
+    
+    def cards_from_payload(self, payload):
+        """Map API records to the same name/tag items the DOM extraction produces"""
+        for record in find_records(payload):
+            parts = {}
+            for part, keys in RECORD_KEYS.items():
+                values = [str(record[k]).strip() for k in keys if record.get(k) not in (None, '')]
+                parts[part] = values
             
-            # Check if card count stopped increasing
-            if current_count == prev_card_count:
-                no_change_count += 1
-                if no_change_count >= 3:
-                    self.logger.info(f"⚠️  Card count unchanged for 3 clicks - stopping")
-                    self.logger.info(f"✓ Final card count on page: {current_count}")
-                    break
-            else:
-                no_change_count = 0
+            if not parts['name']:
+                continue
             
-            # Try to click Load More button
-            if not self.click_load_more(driver):
-                self.logger.info(f"✓ All cards loaded! (clicked {self.load_more_clicks} times)")
-                break
+            number = parts['number'][0] if parts['number'] else ''
+            if number and not number.startswith('#'):
+                number = f"#{number}"
+            card_set = ' '.join(parts['year'][:1] + parts['set'][:1])
+            full_name = f"{card_set} {parts['name'][0]} {number}".strip()
             
-            self.load_more_clicks += 1
-            prev_card_count = current_count
+            self.cards_scraped += 1
+            yield {
+                'name': full_name,
+                'tag': ' '.join(parts['chips'])
+            }
+    
+    async def parse_via_dom(self, response, driver):
+        """Click Load More, yielding the cards each click appends as soon as they appear"""
+        url = response.request.url
+        checkpoint = self.checkpoints.get(url)
+        if checkpoint is None:
+            checkpoint = self.checkpoints[url] = PaginationCheckpoint.for_spider(self, url)
+        if checkpoint.done:
+            self.logger.info(f"✓ Checkpoint says {url} is finished ({checkpoint.items} cards) - nothing to do")
+            return
+        
+        try:
+            # Driver calls block, so every browser step runs on a browser thread
+            # and the reactor keeps serving pipelines and other downloads
+            await browser_call(response, self.wait_for_page, driver)
+            
+            clicks = 0
+            # Cards yielded by earlier attempts - on resume the first `skip` cards the
+            # page lists are passed over, whatever their names (repeats are real cards)
+            skip = checkpoint.items
+            # The first round after fast-forwarding checks the list hasn't moved since then
+            verify = bool(skip)
+            if checkpoint.clicks:
+                # Get the page back to where the last attempt stopped without extracting anything
+                self.logger.info(f"⏩ Fast-forwarding {checkpoint.clicks} Load More clicks...")
+                clicks = await browser_call(response, self.fast_forward, driver, checkpoint.clicks)
+                self.load_more_clicks += clicks
             
-            if self.load_more_clicks % 10 == 0:
-                self.logger.info(f"⏳ Clicked {self.load_more_clicks} times | Cards on page: {current_count}")
+            self.logger.info("🔄 Loading all cards (clicking Load More repeatedly)...")
             
-            # Wait for new content to load
-            time.sleep(2)
+            # Stop once 3 rounds in a row add no new cards
+            no_change_count = 0
+            
+            while True:
+                # Only the cards appended since the last round cross the WebDriver wire
+                new_cards = await browser_call(response, self.extract_new_cards, driver)
+                fresh = new_cards
+                if verify and not checkpoint.matches(new_cards):
+                    self.logger.warning(f"⚠️  Card #{skip} is not the one the checkpoint ended on - "
+                                        f"the list changed, so nothing is skipped (expect duplicates)")
+                    checkpoint.restart()
+                    skip = 0
+                verify = False
+                if skip:
+                    fresh = new_cards[skip:]
+                    skip -= len(new_cards) - len(fresh)
+                    # Already emitted before a restart - build_item counted them then
+                    self.cards_scraped -= len(new_cards) - len(fresh)
+                for item in fresh:
+                    yield item
+                checkpoint.advance(fresh, clicks)
+                
+                if not new_cards:
+                    no_change_count += 1
+                    if no_change_count >= 3:
+                        self.logger.info(f"⚠️  No new cards for 3 clicks - stopping")
+                        break
+                else:
+                    no_change_count = 0
+                
+                # Try to click Load More button
+                if not await browser_call(response, self.click_load_more, driver):
+                    self.logger.info(f"✓ All cards loaded! (clicked {self.load_more_clicks} times)")
+                    break
+                
+                clicks += 1
+                self.load_more_clicks += 1
+                
+                if self.load_more_clicks % 10 == 0:
+                    self.logger.info(f"⏳ Clicked {self.load_more_clicks} times | Cards: {self.cards_scraped}")
+                
+                # Wait for new cards, the button disappearing or the network going quiet
+                await browser_call(response, wait_for_more, driver, NEW_CARD_SELECTOR, 0, LOAD_MORE_XPATH,
+                                   timeout=self.wait_timeout)
+        except WebDriverException as e:
+            # Browser crashed or the proxy died - ask for a new browser and carry on from the checkpoint
+            resumes = response.meta.get('resumes', 0)
+            if resumes >= MAX_RESUMES:
+                self.logger.error(f"❌ Giving up on {url} after {resumes} resumes: {e.msg}")
+                return
+            self.logger.warning(f"🔁 Browser failed after {checkpoint.clicks} clicks ({e.msg}) - resuming")
+            yield self.index_request(url, resumes=resumes + 1)
+            return
         
-        # Step 2: Now extract all cards at once
-        self.logger.info(f"🕷️  Extracting all {self.load_more_clicks * 20}+ cards...")
+        checkpoint.finish()
+        self.logger.info(f"✅ Extraction complete!")
+        self.logger.info(f"📊 Total cards: {self.cards_scraped}")
+    
+    def fast_forward(self, driver, clicks):
+        """Click Load More up to `clicks` times, waiting for each batch - returns the clicks made"""
+        for done in range(clicks):
+            previous = driver.execute_script(COUNT_CARDS_SCRIPT)
+            if not self.click_load_more(driver):
+                self.logger.warning(f"⚠️  Load More ran out after {done} of {clicks} clicks")
+                return done
+            wait_for_more(driver, 'div.card-item-info', previous, LOAD_MORE_XPATH, timeout=self.wait_timeout)
+        return clicks
+    
+    def wait_for_page(self, driver):
+        """Wait out the Cloudflare check and log where we landed"""
+        # Check for Cloudflare
+        if "just a moment" in driver.title.lower():
+            self.logger.info("⏳ Waiting for Cloudflare bypass...")
+            if not wait_for_title_change(driver, "just a moment", timeout=30):
+                self.logger.warning("⚠️  Still on the Cloudflare page after 30s")
         
-        # Update response with final page source
-        body = str.encode(driver.page_source)
-        response = response.replace(body=body)
+        self.logger.info(f"✓ Page loaded: {driver.title}")
+        self.logger.info(f"✓ URL: {driver.current_url}")
+    
+    def extract_new_cards(self, driver):
+        """Extract cards not seen in earlier rounds, marking (or pruning) them in the page"""
+        cards = driver.execute_script(EXTRACT_NEW_CARDS_SCRIPT, self.prune_dom) or []
+        items = []
+        for card in cards:
+            item = self.build_item(card['set'], card['name'], card['number'], card['chips'])
+            if item:
+                items.append(item)
+        return items
+    
+    def build_item(self, card_set, name_text, number_text, chips):
+        """Build a card item from its text parts, or None if the name is missing"""
+        if not (card_set and name_text):
+            return None
         
-        # Extract all cards
-        cards_extracted = list(self.extract_cards(response, driver))
+        # Combine all chips into tag (e.g., "Holo PSA 10" or "Full Art Secret Rare CGC 9.5")
+        tag = ' '.join([c.strip() for c in chips if c and c.strip()])
+        card_set = card_set.strip()
+        name_text = name_text.strip()
+        number_text = number_text.strip() if number_text else ''
         
-        # Yield all items
-        for item in cards_extracted:
-            yield item
+        # Full name: "2021 Pokemon Sword & Shield: Fusion Strike Espeon VMAX #270"
+        full_name = f"{card_set} {name_text} {number_text}".strip()
         
-        self.logger.info(f"✅ Extraction complete!")
-        self.logger.info(f"📊 Total unique cards: {len(cards_extracted)}")
+        # Don't skip duplicates - extract ALL cards
+        # Database will handle uniqueness with upsert
+        self.cards_scraped += 1
+        return {
+            'name': full_name,
+            'tag': tag
+        }
     
-    def extract_cards(self, response, driver):
-        """Extract card data from current page using correct selectors"""
+    def extract_cards(self, response, driver=None):
+        """Extract card data from a full page source using correct selectors"""
         # Find all card items using the actual class structure
         card_items = response.css('div.card-item-info')
         
@@ -119,26 +419,9 @@ class TestSpider(scrapy.Spider):
                 
                 # Extract ALL chips (rarity + grade)
                 chips = card.css('span.grade-variation-chip span:first-child::text').getall()
-                # Combine all chips into tag (e.g., "Holo PSA 10" or "Full Art Secret Rare CGC 9.5")
-                tag = ' '.join([c.strip() for c in chips if c.strip()])
                 
-                # Build full card name
-                if card_set and name_text:
-                    card_set = card_set.strip()
-                    name_text = name_text.strip()
-                    number_text = number_text.strip() if number_text else ''
-                    
-                    # Full name: "2021 Pokemon Sword & Shield: Fusion Strike Espeon VMAX #270"
-                    full_name = f"{card_set} {name_text} {number_text}".strip()
-                    
-                    # Don't skip duplicates - extract ALL cards
-                    # Database will handle uniqueness with upsert
-                    item = {
-                        'name': full_name,
-                        'tag': tag
-                    }
-                    
-                    self.cards_scraped += 1
+                item = self.build_item(card_set, name_text, number_text, chips)
+                if item:
                     yield item
                     
             except Exception as e:
@@ -148,19 +431,9 @@ class TestSpider(scrapy.Spider):
     def click_load_more(self, driver):
         """Click Load More button if available"""
         try:
-            # Wait a bit for any animations
-            time.sleep(0.5)
-            
             # Try multiple possible selectors for Load More button
-            selectors = [
-                "//button[contains(@class, 'btn') and contains(@class, 'secondary') and contains(text(), 'Load more')]",
-                "//button[contains(text(), 'Load more')]",
-                "//button[contains(text(), 'Load More')]",
-                "//button[@class='btn secondary']"
-            ]
-            
             button = None
-            for selector in selectors:
+            for selector in LOAD_MORE_SELECTORS:
                 try:
                     button = driver.find_element(By.XPATH, selector)
                     if button and button.is_displayed() and button.is_enabled():
@@ -176,9 +449,11 @@ class TestSpider(scrapy.Spider):
                 self.logger.info("Load More button is disabled")
                 return False
             
-            # Scroll to button
+            # Scroll to button (instant, so no settle time is needed)
             driver.execute_script("arguments[0].scrollIntoView({block: 'center'});", button)
-            time.sleep(0.5)
+            
+            # Count the requests the click starts so the wait knows when they finish
+            track_requests(driver)
             
             # Try JavaScript click if regular click fails
             try:
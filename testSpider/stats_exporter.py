@@ -0,0 +1,102 @@
+"""
+Stats exporter - the crawl's Scrapy stats in Prometheus text format over HTTP, while it runs
+"""
+import re
+import logging
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from twisted.web.resource import Resource
+from twisted.web.server import Site
+from testSpider.timings import BUCKETS, bucket_label
+
+logger = logging.getLogger(__name__)
+
+TIMING_KEY = re.compile(r'^timing/(?P<stage>[^/]+)/(?P<field>count|sum|max|bucket/(?P<bound>[^/]+))$')
+
+
+def metric_name(key, prefix='scrapy'):
+    """'selenium/failures/proxy_error' -> 'scrapy_selenium_failures_proxy_error'"""
+    return f"{prefix}_{re.sub(r'[^a-zA-Z0-9_]', '_', key)}".lower()
+
+
+def render_metrics(stats):
+    """Prometheus exposition text for a stats dict
+
+    Numeric stats become gauges; timing/<stage>/... stats (see timings.observe)
+    become one scrapy_stage_seconds histogram labelled by stage. Dates and
+    other non-numeric stats are left out.
+    """
+    lines = []
+    histograms = {}
+    for key, value in sorted(stats.items()):
+        match = TIMING_KEY.match(key)
+        if match:
+            histograms.setdefault(match['stage'], {})[match['bound'] or match['field']] = value
+            continue
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        name = metric_name(key)
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value}")
+
+    if histograms:
+        lines.append("# HELP scrapy_stage_seconds Time spent in each render/crawl stage")
+        lines.append("# TYPE scrapy_stage_seconds histogram")
+    for stage, fields in sorted(histograms.items()):
+        cumulative = 0
+        for bound in BUCKETS:
+            label = bucket_label(bound)
+            cumulative += fields.get(label, 0)
+            lines.append(f'scrapy_stage_seconds_bucket{{stage="{stage}",le="{label}"}} {cumulative}')
+        lines.append(f'scrapy_stage_seconds_sum{{stage="{stage}"}} {fields.get("sum", 0)}')
+        lines.append(f'scrapy_stage_seconds_count{{stage="{stage}"}} {fields.get("count", 0)}')
+    maxima = {stage: fields['max'] for stage, fields in histograms.items() if 'max' in fields}
+    if maxima:
+        lines.append("# TYPE scrapy_stage_seconds_max gauge")
+    for stage, value in sorted(maxima.items()):
+        lines.append(f'scrapy_stage_seconds_max{{stage="{stage}"}} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsResource(Resource):
+    isLeaf = True
+
+    def __init__(self, stats):
+        super().__init__()
+        self.stats = stats
+
+    def render_GET(self, request):
+        request.setHeader(b'Content-Type', b'text/plain; version=0.0.4; charset=utf-8')
+        return render_metrics(self.stats.get_stats()).encode('utf-8')
+
+
+class PrometheusExporter:
+    """Extension serving http://PROMETHEUS_HOST:PROMETHEUS_PORT/metrics while the spider runs"""
+
+    def __init__(self, stats, host='127.0.0.1', port=9410):
+        self.stats = stats
+        self.host = host
+        self.port = port
+        self.listener = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool('PROMETHEUS_ENABLED', False):
+            raise NotConfigured
+        exporter = cls(
+            crawler.stats,
+            host=crawler.settings.get('PROMETHEUS_HOST', '127.0.0.1'),
+            port=crawler.settings.getint('PROMETHEUS_PORT', 9410),
+        )
+        crawler.signals.connect(exporter.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(exporter.spider_closed, signal=signals.spider_closed)
+        return exporter
+
+    def spider_opened(self, spider):
+        from twisted.internet import reactor
+        self.listener = reactor.listenTCP(self.port, Site(MetricsResource(self.stats)), interface=self.host)
+        logger.info(f"📈 Serving stats at http://{self.host}:{self.listener.getHost().port}/metrics")
+
+    def spider_closed(self, spider):
+        if self.listener:
+            return self.listener.stopListening()
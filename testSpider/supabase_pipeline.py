@@ -2,22 +2,93 @@
 Supabase Pipeline for storing scraped Pokemon cards
 """
 import os
+import time
 import logging
+import threading
+from twisted.internet import defer, task, threads
+from twisted.python.threadpool import ThreadPool
+from postgrest.exceptions import APIError
 from supabase import create_client, Client
 from dotenv import load_dotenv
+from testSpider.timings import observe
 
 # Load environment variables
 load_dotenv()
 
+# Sent on the reactor thread with rows=[{'name': ..., 'tag': ...}, ...] once
+# an upsert of those rows has succeeded (stored now or already in the table)
+cards_saved = object()
+
+# SQLSTATE classes a particular row can cause (cardinality, bad data, constraints) -
+# only these are worth splitting a batch over to find the row
+ROW_ERROR_CLASSES = ('21', '22', '23')
+# Connection, serialization, resource and shutdown errors - the same batch may go through later
+TRANSIENT_ERROR_CLASSES = ('08', '40', '53', '57', '58')
+
+
+def is_row_error(error):
+    return isinstance(error, APIError) and isinstance(error.code, str) and error.code[:2] in ROW_ERROR_CLASSES
+
+
+def is_transient(error):
+    """Transport failures, 5xx and PostgREST's own connection errors - retry the batch as it is"""
+    if not isinstance(error, APIError):
+        return True
+    code = error.code
+    if code is None or isinstance(code, int):
+        # No PostgREST error body (a proxy or gateway answered), or only the HTTP status
+        return code is None or code >= 500
+    return code[:2] in TRANSIENT_ERROR_CLASSES or code.startswith('PGRST00')
+
 
 class SupabasePipeline:
     
-    def __init__(self):
+    def __init__(self, batch_size=1, flush_interval=5.0, max_in_flight=2, max_pending_batches=8,
+                 write_retries=3, retry_backoff=1.0):
         self.logger = logging.getLogger(__name__)
+        self.stats = None
+        self.signals = None
         self.supabase = None
         self.inserted_count = 0
         self.duplicate_count = 0
         self.error_count = 0
+        
+        # Rows waiting for the next bulk upsert, keyed by the (name, tag)
+        # conflict key - Postgres rejects a statement that hits the same key twice
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.buffer = {}
+        self.flush_loop = None
+        self.batch_count = 0
+        
+        # Batches are written on background threads so the reactor never waits
+        # on Supabase. process_item only blocks (returns a pending Deferred) once
+        # max_pending_batches are queued or in flight.
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_pending_batches = max(1, max_pending_batches)
+        # Attempts at a batch that failed for reasons other than its rows, backing off in between
+        self.write_retries = max(0, write_retries)
+        self.retry_backoff = retry_backoff
+        self.pending = set()
+        self.waiters = []
+        self.threadpool = None
+        self.credentials = None
+        # One client - and so one keep-alive connection - per writer thread
+        self.local = threading.local()
+    
+    @classmethod
+    def from_crawler(cls, crawler):
+        pipeline = cls(
+            batch_size=crawler.settings.getint('SUPABASE_BATCH_SIZE', 1),
+            flush_interval=crawler.settings.getfloat('SUPABASE_FLUSH_INTERVAL', 5.0),
+            max_in_flight=crawler.settings.getint('SUPABASE_MAX_IN_FLIGHT', 2),
+            max_pending_batches=crawler.settings.getint('SUPABASE_MAX_PENDING_BATCHES', 8),
+            write_retries=crawler.settings.getint('SUPABASE_WRITE_RETRIES', 3),
+            retry_backoff=crawler.settings.getfloat('SUPABASE_RETRY_BACKOFF', 1.0),
+        )
+        pipeline.stats = crawler.stats
+        pipeline.signals = crawler.signals
+        return pipeline
     
     def open_spider(self, spider):
         """Initialize Supabase connection when spider opens"""
@@ -30,56 +101,159 @@ class SupabasePipeline:
                 raise ValueError("Missing Supabase credentials")
             
             self.supabase: Client = create_client(supabase_url, supabase_key)
+            self.credentials = (supabase_url, supabase_key)
             self.logger.info("Successfully connected to Supabase")
             
         except Exception as e:
             self.logger.error(f"Failed to connect to Supabase: {e}")
             raise
+        
+        self.threadpool = ThreadPool(minthreads=1, maxthreads=self.max_in_flight, name='supabase')
+        self.threadpool.start()
+        
+        if self.batch_size > 1 and self.flush_interval > 0:
+            # Flush partial batches on a timer so slow crawls still save steadily
+            self.flush_loop = task.LoopingCall(self.flush)
+            self.flush_loop.start(self.flush_interval, now=False)
+            self.logger.info(f"Buffering up to {self.batch_size} cards per upsert "
+                             f"(flushing every {self.flush_interval}s)")
     
     def process_item(self, item, spider):
-        """Process and insert item into Supabase"""
-        try:
-            # Extract data
-            name = item.get('name', '').strip()
-            tag = item.get('tag', '').strip()
-            
-            if not name:
-                self.logger.warning("Skipping item without name")
-                return item
-            
-            # Prepare data
-            card_data = {
-                'name': name,
-                'tag': tag if tag else None
-            }
-            
-            # Insert into Supabase (upsert to handle duplicates based on name+tag)
-            response = self.supabase.table('cards').upsert(
-                card_data,
-                on_conflict='name,tag'
-            ).execute()
-            
-            if response.data:
-                self.inserted_count += 1
-                if self.inserted_count % 20 == 0:
-                    self.logger.info(f"💾 Saved {self.inserted_count} cards to database")
-            else:
-                self.duplicate_count += 1
-            
-        except Exception as e:
-            self.error_count += 1
-            self.logger.error(f"Error inserting item {item.get('name', 'unknown')}: {e}")
+        """Buffer the item and upsert once the batch is full"""
+        # Extract data
+        name = (item.get('name') or '').strip()
+        tag = (item.get('tag') or '').strip()
+        
+        if not name:
+            self.logger.warning("Skipping item without name")
+            return item
+        
+        # Prepare data - tag is NOT NULL in the cards table, so no chips is ''
+        card_data = {
+            'name': name,
+            'tag': tag
+        }
+        
+        key = (card_data['name'], card_data['tag'])
+        if key in self.buffer:
+            self.duplicate_count += 1
+        else:
+            self.buffer[key] = card_data
+        
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+        
+        if len(self.pending) >= self.max_pending_batches:
+            # Backpressure - hold this item until a batch finishes
+            d = defer.Deferred()
+            self.waiters.append((d, item))
+            return d
         
         return item
     
+    def flush(self):
+        """Hand everything buffered so far to a writer thread"""
+        if not self.buffer:
+            return
+        rows = list(self.buffer.values())
+        self.buffer = {}
+        self.batch_count += 1
+        
+        from twisted.internet import reactor
+        d = threads.deferToThreadPool(reactor, self.threadpool, self.timed_write, rows)
+        self.pending.add(d)
+        d.addBoth(self.batch_done, d)
+    
+    def batch_done(self, result, d):
+        """Fold a finished batch into the counters and release held items (reactor thread)"""
+        self.pending.discard(d)
+        if isinstance(result, tuple):
+            saved, duplicates, errors, stored, seconds = result
+            observe(self.stats, 'pipeline_write', seconds)
+            if self.stats:
+                self.stats.inc_value('supabase/batches')
+                self.stats.inc_value('supabase/rows', saved + duplicates + errors)
+            previous = self.inserted_count
+            self.inserted_count += saved
+            self.duplicate_count += duplicates
+            self.error_count += errors
+            if self.inserted_count // 20 > previous // 20:
+                self.logger.info(f"💾 Saved {self.inserted_count} cards to database")
+            if stored and self.signals:
+                self.signals.send_catch_log(cards_saved, rows=stored)
+        else:
+            self.logger.error(f"Writer thread failed: {result.value}")
+        
+        while self.waiters and len(self.pending) < self.max_pending_batches:
+            waiter, item = self.waiters.pop(0)
+            waiter.callback(item)
+    
+    def client(self):
+        """This thread's Supabase client"""
+        if not hasattr(self.local, 'supabase'):
+            self.local.supabase = create_client(*self.credentials)
+        return self.local.supabase
+    
+    def timed_write(self, rows):
+        """write_batch plus how long it took, queueing for a writer thread not included"""
+        started = time.perf_counter()
+        return self.write_batch(rows) + (time.perf_counter() - started,)
+    
+    def write_batch(self, rows):
+        """Upsert rows in one request; on a row error split the batch to isolate bad rows
+
+        Runs on a writer thread and returns (saved, duplicates, errors, stored),
+        stored being the rows whose upsert went through. Transport errors and
+        5xx are retried with the batch whole; other errors fail it whole.
+        """
+        for attempt in range(self.write_retries + 1):
+            try:
+                # Insert into Supabase (upsert to handle duplicates based on name+tag)
+                response = self.client().table('cards').upsert(
+                    rows,
+                    on_conflict='name,tag'
+                ).execute()
+                
+                saved = len(response.data or [])
+                return saved, len(rows) - saved, 0, rows
+            
+            except Exception as e:
+                error = e
+                if not is_transient(e) or attempt == self.write_retries:
+                    break
+                self.logger.warning(f"Batch of {len(rows)} failed ({e!r}) - retrying in "
+                                    f"{self.retry_backoff * 2 ** attempt:g}s")
+                time.sleep(self.retry_backoff * 2 ** attempt)
+        
+        if len(rows) == 1 or not is_row_error(error):
+            self.logger.error(f"Error inserting {len(rows)} item(s) starting with {rows[0]['name']}: {error!r}")
+            return 0, 0, len(rows), []
+        
+        middle = len(rows) // 2
+        self.logger.warning(f"Batch of {len(rows)} failed ({error!r}) - retrying as {middle} + {len(rows) - middle}")
+        first = self.write_batch(rows[:middle])
+        second = self.write_batch(rows[middle:])
+        return tuple(a + b for a, b in zip(first, second))
+    
+    @defer.inlineCallbacks
     def close_spider(self, spider):
-        """Log statistics when spider closes"""
+        """Flush what's left, wait for the writers, and log statistics when spider closes"""
+        if self.flush_loop and self.flush_loop.running:
+            self.flush_loop.stop()
+        self.flush()
+        
+        if self.pending:
+            self.logger.info(f"⏳ Waiting for {len(self.pending)} Supabase batches to finish...")
+            yield defer.DeferredList(list(self.pending))
+        if self.threadpool:
+            self.threadpool.stop()
+        
         self.logger.info("=" * 60)
         self.logger.info("Supabase Pipeline Statistics")
         self.logger.info("=" * 60)
         self.logger.info(f"Inserted: {self.inserted_count}")
         self.logger.info(f"Duplicates: {self.duplicate_count}")
         self.logger.info(f"Errors: {self.error_count}")
+        self.logger.info(f"Batches: {self.batch_count}")
         self.logger.info(f"Total processed: {self.inserted_count + self.duplicate_count + self.error_count}")
         self.logger.info("=" * 60)
-
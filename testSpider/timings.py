@@ -0,0 +1,111 @@
+"""
+Stage timings - histograms of how long each step of a render takes, kept in the crawl stats
+"""
+import time
+
+# Upper bounds of the histogram buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, float('inf'))
+
+# Stages observed by the middleware, the driver pool, browser_call, the spider middleware below and SupabasePipeline
+STAGES = ('acquire', 'launch', 'get', 'wait', 'script', 'page_source', 'browser', 'parse', 'pipeline_write')
+
+
+def bucket_label(bound):
+    return '+Inf' if bound == float('inf') else f'{bound:g}'
+
+
+def observe(stats, stage, seconds):
+    """Add one duration to the stage's histogram - call from the reactor thread
+
+    Kept as plain stats, so it shows up in the stats dump at close:
+    timing/<stage>/count, /sum and /max, and timing/<stage>/bucket/<bound>
+    with the number of durations that fell in that bucket (not cumulative).
+    """
+    if not stats:
+        return
+    bound = next(b for b in BUCKETS if seconds <= b)
+    prefix = f'timing/{stage}'
+    stats.inc_value(f'{prefix}/count')
+    stats.inc_value(f'{prefix}/sum', seconds, start=0.0)
+    stats.max_value(f'{prefix}/max', seconds)
+    stats.inc_value(f'{prefix}/bucket/{bucket_label(bound)}')
+
+
+class StageTimer:
+    """Durations of a sequence of stages, measured on a browser thread and observed later
+
+        timer = StageTimer()
+        driver.get(url)
+        timer.mark('get')
+    """
+
+    def __init__(self):
+        self.last = time.perf_counter()
+        self.durations = {}
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        self.durations[stage] = self.durations.get(stage, 0.0) + now - self.last
+        self.last = now
+
+    def observe(self, stats):
+        for stage, seconds in self.durations.items():
+            observe(stats, stage, seconds)
+
+
+def browser_seconds(response):
+    """Time the response's callback has spent awaiting browser_call so far"""
+    request = getattr(response, 'request', None)
+    return request.meta.get('browser_seconds', 0.0) if request is not None else 0.0
+
+
+class StageTimingMiddleware:
+    """Spider middleware timing each callback - only the time spent producing its output
+
+    Time the engine spends on the output in between (pipelines, scheduling,
+    the reactor running other work) is left out, so a slow pipeline shows up
+    under pipeline_write rather than here. Callbacks are generators here, so
+    their whole body runs while their output is being consumed. Awaited
+    browser_calls (Load More clicks, waits, snapshots) are taken out too -
+    they're timed as the 'browser' stage.
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.stats)
+
+    def process_spider_output(self, response, result, spider):
+        spent = 0.0
+        result = iter(result)
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    r = next(result)
+                except StopIteration:
+                    return
+                finally:
+                    spent += time.perf_counter() - started
+                yield r
+        finally:
+            observe(self.stats, 'parse', spent)
+
+    async def process_spider_output_async(self, response, result, spider):
+        spent = 0.0
+        result = result.__aiter__()
+        try:
+            while True:
+                started = time.perf_counter()
+                in_browser = browser_seconds(response)
+                try:
+                    r = await result.__anext__()
+                except StopAsyncIteration:
+                    return
+                finally:
+                    spent += time.perf_counter() - started - (browser_seconds(response) - in_browser)
+                yield r
+        finally:
+            observe(self.stats, 'parse', spent)
@@ -0,0 +1,133 @@
+"""
+Event-driven waits - resolve as soon as the page changes instead of sleeping
+"""
+import time
+import logging
+from selenium.common.exceptions import JavascriptException, TimeoutException
+from selenium.webdriver.support.ui import WebDriverWait
+from testSpider.browser_tabs import TabDriver
+
+logger = logging.getLogger(__name__)
+
+# Counts fetch/XHR requests in flight so waits can tell when the network is idle.
+# Safe to run more than once per page.
+TRACK_REQUESTS_SCRIPT = """
+if (window.__pendingRequests !== undefined) { return; }
+window.__pendingRequests = 0;
+var origFetch = window.fetch;
+if (origFetch) {
+    window.fetch = function () {
+        window.__pendingRequests++;
+        return origFetch.apply(this, arguments).finally(function () { window.__pendingRequests--; });
+    };
+}
+var origSend = XMLHttpRequest.prototype.send;
+XMLHttpRequest.prototype.send = function () {
+    window.__pendingRequests++;
+    this.addEventListener('loadend', function () { window.__pendingRequests--; });
+    return origSend.apply(this, arguments);
+};
+"""
+
+# Calls done() with the first of:
+#   'grew'        - more than `previous` elements match, and the DOM has settled
+#   'button-gone' - the button XPath no longer matches a visible button
+#   'idle'        - no requests in flight and no DOM changes for idleMs
+#   'timeout'     - nothing happened within timeoutMs
+WAIT_FOR_MORE_BODY = """
+var selector = arguments[0], previous = arguments[1], buttonXPath = arguments[2];
+var idleMs = arguments[3], settleMs = arguments[4], timeoutMs = arguments[5];
+var finished = false, grown = false, lastChange = Date.now();
+
+function buttonGone() {
+    if (!buttonXPath) { return false; }
+    var button = document.evaluate(buttonXPath, document, null,
+        XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    // Disabled doesn't count - many pages disable the button while a batch loads
+    return !button || button.offsetParent === null;
+}
+function finish(reason) {
+    if (finished) { return; }
+    finished = true;
+    observer.disconnect();
+    clearInterval(timer);
+    done(reason);
+}
+function check() {
+    var now = Date.now();
+    if (!grown && document.querySelectorAll(selector).length > previous) { grown = true; }
+    if (grown) {
+        if (now - lastChange >= settleMs) { finish('grew'); }
+        return;
+    }
+    if (buttonGone()) { finish('button-gone'); return; }
+    if ((window.__pendingRequests || 0) === 0 && now - lastChange >= idleMs) { finish('idle'); return; }
+    if (now - start >= timeoutMs) { finish('timeout'); }
+}
+var start = Date.now();
+var observer = new MutationObserver(function () { lastChange = Date.now(); check(); });
+observer.observe(document.body, {childList: true, subtree: true});
+var timer = setInterval(check, 50);
+check();
+"""
+
+# One execute_async_script call that returns the reason
+WAIT_FOR_MORE_SCRIPT = "var done = arguments[arguments.length - 1];" + WAIT_FOR_MORE_BODY
+
+# Tabs share one chromedriver connection, so they start the wait and poll for
+# its reason with short calls instead of holding the browser for the whole wait
+START_WAIT_FOR_MORE_SCRIPT = (
+    "window.__waitForMoreResult = null;"
+    "var done = function (reason) { window.__waitForMoreResult = reason; };" + WAIT_FOR_MORE_BODY
+)
+POLL_WAIT_FOR_MORE_SCRIPT = "return window.__waitForMoreResult || null;"
+
+
+def track_requests(driver):
+    """Start counting in-flight fetch/XHR requests on the current page"""
+    driver.execute_script(TRACK_REQUESTS_SCRIPT)
+
+
+def wait_for_more(driver, selector, previous=0, button_xpath=None, timeout=15, idle=1.0, settle=0.15):
+    """Wait until more elements match `selector`, the button goes away or the page goes idle
+
+    Call track_requests() before triggering the load so in-flight requests keep
+    the wait from returning 'idle' while a batch is still downloading. Returns
+    'grew', 'button-gone', 'idle' or 'timeout'.
+    """
+    args = (selector, previous, button_xpath, int(idle * 1000), int(settle * 1000), int(timeout * 1000))
+    if isinstance(driver, TabDriver):
+        return poll_for_more(driver, args, timeout)
+    # The script's own timeout wins; give WebDriver a little headroom on top
+    driver.set_script_timeout(timeout + 5)
+    try:
+        return driver.execute_async_script(WAIT_FOR_MORE_SCRIPT, *args)
+    except TimeoutException:
+        return 'timeout'
+
+
+def poll_for_more(driver, args, timeout, poll_frequency=0.05):
+    """wait_for_more for a tab - the browser is only locked for each short poll"""
+    driver.execute_script(START_WAIT_FOR_MORE_SCRIPT, *args)
+    deadline = time.monotonic() + timeout + 5
+    while time.monotonic() < deadline:
+        time.sleep(poll_frequency)
+        try:
+            reason = driver.execute_script(POLL_WAIT_FOR_MORE_SCRIPT)
+        except JavascriptException:
+            # The page is navigating - keep polling until the deadline
+            continue
+        if reason:
+            return reason
+    return 'timeout'
+
+
+def wait_for_title_change(driver, marker, timeout=30):
+    """Wait while the page title contains `marker` (e.g. a Cloudflare check); True if it cleared"""
+    try:
+        WebDriverWait(driver, timeout, poll_frequency=0.25).until(
+            lambda d: marker not in d.title.lower()
+        )
+        return True
+    except TimeoutException:
+        return False
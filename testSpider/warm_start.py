@@ -0,0 +1,103 @@
+"""
+Warm start - the parts of a browser launch that only need doing once per process
+"""
+import os
+import atexit
+import shutil
+import logging
+import tempfile
+import threading
+from pathlib import Path
+from fake_useragent import UserAgent
+from undetected_chromedriver.patcher import Patcher
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_driver_path = None
+_user_agents = None
+
+# Files Chrome holds open or regenerates - copying them confuses a new instance
+PROFILE_IGNORE = shutil.ignore_patterns(
+    'Singleton*', 'lockfile', 'LOCK', '*.lock', 'Crashpad', 'BrowserMetrics*', 'DevToolsActivePort',
+)
+
+
+def user_agents():
+    """One UserAgent for the process - building it parses fake_useragent's data file"""
+    global _user_agents
+    with _lock:
+        if _user_agents is None:
+            _user_agents = UserAgent(browsers=['chrome'])
+        return _user_agents
+
+
+def patched_driver_path(version_main=None):
+    """Path to a chromedriver patched once for this process
+
+    uc.Chrome downloads and patches chromedriver on every launch and deletes it
+    again on quit. Passing this path as driver_executable_path skips both: uc
+    sees a custom binary that is already patched and leaves it alone.
+    """
+    global _driver_path
+    with _lock:
+        if _driver_path and os.path.exists(_driver_path):
+            return _driver_path
+
+        patcher = Patcher(version_main=version_main or 0)
+        patcher.auto()
+        # Our own copy, so other processes re-patching the shared one can't pull it away mid-crawl
+        suffix = '.exe' if patcher.executable_path.endswith('.exe') else ''
+        path = os.path.join(os.path.dirname(patcher.executable_path), f'chromedriver_{os.getpid()}{suffix}')
+        shutil.copy2(patcher.executable_path, path)
+        atexit.register(_remove, path)
+        logger.info(f"🔧 Patched chromedriver once for this process: {path}")
+        _driver_path = path
+        return path
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class ProfileTemplate:
+    """A Chrome profile built once and copied for every new browser
+
+    A fresh profile makes Chrome write its first-run state, preferences and
+    caches before the first page loads. Copying a profile that already has
+    them is much cheaper. The template is built on first use by `build`, which
+    gets the directory to launch a browser in, and kept across runs.
+    """
+
+    def __init__(self, path='chrome_profile_template'):
+        self.path = Path(__file__).parent.parent / path
+        self.lock = threading.Lock()
+
+    @property
+    def ready(self):
+        return (self.path / 'Local State').exists()
+
+    def ensure(self, build):
+        """Build the template if there isn't one yet - returns False if that failed"""
+        with self.lock:
+            if self.ready:
+                return True
+            shutil.rmtree(self.path, ignore_errors=True)
+            self.path.mkdir(parents=True)
+            try:
+                build(str(self.path))
+            except Exception as e:
+                logger.warning(f"Could not build profile template {self.path}: {e}")
+                shutil.rmtree(self.path, ignore_errors=True)
+                return False
+            logger.info(f"📁 Built profile template {self.path}")
+            return self.ready
+
+    def copy(self):
+        """A private copy of the template for one browser (the caller removes it)"""
+        target = tempfile.mkdtemp(prefix='uc-profile-')
+        shutil.copytree(self.path, target, ignore=PROFILE_IGNORE, dirs_exist_ok=True)
+        return target
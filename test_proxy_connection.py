@@ -75,6 +75,7 @@ def test_proxy_pool(max_proxies=20, workers=10):
     
     # Load proxies
     middleware = SeleniumMiddleware()
+    middleware.load_proxies()
     
     if not middleware.proxy_list:
         print("❌ No proxies loaded!")
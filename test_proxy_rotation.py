@@ -19,6 +19,7 @@ def test_proxy_loading():
     
     # Create middleware instance
     middleware = SeleniumMiddleware()
+    middleware.load_proxies()
     
     # Check if proxies loaded
     print(f"\nTotal proxies loaded: {len(middleware.proxy_list)}")